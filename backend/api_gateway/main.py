@@ -1,27 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import importlib
 import os
 import sys
 import uuid
 from pathlib import Path
+from typing import List, Optional
 
-# Add services to Python path
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
 
-# Import all service processors
-from vocal_remover.processor import VocalRemoverProcessor
-from pitch_tempo.processor import PitchTempoProcessor
-from converter.processor import ConverterProcessor
-from cutter_joiner.processor import CutterJoinerProcessor
-from noise_reduction.processor import NoiseReductionProcessor
-from volume_normalizer.processor import VolumeNormalizerProcessor
-from fade_effect.processor import FadeEffectProcessor
-from metadata_editor.processor import MetadataEditorProcessor
-from audio_reverse.processor import AudioReverseProcessor
-from equalizer.processor import EqualizerProcessor
-from audio_splitter.processor import AudioSplitterProcessor
+from shared.batch import ingest_batch, parse_batch_params, run_batch
+from shared.config import Config
+from shared.downloads import serve_download
+from shared.executor import get_executor
+from shared.jobs import get_job_manager
+from shared.registry import get_registry, warm_up_kernels
+from shared.result_cache import get_result_cache
+from shared.retention import get_retention_manager
+from shared.service_app import cancel_job as cancel_local_job, get_job as get_local_job, job_accepted, submit_upload_job
+from shared.service_proxy import ServiceProxy
+from shared.storage import get_storage
+from shared.upload import ingest_upload
+
+# Gateway cold-start timings, reported at startup and in /health
+startup_timings = {"import_seconds": round(time.perf_counter() - _import_started, 3)}
 
 # Create FastAPI app
 app = FastAPI(
@@ -45,21 +54,30 @@ PROCESSED_DIR = "processed"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-# Mount static files
-app.mount("/download", StaticFiles(directory=PROCESSED_DIR), name="downloads")
-
-# Initialize processors
-vocal_processor = VocalRemoverProcessor()
-pitch_processor = PitchTempoProcessor()
-converter_processor = ConverterProcessor()
-cutter_processor = CutterJoinerProcessor()
-noise_processor = NoiseReductionProcessor()
-volume_processor = VolumeNormalizerProcessor()
-fade_processor = FadeEffectProcessor()
-metadata_processor = MetadataEditorProcessor()
-reverse_processor = AudioReverseProcessor()
-equalizer_processor = EqualizerProcessor()
-splitter_processor = AudioSplitterProcessor()
+# Processed file downloads (Range, ETag, optional FLAC/gzip negotiation)
+@app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download(filename: str, request: Request):
+    local = os.path.isfile(os.path.join(PROCESSED_DIR, filename))
+    if service_proxy.pools and not local and not get_storage().remote:
+        # Results of forwarded tools stay on the service instance that produced them
+        forwarded = await service_proxy.forward_download(request, filename)
+        if forwarded is not None:
+            return forwarded
+    return await serve_download(request, PROCESSED_DIR, filename)
+
+# Processors are imported and constructed on first use
+processors = get_registry()
+
+# Tools whose service has instances configured are forwarded instead of run in-process
+service_proxy = ServiceProxy(processors.names())
+
+@app.middleware("http")
+async def forward_to_services(request: Request, call_next):
+    """Stream forwarded tool requests to their service; everything else is handled here"""
+    route = service_proxy.route_for(request)
+    if route is None:
+        return await call_next(request)
+    return await service_proxy.forward(request, route)
 
 @app.get("/")
 async def root():
@@ -69,80 +87,230 @@ async def root():
         "services": [
             "vocal-remover", "pitch-tempo", "converter", "cutter-joiner",
             "noise-reduction", "volume-normalizer", "fade-effect",
-            "metadata-editor", "audio-reverse", "equalizer", "audio-splitter"
+            "metadata-editor", "audio-reverse", "equalizer", "audio-splitter",
+            "pipeline", "batch", "preview", "analyze", "waveform"
         ]
     }
 
+@app.on_event("startup")
+async def report_startup():
+    startup_timings["ready_seconds"] = round(time.perf_counter() - _import_started, 3)
+    print(f"⏱️  Gateway imports took {startup_timings['import_seconds']}s, "
+          f"ready after {startup_timings['ready_seconds']}s")
+    await service_proxy.start()
+    if Config.RETENTION_ENABLED:
+        get_retention_manager().start()
+    if service_proxy.pools:
+        print(f"🔀 Forwarding to services: {', '.join(sorted(service_proxy.pools))}")
+    if Config.WORKER_WARMUP:
+        app.state.warm_up_task = asyncio.create_task(_warm_up())
+
+async def _warm_up():
+    """Load every processor and pre-JIT the DSP kernels in each worker, in the background"""
+    started = time.perf_counter()
+    await asyncio.to_thread(processors.load_all)
+    results = await get_executor().warm_up(warm_up_kernels)
+    warmed = [seconds for seconds in results if not isinstance(seconds, BaseException)]
+    startup_timings["warm_up"] = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "workers_warmed": len(warmed),
+        "errors": [str(error) for error in results if isinstance(error, BaseException)]
+    }
+    print(f"🔥 Warm-up finished in {startup_timings['warm_up']['seconds']}s ({len(warmed)} workers)")
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    warm_up_task = getattr(app.state, "warm_up_task", None)
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await service_proxy.close()
+    if Config.RETENTION_ENABLED:
+        await get_retention_manager().stop()
+    await get_job_manager().shutdown()
+    get_executor().shutdown()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "services": "all_operational"}
+    return {
+        "status": "healthy",
+        "services": "all_operational",
+        "workers": get_executor().stats(),
+        "processors": processors.stats(),
+        "forwarding": service_proxy.stats(),
+        "retention": get_retention_manager().stats() if Config.RETENTION_ENABLED else None,
+        "startup": startup_timings
+    }
+
+async def _submit_job(service: str, file, process_file, *args):
+    """Queue process_file(upload, *args) as an in-process background job"""
+    return await submit_upload_job(service, file, process_file, *args, upload_dir=UPLOAD_DIR)
+
+# Result Cache Statistics
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and size of the processed-result cache"""
+    return get_result_cache().stats()
+
+# Job Status Service
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """Get state, progress and result of a submitted job"""
+    if get_job_manager().get(job_id) is None:
+        forwarded = await service_proxy.forward_job(request, job_id)
+        if forwarded is not None:
+            return forwarded
+    return await get_local_job(job_id)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request):
+    """Cancel a queued or running job"""
+    if get_job_manager().get(job_id) is None:
+        forwarded = await service_proxy.forward_job(request, job_id)
+        if forwarded is not None:
+            return forwarded
+    return await cancel_local_job(job_id)
 
 # Vocal Remover Service
 @app.post("/vocal-remover")
-async def vocal_remover(file: UploadFile = File(...)):
+async def vocal_remover(
+    file: UploadFile = File(...),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
     """Remove vocals from audio using AI separation"""
-    return await vocal_processor.process(file)
+    processor = await processors.load("vocal-remover")
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await _submit_job("vocal_remover", file, processor.process_file, output_format, output_quality,
+                                 use_cache)
+    return await processor.process(file, output_format, output_quality, use_cache)
 
 # Pitch & Tempo Service
 @app.post("/pitch-tempo")
 async def pitch_tempo(
     file: UploadFile = File(...),
     pitch_shift: float = Form(0.0),
-    tempo_change: float = Form(1.0)
+    tempo_change: float = Form(1.0),
+    quality: str = Form("high"),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
-    """Adjust pitch and tempo independently"""
-    return await pitch_processor.process(file, pitch_shift, tempo_change)
+    """Adjust pitch and tempo independently; quality is "high" (phase vocoder) or "fast" (WSOLA)"""
+    processor = await processors.load("pitch-tempo")
+    if run_async:
+        processor.check(tempo_change, quality, output_format, output_quality)
+        return await _submit_job("pitch_tempo", file, processor.process_file,
+                                 pitch_shift, tempo_change, quality, output_format, output_quality, use_cache)
+    return await processor.process(file, pitch_shift, tempo_change, quality, output_format, output_quality,
+                                   use_cache)
 
 # Format Converter Service
 @app.post("/converter")
 async def converter(
     file: UploadFile = File(...),
     output_format: str = Form("mp3"),
-    quality: str = Form("high")
+    quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
     """Convert audio between different formats"""
-    return await converter_processor.process(file, output_format, quality)
+    processor = await processors.load("converter")
+    if run_async:
+        return await _submit_job("converter", file, processor.process_file, output_format, quality, use_cache)
+    return await processor.process(file, output_format, quality, use_cache)
 
 # Cutter & Joiner Service
 @app.post("/cutter-joiner")
 async def cutter_joiner(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    files: List[UploadFile] = File(None),
     operation: str = Form("cut"),
     start_time: float = Form(0.0),
-    end_time: float = Form(None)
+    end_time: float = Form(None),
+    crossfade: float = Form(0.0),
+    output_format: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
-    """Cut or join audio files"""
-    return await cutter_processor.process(file, operation, start_time, end_time)
+    """Cut or join audio files; cuts keep the source format unless output_format is given.
+
+    operation=join concatenates file and/or files in order, with optional crossfade seconds.
+    """
+    processor = await processors.load("cutter-joiner")
+    if operation == "join":
+        inputs = ([file] if file is not None else []) + (files or [])
+        output_format = output_format or "wav"
+        processor.check_join(len(inputs), crossfade, output_format)
+        if run_async:
+            return await _submit_job("cutter_joiner", inputs, processor.join_files,
+                                     crossfade, output_format, use_cache)
+        return await processor.join(inputs, crossfade, output_format, use_cache)
+    if file is None:
+        raise HTTPException(status_code=400, detail="A file is required")
+    if run_async:
+        return await _submit_job("cutter_joiner", file, processor.process_file,
+                                 operation, start_time, end_time, output_format, use_cache)
+    return await processor.process(file, operation, start_time, end_time, output_format, use_cache)
 
 # Noise Reduction Service
 @app.post("/noise-reduction")
 async def noise_reduction(
     file: UploadFile = File(...),
     reduction_strength: float = Form(0.8),
-    stationary: bool = Form(True)
+    stationary: bool = Form(True),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
     """Reduce background noise using advanced algorithms"""
-    return await noise_processor.process(file, reduction_strength, stationary)
+    processor = await processors.load("noise-reduction")
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await _submit_job("noise_reduction", file, processor.process_file, reduction_strength, stationary,
+                                 output_format, output_quality, use_cache)
+    return await processor.process(file, reduction_strength, stationary, output_format, output_quality, use_cache)
 
 # Volume Normalizer Service
 @app.post("/volume-normalizer")
 async def volume_normalizer(
     file: UploadFile = File(...),
-    target_level: float = Form(-6.0),
-    normalize: bool = Form(True)
+    target_level: float = Form(-14.0),
+    normalize: bool = Form(True),
+    true_peak: float = Form(-1.0),
+    gain_db: float = Form(0.0),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
-    """Normalize and boost audio volume"""
-    return await volume_processor.process(file, target_level, normalize)
+    """Normalize loudness to target_level LUFS (EBU R128), or by gain_db without normalize, limited to true_peak dBTP"""
+    processor = await processors.load("volume-normalizer")
+    if run_async:
+        processor.check(true_peak, output_format, output_quality)
+        return await _submit_job("volume_normalizer", file, processor.process_file,
+                                 target_level, normalize, true_peak, gain_db, output_format, output_quality, use_cache)
+    return await processor.process(file, target_level, normalize, true_peak, gain_db, output_format,
+                                   output_quality, use_cache)
 
 # Fade Effect Service
 @app.post("/fade-effect")
 async def fade_effect(
     file: UploadFile = File(...),
     fade_in_duration: float = Form(2.0),
-    fade_out_duration: float = Form(2.0)
+    fade_out_duration: float = Form(2.0),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
     """Add fade in/out effects to audio"""
-    return await fade_processor.process(file, fade_in_duration, fade_out_duration)
+    processor = await processors.load("fade-effect")
+    if run_async:
+        return await _submit_job("fade_effect", file, processor.process_file, fade_in_duration, fade_out_duration, use_cache)
+    return await processor.process(file, fade_in_duration, fade_out_duration, use_cache)
 
 # Metadata Editor Service
 @app.post("/metadata-editor")
@@ -151,16 +319,32 @@ async def metadata_editor(
     title: str = Form(None),
     artist: str = Form(None),
     album: str = Form(None),
-    year: str = Form(None)
+    year: str = Form(None),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
     """Edit audio metadata and MP3 tags"""
-    return await metadata_processor.process(file, title, artist, album, year)
+    processor = await processors.load("metadata-editor")
+    if run_async:
+        return await _submit_job("metadata_editor", file, processor.process_file, title, artist, album, year, use_cache)
+    return await processor.process(file, title, artist, album, year, use_cache)
 
 # Audio Reverse Service
 @app.post("/audio-reverse")
-async def audio_reverse(file: UploadFile = File(...)):
+async def audio_reverse(
+    file: UploadFile = File(...),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
     """Reverse audio playback completely"""
-    return await reverse_processor.process(file)
+    processor = await processors.load("audio-reverse")
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await _submit_job("audio_reverse", file, processor.process_file, output_format, output_quality,
+                                 use_cache)
+    return await processor.process(file, output_format, output_quality, use_cache)
 
 # Equalizer Service
 @app.post("/equalizer")
@@ -168,20 +352,187 @@ async def equalizer(
     file: UploadFile = File(...),
     low_gain: float = Form(0.0),
     mid_gain: float = Form(0.0),
-    high_gain: float = Form(0.0)
+    high_gain: float = Form(0.0),
+    crossovers: Optional[str] = Form(None),
+    band_gains: Optional[str] = Form(None),
+    bands: Optional[str] = Form(None),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
-    """Apply 3-band equalizer with frequency adjustment"""
-    return await equalizer_processor.process(file, low_gain, mid_gain, high_gain)
+    """Apply 3-band equalizer, N bands via comma-separated crossovers (Hz) and band_gains (dB),
+    or a parametric EQ from a JSON list of {"type", "freq", "gain", "q"} bands"""
+    processor = await processors.load("equalizer")
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await _submit_job("equalizer", file, processor.process_file,
+                                 low_gain, mid_gain, high_gain, crossovers, band_gains, bands,
+                                 output_format, output_quality, use_cache)
+    return await processor.process(file, low_gain, mid_gain, high_gain, crossovers, band_gains,
+                                   bands, output_format, output_quality, use_cache)
 
 # Audio Splitter Service
 @app.post("/audio-splitter")
 async def audio_splitter(
     file: UploadFile = File(...),
     split_type: str = Form("lr_channels"),
-    output_format: str = Form("wav")
+    output_format: str = Form("wav"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
     """Advanced audio channel splitting with multiple methods"""
-    return await splitter_processor.process(file, split_type, output_format)
+    processor = await processors.load("audio-splitter")
+    if run_async:
+        return await _submit_job("audio_splitter", file, processor.process_file, split_type, output_format, use_cache)
+    return await processor.process(file, split_type, output_format, use_cache)
+
+# Batch Processing Service
+@app.post("/batch/{tool}")
+async def batch(
+    tool: str,
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    params: str = Form("{}"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Apply one tool with one JSON parameter set to many files and/or a zip archive"""
+    tool = tool.replace("_", "-")
+    if tool not in processors:
+        raise HTTPException(status_code=404, detail=f"Unknown tool '{tool}'")
+    processor = await processors.load(tool)
+    params = parse_batch_params(processor.process_file, params)
+    params["use_cache"] = use_cache
+
+    uploads, rejected = await ingest_batch(files, archive, UPLOAD_DIR)
+    run = lambda: run_batch(tool, uploads, processor.process_file, params, rejected, PROCESSED_DIR)
+    if run_async:
+        job = get_job_manager().submit("batch", run, on_finish=lambda: [upload.remove() for upload in uploads],
+                                       reports_progress=True)
+        return job_accepted(job)
+    return await run()
+
+# Preview Service
+@app.post("/preview/{tool}")
+async def preview(
+    tool: str,
+    file: UploadFile = File(None),
+    session_id: Optional[str] = Form(None),
+    params: str = Form("{}"),
+    offset: float = Form(0.0),
+    duration: Optional[float] = Form(None),
+    sample_rate: Optional[int] = Form(None),
+    output_format: Optional[str] = Form(None)
+):
+    """Render a tool on a short excerpt centred on offset seconds, as a small compressed file.
+
+    The first call uploads the file and returns a session_id; later calls send
+    session_id instead of the file and reuse the decoded audio. params is the
+    tool's form fields as a JSON object, as for /batch. duration and
+    sample_rate (a reduced-rate proxy) are chosen to fit the latency budget
+    when left unset.
+    """
+    tool = tool.replace("_", "-")
+    if tool not in processors:
+        raise HTTPException(status_code=404, detail=f"Unknown tool '{tool}'")
+    if (file is None) == (session_id is None):
+        raise HTTPException(status_code=400, detail="Send either a file or a session_id")
+    processor = await processors.load(tool)
+    # Imported on first use, like the processors, to keep numpy/scipy out of gateway start-up
+    preview_module = await asyncio.to_thread(importlib.import_module, "shared.preview")
+    upload = await ingest_upload(file, UPLOAD_DIR) if file is not None else None
+    return await preview_module.get_preview_manager().preview(
+        tool, processor, params, upload, session_id, offset, duration, sample_rate, output_format
+    )
+
+@app.delete("/preview/{session_id}")
+async def close_preview(session_id: str):
+    """Close a preview session, removing its upload and previews"""
+    preview_module = await asyncio.to_thread(importlib.import_module, "shared.preview")
+    await preview_module.get_preview_manager().close(session_id)
+    return {"success": True, "session_id": session_id}
+
+# Analysis Service
+@app.post("/analyze")
+async def analyze(
+    file: UploadFile = File(...),
+    header_only: bool = Form(False),
+    use_cache: bool = Form(True)
+):
+    """Loudness (LUFS, true peak), peak/RMS levels, clipping and format of a file, in one streaming pass.
+
+    Results are indexed by content hash, so the same file is only measured
+    once. header_only returns just format, rate, channels and duration from
+    the container headers.
+    """
+    # Imported on first use, like the processors, to keep numpy/scipy out of gateway start-up
+    analysis_module = await asyncio.to_thread(importlib.import_module, "shared.analysis")
+    upload = await ingest_upload(file, UPLOAD_DIR)
+    return await analysis_module.analyze(upload, header_only, use_cache)
+
+@app.get("/analyze/{content_hash}")
+async def analysis_by_hash(content_hash: str):
+    """A previous /analyze result by the file's sha256, without uploading it again"""
+    analysis_module = await asyncio.to_thread(importlib.import_module, "shared.analysis")
+    return await analysis_module.indexed(content_hash)
+
+# Waveform Service
+@app.get("/waveform/{filename}")
+async def waveform(filename: str):
+    """Peak levels and spectrogram layout of a result's (or /analyze upload's) waveform file"""
+    # Imported on first use, like the processors, to keep numpy/scipy out of gateway start-up
+    waveform_module = await asyncio.to_thread(importlib.import_module, "shared.waveform")
+    return await waveform_module.waveform_info(filename)
+
+@app.get("/waveform/{filename}/peaks")
+async def waveform_peaks(
+    filename: str,
+    samples_per_pixel: Optional[int] = None,
+    start: float = 0.0,
+    end: Optional[float] = None
+):
+    """Min/max peaks from start to end seconds as an audiowaveform .dat file, from the nearest level"""
+    waveform_module = await asyncio.to_thread(importlib.import_module, "shared.waveform")
+    return await waveform_module.waveform_peaks(filename, samples_per_pixel, start, end)
+
+@app.get("/waveform/{filename}/spectrogram")
+async def waveform_spectrogram(filename: str, tile: int = 0, count: int = 1):
+    """Raw uint8 spectrogram tiles (columns of mel bands), see /waveform/{filename} for the layout"""
+    waveform_module = await asyncio.to_thread(importlib.import_module, "shared.waveform")
+    return await waveform_module.spectrogram_tiles(filename, tile, count)
+
+# Real-time Processing Service
+@app.websocket("/ws/realtime")
+async def realtime(websocket: WebSocket):
+    """Stream PCM chunks through stateful EQ, volume, noise reduction and fade effects.
+
+    Send a JSON config first, then binary PCM; see shared/realtime.py for the protocol.
+    """
+    # Imported on first use, like the processors, to keep numpy/scipy out of gateway start-up
+    realtime_module = await asyncio.to_thread(importlib.import_module, "shared.realtime")
+    await realtime_module.serve_realtime(websocket, processors.load)
+
+# Processing Pipeline Service
+@app.post("/pipeline")
+async def pipeline(
+    file: UploadFile = File(...),
+    steps: str = Form(...),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Run several tools in sequence, keeping audio in memory between steps.
+
+    steps is a JSON list such as
+    [{"tool": "noise-reduction", "params": {"reduction_strength": 0.6}},
+     {"tool": "equalizer", "params": {"low_gain": 3}},
+     {"tool": "converter", "params": {"output_format": "mp3"}}]
+    """
+    processor = await processors.load("pipeline")
+    if run_async:
+        return await _submit_job("pipeline", file, processor.process_file,
+                                 processor.parse_steps(steps), use_cache)
+    return await processor.process(file, steps, use_cache)
 
 if __name__ == "__main__":
     import uvicorn
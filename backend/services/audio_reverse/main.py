@@ -0,0 +1,28 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import AudioReverseProcessor
+
+app = create_service_app("audio_reverse", "Audio Reverse Service")
+processor = AudioReverseProcessor()
+
+@app.post("/process")
+async def process_audio_reverse(
+    file: UploadFile = File(...),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Reverse audio playback completely"""
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await submit_upload_job("audio_reverse", file, processor.process_file, output_format, output_quality,
+                                       use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, output_format, output_quality, use_cache)
@@ -1,58 +1,72 @@
 import os
 import uuid
 import numpy as np
-import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype, read_audio, write_audio
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class AudioReverseProcessor:
+    service_name = "audio_reverse"
+    version = "2"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file):
+    def check(self, output_format="wav", output_quality="high"):
+        check_output(output_format, output_quality)
+
+    async def process(self, file, output_format="wav", output_quality="high", use_cache=True):
         """Reverse audio playback completely"""
+        self.check(output_format, output_quality)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, output_format, output_quality, use_cache)
+
+    async def process_file(self, upload, output_format="wav", output_quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"output_format": output_format, "output_quality": output_quality}
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-
-            # Load audio
-            y, sr = librosa.load(upload_path, sr=None)
-            
-            # Reverse the audio array
-            y_reversed = np.flip(y)
-            
-            # Save processed file
-            output_filename = f"reversed_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, y_reversed, sr)
-            
+            self.check(output_format, output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._reverse, upload, output_format, output_quality),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Audio reversal failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Audio reversed successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "processing_info": {
-                    "operation": "complete_reverse",
-                    "duration": len(y) / sr,
-                    "sample_rate": int(sr),
-                    "channels": 1 if y.ndim == 1 else y.shape[0]
-                }
+            upload.remove()
+
+    def _reverse(self, upload, output_format="wav", output_quality="high"):
+        """Blocking reverse, runs in the worker pool"""
+        # Load audio, all channels
+        y, sr = read_audio(upload)
+
+        # Reverse the audio array
+        y_reversed = np.flip(y, axis=-1)
+
+        # Save processed file
+        output_filename = f"reversed_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        write_audio(output_path, y_reversed, sr, output_subtype(upload, output_format), output_format, output_quality)
+
+        return {
+            "success": True,
+            "message": "Audio reversed successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "processing_info": {
+                "operation": "complete_reverse",
+                "duration": y.shape[-1] / sr,
+                "sample_rate": int(sr),
+                "channels": y.shape[0]
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Audio reversal failed: {str(e)}")
\ No newline at end of file
+        }
@@ -0,0 +1,27 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import AudioSplitterProcessor
+
+app = create_service_app("audio_splitter", "Audio Splitter Service")
+processor = AudioSplitterProcessor()
+
+@app.post("/process")
+async def process_audio_split(
+    file: UploadFile = File(...),
+    split_type: str = Form("lr_channels"),
+    output_format: str = Form("wav"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Advanced audio channel splitting with multiple methods"""
+    if run_async:
+        return await submit_upload_job("audio_splitter", file, processor.process_file,
+                                       split_type, output_format, use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, split_type, output_format, use_cache)
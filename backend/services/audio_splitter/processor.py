@@ -1,173 +1,124 @@
 import os
 import uuid
-import numpy as np
-import librosa
-import soundfile as sf
+from contextlib import ExitStack
 from fastapi import HTTPException
+from shared.audio_io import output_subtype
+from shared.audio_stream import BlockSink, open_source
+from shared.executor import run_in_worker
+from shared.filterbank import CrossoverFilterBank
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class AudioSplitterProcessor:
+    service_name = "audio_splitter"
+    version = "3"
+
+    # Crossovers for the frequency_bands split
+    low_cutoff = 250   # Hz
+    mid_cutoff = 2000  # Hz
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, split_type="lr_channels", output_format="wav"):
+    async def process(self, file, split_type="lr_channels", output_format="wav", use_cache=True):
         """Advanced audio channel splitting with multiple methods"""
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, split_type, output_format, use_cache)
+
+    async def process_file(self, upload, split_type="lr_channels", output_format="wav", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"split_type": split_type, "output_format": output_format}
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._split, upload, split_type, output_format),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Audio splitting failed: {str(e)}")
+        finally:
+            # Clean up
+            upload.remove()
 
-            # Load audio file
-            y, sr = librosa.load(upload_path, sr=None, mono=False)
-            
-            output_files = []
-            processing_info = {
-                "original_channels": 1 if y.ndim == 1 else y.shape[0],
-                "sample_rate": int(sr),
-                "split_type": split_type
-            }
+    def _split(self, upload, split_type, output_format):
+        """Split audio into channels or bands block by block, runs in the worker pool"""
+        source = open_source(upload)
+        stereo = source.channels > 1
 
-            if split_type == "lr_channels":
-                # Left/Right channel separation
-                if y.ndim == 1:
-                    # Mono file - duplicate to stereo
-                    left_channel = y
-                    right_channel = y
-                    processing_info["note"] = "Mono file duplicated to both channels"
-                else:
-                    left_channel = y[0]
-                    right_channel = y[1] if y.shape[0] > 1 else y[0]
-                
-                # Save left channel
-                left_filename = f"left_channel_{uuid.uuid4()}.{output_format}"
-                left_path = f"{self.processed_dir}/{left_filename}"
-                sf.write(left_path, left_channel, sr)
-                output_files.append(f"/download/{left_filename}")
-                
-                # Save right channel
-                right_filename = f"right_channel_{uuid.uuid4()}.{output_format}"
-                right_path = f"{self.processed_dir}/{right_filename}"
-                sf.write(right_path, right_channel, sr)
-                output_files.append(f"/download/{right_filename}")
+        processing_info = {
+            "original_channels": source.channels,
+            "sample_rate": source.samplerate,
+            "split_type": split_type
+        }
 
-            elif split_type == "mid_side":
-                # Mid/Side processing for stereo enhancement
-                if y.ndim == 1:
-                    # Convert mono to stereo first
-                    y = np.array([y, y])
-                
-                if y.shape[0] >= 2:
-                    # Mid (center) = (L + R) / 2
-                    mid = (y[0] + y[1]) / 2
-                    # Side (stereo info) = (L - R) / 2  
-                    side = (y[0] - y[1]) / 2
-                else:
-                    mid = y[0]
-                    side = np.zeros_like(y[0])
-                
-                # Save mid channel
-                mid_filename = f"mid_channel_{uuid.uuid4()}.{output_format}"
-                mid_path = f"{self.processed_dir}/{mid_filename}"
-                sf.write(mid_path, mid, sr)
-                output_files.append(f"/download/{mid_filename}")
-                
-                # Save side channel
-                side_filename = f"side_channel_{uuid.uuid4()}.{output_format}"
-                side_path = f"{self.processed_dir}/{side_filename}"
-                sf.write(side_path, side, sr)
-                output_files.append(f"/download/{side_filename}")
+        if split_type == "lr_channels":
+            # Left/Right channel separation
+            names = ["left_channel", "right_channel"]
+            if not stereo:
+                # Mono file - duplicate to both outputs
+                processing_info["note"] = "Mono file duplicated to both channels"
+            split_block = lambda block: [block[0:1], block[1:2] if stereo else block[0:1]]
 
-            elif split_type == "frequency_bands":
-                # Split into frequency bands
-                if y.ndim > 1:
-                    y = np.mean(y, axis=0)  # Convert to mono for frequency splitting
-                
-                # Define frequency bands
-                low_cutoff = 250   # Hz
-                mid_cutoff = 2000  # Hz
-                
-                # Apply bandpass filters
-                y_low = self._bandpass_filter(y, 0, low_cutoff, sr)
-                y_mid = self._bandpass_filter(y, low_cutoff, mid_cutoff, sr)
-                y_high = self._bandpass_filter(y, mid_cutoff, sr//2, sr)
-                
-                # Save frequency bands
-                for band, audio, name in [
-                    ("low", y_low, f"low_freq_{uuid.uuid4()}.{output_format}"),
-                    ("mid", y_mid, f"mid_freq_{uuid.uuid4()}.{output_format}"),
-                    ("high", y_high, f"high_freq_{uuid.uuid4()}.{output_format}")
-                ]:
-                    band_path = f"{self.processed_dir}/{name}"
-                    sf.write(band_path, audio, sr)
-                    output_files.append(f"/download/{name}")
-                
-                processing_info["frequency_bands"] = {
-                    "low": f"0-{low_cutoff}Hz",
-                    "mid": f"{low_cutoff}-{mid_cutoff}Hz", 
-                    "high": f"{mid_cutoff}Hz+"
-                }
+        elif split_type == "mid_side":
+            # Mid (center) = (L + R) / 2, Side (stereo info) = (L - R) / 2
+            names = ["mid_channel", "side_channel"]
+            if stereo:
+                split_block = lambda block: [(block[0:1] + block[1:2]) / 2, (block[0:1] - block[1:2]) / 2]
+            else:
+                split_block = lambda block: [block[0:1], block[0:1] * 0]
 
-            elif split_type == "vocal_instrumental":
-                # Simple vocal/instrumental separation
-                if y.ndim == 1:
-                    y = np.array([y, y])
-                
-                if y.shape[0] >= 2:
-                    # Instrumental (center channel removal)
-                    instrumental = y[0] - y[1]
-                    # Vocal approximation (center content)
-                    vocal = (y[0] + y[1]) / 2 - instrumental * 0.5
-                else:
-                    instrumental = y[0]
-                    vocal = y[0] * 0.3  # Weak approximation
-                
-                # Save vocals
-                vocal_filename = f"vocals_{uuid.uuid4()}.{output_format}"
-                vocal_path = f"{self.processed_dir}/{vocal_filename}"
-                sf.write(vocal_path, vocal, sr)
-                output_files.append(f"/download/{vocal_filename}")
-                
-                # Save instrumental
-                instrumental_filename = f"instrumental_{uuid.uuid4()}.{output_format}"
-                instrumental_path = f"{self.processed_dir}/{instrumental_filename}"
-                sf.write(instrumental_path, instrumental, sr)
-                output_files.append(f"/download/{instrumental_filename}")
+        elif split_type == "frequency_bands":
+            # Linkwitz-Riley crossovers, so the three bands sum back to a flat response
+            bank = CrossoverFilterBank([self.low_cutoff, self.mid_cutoff], source.samplerate, 1)
+            names = ["low_freq", "mid_freq", "high_freq"]
+            # Frequency splitting works on a mono downmix
+            split_block = lambda block: bank.split(block.mean(axis=0, keepdims=True))
+            processing_info["frequency_bands"] = dict(zip(["low", "mid", "high"], bank.band_ranges()))
+            processing_info["filter"] = "linkwitz_riley_4"
 
-            # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": f"Audio split using {split_type} method successfully",
-                "output_files": output_files,
-                "download_urls": output_files,
-                "processing_info": processing_info,
-                "split_count": len(output_files)
-            }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Audio splitting failed: {str(e)}")
+        elif split_type == "vocal_instrumental":
+            # Simple vocal/instrumental separation
+            names = ["vocals", "instrumental"]
+            if stereo:
+                def split_block(block):
+                    # Instrumental (center channel removal), vocal approximation (center content)
+                    instrumental = block[0:1] - block[1:2]
+                    vocal = (block[0:1] + block[1:2]) / 2 - instrumental * 0.5
+                    return [vocal, instrumental]
+            else:
+                # Mono input duplicated to stereo has no side signal to remove
+                split_block = lambda block: [block[0:1], block[0:1] * 0]
+
+        else:
+            names = []
+
+        output_files = self._write_outputs(source, names, split_block if names else None, output_format,
+                                          output_subtype(upload, output_format))
+
+        return {
+            "success": True,
+            "message": f"Audio split using {split_type} method successfully",
+            "output_files": output_files,
+            "download_urls": output_files,
+            "processing_info": processing_info,
+            "split_count": len(output_files)
+        }
 
-    def _bandpass_filter(self, data, lowcut, highcut, fs):
-        """Simple frequency domain bandpass filter"""
-        # FFT-based filtering
-        fft_data = np.fft.fft(data)
-        freqs = np.fft.fftfreq(len(data), 1/fs)
-        
-        # Create filter mask
-        mask = np.zeros_like(freqs, dtype=bool)
-        mask[(np.abs(freqs) >= lowcut) & (np.abs(freqs) <= highcut)] = True
-        
-        # Apply filter
-        fft_data[~mask] = 0
-        return np.real(np.fft.ifft(fft_data))
\ No newline at end of file
+    def _write_outputs(self, source, names, split_block, output_format, subtype=None):
+        """Stream the source once, writing each block's parts (and their waveforms) to one mono file per name"""
+        if not names:
+            return []
+        filenames = [f"{name}_{uuid.uuid4()}.{output_format}" for name in names]
+        with ExitStack() as stack:
+            sinks = [stack.enter_context(BlockSink(f"{self.processed_dir}/{filename}", source.samplerate, 1,
+                                                   subtype, output_format))
+                     for filename in filenames]
+            for block in source.blocks():
+                for sink, part in zip(sinks, split_block(block)):
+                    sink.write(part)
+        return [f"/download/{filename}" for filename in filenames]
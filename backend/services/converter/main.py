@@ -0,0 +1,27 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import ConverterProcessor
+
+app = create_service_app("converter", "Format Converter Service")
+processor = ConverterProcessor()
+
+@app.post("/process")
+async def process_conversion(
+    file: UploadFile = File(...),
+    output_format: str = Form("mp3"),
+    quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Convert audio between different formats"""
+    if run_async:
+        return await submit_upload_job("converter", file, processor.process_file,
+                                       output_format, quality, use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, output_format, quality, use_cache)
@@ -2,65 +2,82 @@ import os
 import uuid
 from pydub import AudioSegment
 from fastapi import HTTPException
+from shared.audio_utils import AudioUtils
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class ConverterProcessor:
+    service_name = "converter"
+    version = "1"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, output_format="mp3", quality="high"):
+    async def process(self, file, output_format="mp3", quality="high", use_cache=True):
         """Convert audio between different formats"""
-        try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, output_format, quality, use_cache)
 
-            # Load audio with pydub
-            audio = AudioSegment.from_file(upload_path)
-            
-            # Quality settings
-            export_params = {}
-            if output_format == "mp3":
-                if quality == "high":
-                    export_params = {"bitrate": "320k"}
-                elif quality == "medium":
-                    export_params = {"bitrate": "192k"}
-                else:
-                    export_params = {"bitrate": "128k"}
-            elif output_format == "wav":
-                export_params = {"parameters": ["-acodec", "pcm_s16le"]}
-            
-            # Save processed file
-            output_filename = f"converted_{uuid.uuid4()}.{output_format}"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            audio.export(output_path, format=output_format, **export_params)
-            
+    async def process_file(self, upload, output_format="mp3", quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"output_format": output_format, "quality": quality}
+        try:
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._convert, upload.path, output_format, quality),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": f"Audio converted to {output_format.upper()} successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "conversion_details": {
-                    "output_format": output_format,
-                    "quality": quality,
-                    "duration_ms": len(audio),
-                    "channels": audio.channels,
-                    "sample_rate": audio.frame_rate
-                }
+            upload.remove()
+
+    def export_params(self, output_format, quality):
+        """ffmpeg export settings for a format/quality pair"""
+        if output_format == "mp3":
+            if quality == "high":
+                return {"bitrate": "320k"}
+            elif quality == "medium":
+                return {"bitrate": "192k"}
+            else:
+                return {"bitrate": "128k"}
+        elif output_format == "wav":
+            return {"parameters": ["-acodec", "pcm_s16le"]}
+        return {}
+
+    def export(self, y, sr, output_path, output_format="mp3", quality="high"):
+        """Encode a decoded signal to output_path, returns the encoded AudioSegment"""
+        audio = AudioUtils.array_to_segment(y, sr)
+        audio.export(output_path, format=output_format, **self.export_params(output_format, quality))
+        return audio
+
+    def _convert(self, upload_path, output_format, quality):
+        """Blocking conversion, runs in the worker pool"""
+        # Load audio with pydub
+        audio = AudioSegment.from_file(upload_path)
+        
+        # Save processed file
+        output_filename = f"converted_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        audio.export(output_path, format=output_format, **self.export_params(output_format, quality))
+        
+        return {
+            "success": True,
+            "message": f"Audio converted to {output_format.upper()} successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "conversion_details": {
+                "output_format": output_format,
+                "quality": quality,
+                "duration_ms": len(audio),
+                "channels": audio.channels,
+                "sample_rate": audio.frame_rate
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}")
\ No newline at end of file
+        }
@@ -0,0 +1,43 @@
+import os
+import sys
+from typing import List, Optional
+from fastapi import File, UploadFile, Form, HTTPException
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import CutterJoinerProcessor
+
+app = create_service_app("cutter_joiner", "Cutter & Joiner Service")
+processor = CutterJoinerProcessor()
+
+@app.post("/process")
+async def process_cut_join(
+    file: Optional[UploadFile] = File(None),
+    files: List[UploadFile] = File(None),
+    operation: str = Form("cut"),
+    start_time: float = Form(0.0),
+    end_time: float = Form(None),
+    crossfade: float = Form(0.0),
+    output_format: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Cut or join audio files; operation=join concatenates file and/or files in order"""
+    if operation == "join":
+        inputs = ([file] if file is not None else []) + (files or [])
+        output_format = output_format or "wav"
+        processor.check_join(len(inputs), crossfade, output_format)
+        if run_async:
+            return await submit_upload_job("cutter_joiner", inputs, processor.join_files,
+                                           crossfade, output_format, use_cache, upload_dir=processor.upload_dir)
+        return await processor.join(inputs, crossfade, output_format, use_cache)
+    if file is None:
+        raise HTTPException(status_code=400, detail="A file is required")
+    if run_async:
+        return await submit_upload_job("cutter_joiner", file, processor.process_file,
+                                       operation, start_time, end_time, output_format, use_cache,
+                                       upload_dir=processor.upload_dir)
+    return await processor.process(file, operation, start_time, end_time, output_format, use_cache)
@@ -1,79 +1,221 @@
 import os
 import uuid
+import hashlib
+import subprocess
+import soundfile as sf
 from pydub import AudioSegment
 from fastapi import HTTPException
+from shared.audio_cut import STREAM_COPY_EXTENSIONS, cut_frames, frame_range, is_seekable, stream_copy
+from shared.audio_io import output_subtype, read_audio, write_audio
+from shared.audio_join import join_stream
+from shared.audio_stream import open_source, write_blocks
+from shared.audio_utils import AudioUtils
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload, ingest_uploads
 
 class CutterJoinerProcessor:
+    service_name = "cutter_joiner"
+    version = "2"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, operation="cut", start_time=0.0, end_time=None):
+    async def process(self, file, operation="cut", start_time=0.0, end_time=None, output_format=None, use_cache=True):
         """Cut or join audio files with precision timing"""
+        self._check_range(operation, start_time, end_time)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, operation, start_time, end_time, output_format, use_cache)
+
+    async def process_file(self, upload, operation="cut", start_time=0.0, end_time=None, output_format=None,
+                           use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"operation": operation, "start_time": start_time, "end_time": end_time,
+                  "output_format": output_format}
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-
-            # Load audio
-            audio = AudioSegment.from_file(upload_path)
-            
-            if operation == "cut":
-                # Convert seconds to milliseconds
-                start_ms = int(start_time * 1000)
-                end_ms = int(end_time * 1000) if end_time else len(audio)
-                
-                # Cut audio
-                processed_audio = audio[start_ms:end_ms]
-                operation_msg = f"Audio cut from {start_time}s to {end_time or len(audio)/1000}s"
-                
-            elif operation == "fade_in":
-                # Apply fade in effect
-                fade_duration = int((end_time or 2.0) * 1000)
-                processed_audio = audio.fade_in(fade_duration)
-                operation_msg = f"Fade in applied for {fade_duration/1000}s"
-                
-            elif operation == "fade_out":
-                # Apply fade out effect  
-                fade_duration = int((end_time or 2.0) * 1000)
-                processed_audio = audio.fade_out(fade_duration)
-                operation_msg = f"Fade out applied for {fade_duration/1000}s"
-                
-            else:
-                processed_audio = audio
-                operation_msg = "No operation applied"
-            
-            # Save processed file
-            output_filename = f"{operation}_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            processed_audio.export(output_path, format="wav")
-            
+            self._check_range(operation, start_time, end_time)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._cut, upload, operation, start_time, end_time,
+                                      output_format),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Audio cutting/joining failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": operation_msg,
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "operation_details": {
-                    "operation": operation,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "original_duration": len(audio) / 1000,
-                    "processed_duration": len(processed_audio) / 1000
-                }
-            }
-            
+            upload.remove()
+
+    async def join(self, files, crossfade=0.0, output_format="wav", use_cache=True):
+        """Join several uploads end to end, with optional equal-power crossfades (seconds)"""
+        self.check_join(len(files), crossfade, output_format)
+        uploads = await ingest_uploads(files, self.upload_dir)
+        return await self.join_files(uploads, crossfade, output_format, use_cache)
+
+    async def join_files(self, uploads, crossfade=0.0, output_format="wav", use_cache=True):
+        """Like join(), for uploads already on disk; removes them afterwards"""
+        params = {"operation": "join", "crossfade": crossfade, "output_format": output_format}
+        # The result depends on every input and their order
+        content_hash = hashlib.sha256(":".join(upload.content_hash for upload in uploads).encode()).hexdigest()
+        try:
+            self.check_join(len(uploads), crossfade, output_format)
+            return await cached_result(
+                self.service_name, self.version, content_hash, params,
+                lambda: run_in_worker(self.service_name, self._join, uploads, crossfade, output_format),
+                use_cache
+            )
         except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Audio cutting/joining failed: {str(e)}")
+        finally:
+            # Clean up
+            for upload in uploads:
+                upload.remove()
+
+    def check_join(self, count, crossfade, output_format):
+        if count < 2:
+            raise HTTPException(status_code=400, detail="Join needs at least two files")
+        if crossfade < 0:
+            raise HTTPException(status_code=400, detail="crossfade must not be negative")
+        if not sf.check_format(output_format.upper()):
+            raise HTTPException(status_code=400, detail=f"Unsupported join output format '{output_format}'")
+
+    def _check_range(self, operation, start_time, end_time):
+        if operation == "cut" and (start_time < 0 or (end_time is not None and end_time <= start_time)):
+            raise HTTPException(status_code=400, detail="Cut range needs 0 <= start_time < end_time")
+
+    def _cut(self, upload, operation, start_time, end_time, output_format=None):
+        """Blocking cut/fade, runs in the worker pool"""
+        if operation == "cut":
+            return self._cut_range(upload, start_time, end_time, output_format)
+
+        # Load audio
+        audio = AudioSegment.from_file(upload.path)
+
+        if operation == "fade_in":
+            # Apply fade in effect
+            fade_duration = int((end_time or 2.0) * 1000)
+            processed_audio = audio.fade_in(fade_duration)
+            operation_msg = f"Fade in applied for {fade_duration/1000}s"
+
+        elif operation == "fade_out":
+            # Apply fade out effect
+            fade_duration = int((end_time or 2.0) * 1000)
+            processed_audio = audio.fade_out(fade_duration)
+            operation_msg = f"Fade out applied for {fade_duration/1000}s"
+
+        else:
+            processed_audio = audio
+            operation_msg = "No operation applied"
+
+        # Save processed file
+        output_filename = f"{operation}_{uuid.uuid4()}.wav"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        processed_audio.export(output_path, format="wav")
+
+        return {
+            "success": True,
+            "message": operation_msg,
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "operation_details": {
+                "operation": operation,
+                "start_time": start_time,
+                "end_time": end_time,
+                "original_duration": len(audio) / 1000,
+                "processed_duration": len(processed_audio) / 1000
+            }
+        }
+
+    def _join(self, uploads, crossfade, output_format):
+        """Blocking streaming join, runs in the worker pool"""
+        # Common layout is the highest sample rate and channel count (header reads for PCM/FLAC)
+        layouts = [(source.samplerate, source.channels) for source in map(open_source, uploads)]
+        samplerate = max(sr for sr, _ in layouts)
+        channels = max(ch for _, ch in layouts)
+
+        # Sources are opened one at a time as the join reaches them
+        blocks = join_stream((open_source(upload) for upload in uploads), samplerate, channels,
+                             int(round(crossfade * samplerate)))
+        output_filename = f"joined_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        frames = write_blocks((block.clip(-1.0, 1.0) for block in blocks), output_path, samplerate, channels,
+                              output_subtype(uploads[0], output_format))
+
+        return {
+            "success": True,
+            "message": f"Joined {len(uploads)} files successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "operation_details": {
+                "operation": "join",
+                "file_count": len(uploads),
+                "input_files": [upload.filename for upload in uploads],
+                "crossfade": crossfade,
+                "output_format": output_format,
+                "sample_rate": samplerate,
+                "channels": channels,
+                "processed_duration": frames / samplerate
+            }
+        }
+
+    def _cut_range(self, upload, start_time, end_time, output_format=None):
+        """Cut without a full decode: frame copy for PCM/FLAC, stream copy for compressed formats.
+
+        Output keeps the source format unless output_format asks for another one,
+        which (like a missing ffmpeg) falls back to decoding and re-encoding.
+        """
+        source_format = upload.extension
+        output_format = (output_format or source_format).lower()
+        output_filename = f"cut_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+
+        details = None
+        if output_format == source_format:
+            if is_seekable(upload.path):
+                details = cut_frames(upload.path, output_path, start_time, end_time)
+            elif source_format in STREAM_COPY_EXTENSIONS:
                 try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Audio cutting/joining failed: {str(e)}")
\ No newline at end of file
+                    details = stream_copy(upload.path, output_path, start_time, end_time)
+                except (OSError, subprocess.SubprocessError):
+                    details = None
+        if details is None:
+            details = self._cut_decoded(upload, output_path, start_time, end_time, output_format)
+
+        end_label = end_time if end_time is not None else details["original_duration"]
+        return {
+            "success": True,
+            "message": f"Audio cut from {start_time}s to {end_label}s",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "operation_details": {
+                "operation": "cut",
+                "start_time": start_time,
+                "end_time": end_time,
+                "output_format": output_format,
+                **details
+            }
+        }
+
+    def _cut_decoded(self, upload, output_path, start_time, end_time, output_format):
+        """Fallback: slice the decoded signal (through the decode cache) and encode it"""
+        y, sr = read_audio(upload)
+        start, end = frame_range(start_time, end_time, sr, y.shape[-1])
+        segment = y[:, start:end]
+        if sf.check_format(output_format.upper()):
+            write_audio(output_path, segment, sr, output_subtype(upload, output_format))
+        else:
+            AudioUtils.array_to_segment(segment, sr).export(output_path, format=output_format)
+        return {
+            "method": "decode",
+            "start_frame": start,
+            "end_frame": end,
+            "original_duration": y.shape[-1] / sr,
+            "processed_duration": (end - start) / sr
+        }
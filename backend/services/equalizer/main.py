@@ -0,0 +1,37 @@
+import os
+import sys
+from typing import Optional
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import EqualizerProcessor
+
+app = create_service_app("equalizer", "Equalizer Service")
+processor = EqualizerProcessor()
+
+@app.post("/process")
+async def process_equalizer(
+    file: UploadFile = File(...),
+    low_gain: float = Form(0.0),
+    mid_gain: float = Form(0.0),
+    high_gain: float = Form(0.0),
+    crossovers: Optional[str] = Form(None),
+    band_gains: Optional[str] = Form(None),
+    bands: Optional[str] = Form(None),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Apply 3-band, N-band (crossovers + band_gains) or parametric (bands JSON) equalization"""
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await submit_upload_job("equalizer", file, processor.process_file,
+                                       low_gain, mid_gain, high_gain, crossovers, band_gains, bands,
+                                       output_format, output_quality, use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, low_gain, mid_gain, high_gain, crossovers, band_gains, bands,
+                                   output_format, output_quality, use_cache)
@@ -1,93 +1,205 @@
 import os
 import uuid
-import numpy as np
+import json
 import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype
+from shared.audio_stream import ArraySource, collect, open_source, write_peak_normalized
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.filterbank import FILTER_TYPES, CrossoverFilterBank, SOSFilter, parametric_sos
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class EqualizerProcessor:
+    service_name = "equalizer"
+    version = "3"
+
+    # Define frequency bands
+    low_freq = 300  # Hz
+    high_freq = 3000  # Hz
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    def butter_bandpass_filter(self, data, lowcut, highcut, fs, order=4):
-        """Simple bandpass filter using numpy FFT"""
-        # Simple frequency domain filtering
-        fft_data = np.fft.fft(data)
-        freqs = np.fft.fftfreq(len(data), 1/fs)
-        
-        # Create filter mask
-        mask = np.zeros_like(freqs, dtype=bool)
-        mask[(np.abs(freqs) >= lowcut) & (np.abs(freqs) <= highcut)] = True
-        
-        # Apply filter
-        fft_data[~mask] = 0
-        return np.real(np.fft.ifft(fft_data))
-
-    async def process(self, file, low_gain=0.0, mid_gain=0.0, high_gain=0.0):
-        """Apply 3-band equalizer with frequency adjustment"""
+    def band_settings(self, low_gain=0.0, mid_gain=0.0, high_gain=0.0, crossovers=None, band_gains=None):
+        """Resolve crossover frequencies and per-band gains; crossovers/band_gains override the 3-band defaults.
+
+        Both accept a list or a comma-separated string, with one more gain than crossovers.
+        """
+        if crossovers is None and band_gains is None:
+            return [float(self.low_freq), float(self.high_freq)], [low_gain, mid_gain, high_gain]
+        try:
+            crossovers = self._number_list(crossovers) if crossovers is not None else [self.low_freq, self.high_freq]
+            band_gains = self._number_list(band_gains) if band_gains is not None else [0.0] * (len(crossovers) + 1)
+        except (TypeError, ValueError):
+            raise ValueError("crossovers and band_gains must be lists of numbers")
+        if not crossovers or any(freq <= 0 for freq in crossovers):
+            raise ValueError("crossovers must be positive frequencies in Hz")
+        if len(band_gains) != len(crossovers) + 1:
+            raise ValueError(f"Expected {len(crossovers) + 1} band gains for {len(crossovers)} crossovers")
+        return sorted(crossovers), band_gains
+
+    def parse_bands(self, bands):
+        """Validate a parametric band list (JSON string or list) into [{"type", "freq", "gain", "q"}]
+
+        Each band needs a type (peaking, low_shelf, high_shelf, lowpass, highpass)
+        and freq in Hz; gain (dB, default 0) and q (default 0.707) are optional.
+        """
+        if isinstance(bands, str):
+            try:
+                bands = json.loads(bands)
+            except ValueError:
+                raise ValueError("bands must be a JSON list")
+        if not isinstance(bands, list) or not bands:
+            raise ValueError("bands must be a non-empty list")
+
+        parsed = []
+        for index, band in enumerate(bands):
+            if not isinstance(band, dict) or "type" not in band or "freq" not in band:
+                raise ValueError(f"Band {index} must be an object with a 'type' and 'freq'")
+            filter_type = str(band["type"]).lower().replace("-", "_")
+            if filter_type not in FILTER_TYPES:
+                raise ValueError(f"Band {index}: unknown type '{band['type']}', expected one of {', '.join(FILTER_TYPES)}")
+            try:
+                freq = float(band["freq"])
+                gain = float(band.get("gain", 0.0))
+                q = float(band.get("q", 0.707))
+            except (TypeError, ValueError):
+                raise ValueError(f"Band {index}: freq, gain and q must be numbers")
+            if freq <= 0 or q <= 0:
+                raise ValueError(f"Band {index}: freq and q must be positive")
+            parsed.append({"type": filter_type, "freq": freq, "gain": gain, "q": q})
+        return parsed
+
+    def _checked(self, parse, *args):
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-
-            # Load audio
-            y, sr = librosa.load(upload_path, sr=None)
-            
-            # Define frequency bands
-            low_freq = 300  # Hz
-            high_freq = 3000  # Hz
-            
-            # Apply frequency domain filtering
-            low_filtered = self.butter_bandpass_filter(y, 0, low_freq, sr)
-            mid_filtered = self.butter_bandpass_filter(y, low_freq, high_freq, sr)  
-            high_filtered = self.butter_bandpass_filter(y, high_freq, sr/2, sr)
-            
-            # Apply gains (convert dB to linear)
-            low_filtered *= 10**(low_gain/20)
-            mid_filtered *= 10**(mid_gain/20)
-            high_filtered *= 10**(high_gain/20)
-            
-            # Combine all bands
-            y_equalized = low_filtered + mid_filtered + high_filtered
-            
-            # Normalize to prevent clipping
-            y_equalized = librosa.util.normalize(y_equalized)
-            
-            # Save processed file
-            output_filename = f"equalized_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, y_equalized, sr)
-            
+            return parse(*args)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @staticmethod
+    def _number_list(value):
+        if isinstance(value, str):
+            value = [part for part in value.split(",") if part.strip()]
+        return [float(part) for part in value]
+
+    def check(self, output_format="wav", output_quality="high"):
+        check_output(output_format, output_quality)
+
+    async def process(self, file, low_gain=0.0, mid_gain=0.0, high_gain=0.0,
+                      crossovers=None, band_gains=None, bands=None, output_format="wav", output_quality="high",
+                      use_cache=True):
+        """Apply 3-band (or N-band) equalizer, or a parametric EQ when bands are given"""
+        self.check(output_format, output_quality)
+        if bands is not None:
+            self._checked(self.parse_bands, bands)
+        else:
+            self._checked(self.band_settings, low_gain, mid_gain, high_gain, crossovers, band_gains)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, low_gain, mid_gain, high_gain, crossovers, band_gains, bands,
+                                       output_format, output_quality, use_cache)
+
+    async def process_file(self, upload, low_gain=0.0, mid_gain=0.0, high_gain=0.0,
+                           crossovers=None, band_gains=None, bands=None, output_format="wav", output_quality="high",
+                           use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        try:
+            self.check(output_format, output_quality)
+            if bands is not None:
+                bands = self._checked(self.parse_bands, bands)
+                params = {"bands": bands}
+                worker_args = (None, None, bands)
+            else:
+                crossovers, band_gains = self._checked(self.band_settings, low_gain, mid_gain, high_gain,
+                                                       crossovers, band_gains)
+                params = {"crossovers": crossovers, "band_gains": band_gains}
+                worker_args = (crossovers, band_gains, None)
+            params.update(output_format=output_format, output_quality=output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._equalize, upload, *worker_args,
+                                      output_format, output_quality),
+                use_cache
+            )
+        except ValueError as e:
+            # Crossovers or bands at/above the source's Nyquist only show up once the worker knows its rate
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Equalizer processing failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "3-band equalizer applied successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "eq_settings": {
-                    "low_gain_db": low_gain,
-                    "mid_gain_db": mid_gain,
-                    "high_gain_db": high_gain,
-                    "frequency_bands": {
-                        "low": f"0-{low_freq}Hz",
-                        "mid": f"{low_freq}-{high_freq}Hz",
-                        "high": f"{high_freq}Hz+"
-                    }
-                }
+            upload.remove()
+
+    def equalize_stream(self, source, crossovers, band_gains):
+        """Yield equalized blocks from a block source, one filter-bank pass per block"""
+        bank = CrossoverFilterBank(crossovers, source.samplerate, source.channels)
+        for block in source.blocks():
+            yield bank.apply_gains(block, band_gains)
+
+    def parametric_stream(self, source, bands):
+        """Yield blocks through the parametric chain, one SOS cascade over all channels"""
+        spec = tuple((band["type"], band["freq"], band["gain"], band["q"]) for band in bands)
+        cascade = SOSFilter(parametric_sos(source.samplerate, spec), source.channels)
+        for block in source.blocks():
+            yield cascade(block)
+
+    def equalize(self, y, sr, low_gain=0.0, mid_gain=0.0, high_gain=0.0, crossovers=None, band_gains=None,
+                 bands=None):
+        """Apply the EQ to a decoded signal"""
+        source = ArraySource(y, sr)
+        if bands is not None:
+            blocks = self.parametric_stream(source, self.parse_bands(bands))
+        else:
+            crossovers, band_gains = self.band_settings(low_gain, mid_gain, high_gain, crossovers, band_gains)
+            blocks = self.equalize_stream(source, crossovers, band_gains)
+        y_equalized = collect(blocks)
+        if y.ndim == 1:
+            y_equalized = y_equalized[0]
+
+        # Normalize to prevent clipping
+        return librosa.util.normalize(y_equalized, axis=None)
+
+    def _equalize(self, upload, crossovers, band_gains, bands=None, output_format="wav", output_quality="high"):
+        """Blocking equalization, runs in the worker pool"""
+        source = open_source(upload)
+        if bands is not None:
+            blocks = lambda: self.parametric_stream(source, bands)
+            message = f"Parametric equalizer with {len(bands)} bands applied successfully"
+            eq_settings = {"bands": bands, "filter": "biquad_cascade"}
+        else:
+            bank = CrossoverFilterBank(crossovers, source.samplerate, source.channels)
+            blocks = lambda: self.equalize_stream(source, crossovers, band_gains)
+            message = f"{bank.band_count}-band equalizer applied successfully"
+            eq_settings = {
+                "frequency_bands": dict(zip(self._band_names(bank.band_count), bank.band_ranges())),
+                "band_gains_db": band_gains,
+                "filter": "linkwitz_riley_4"
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Equalizer processing failed: {str(e)}")
\ No newline at end of file
+            if bank.band_count == 3:
+                eq_settings.update(low_gain_db=band_gains[0], mid_gain_db=band_gains[1], high_gain_db=band_gains[2])
+
+        # Save processed file, normalized to prevent clipping
+        output_filename = f"equalized_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        write_peak_normalized(blocks, output_path, source.samplerate, source.channels,
+                              output_subtype(upload, output_format), output_format, output_quality)
+
+        return {
+            "success": True,
+            "message": message,
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "eq_settings": eq_settings
+        }
+
+    @staticmethod
+    def _band_names(count):
+        if count == 3:
+            return ["low", "mid", "high"]
+        return [f"band_{index + 1}" for index in range(count)]
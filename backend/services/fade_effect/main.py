@@ -0,0 +1,27 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import FadeEffectProcessor
+
+app = create_service_app("fade_effect", "Fade Effect Service")
+processor = FadeEffectProcessor()
+
+@app.post("/process")
+async def process_fade_effect(
+    file: UploadFile = File(...),
+    fade_in_duration: float = Form(2.0),
+    fade_out_duration: float = Form(2.0),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Add fade in/out effects to audio"""
+    if run_async:
+        return await submit_upload_job("fade_effect", file, processor.process_file,
+                                       fade_in_duration, fade_out_duration, use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, fade_in_duration, fade_out_duration, use_cache)
@@ -1,65 +1,75 @@
 import os
 import uuid
-import numpy as np
 from pydub import AudioSegment
 from fastapi import HTTPException
+from shared.audio_utils import AudioUtils
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class FadeEffectProcessor:
+    service_name = "fade_effect"
+    version = "2"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, fade_in_duration=2.0, fade_out_duration=2.0):
+    async def process(self, file, fade_in_duration=2.0, fade_out_duration=2.0, use_cache=True):
         """Add professional fade in/out effects to audio"""
-        try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, fade_in_duration, fade_out_duration, use_cache)
 
-            # Load audio
-            audio = AudioSegment.from_file(upload_path)
-            
-            # Convert durations to milliseconds
-            fade_in_ms = int(fade_in_duration * 1000)
-            fade_out_ms = int(fade_out_duration * 1000)
-            
-            # Apply fade effects
-            if fade_in_duration > 0:
-                audio = audio.fade_in(min(fade_in_ms, len(audio) // 2))
-            
-            if fade_out_duration > 0:
-                audio = audio.fade_out(min(fade_out_ms, len(audio) // 2))
-            
-            # Save processed file
-            output_filename = f"fade_effect_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            audio.export(output_path, format="wav")
-            
+    async def process_file(self, upload, fade_in_duration=2.0, fade_out_duration=2.0, use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"fade_in_duration": fade_in_duration, "fade_out_duration": fade_out_duration}
+        try:
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._fade, upload.path, fade_in_duration, fade_out_duration),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Fade effect processing failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Fade effects applied successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "fade_settings": {
-                    "fade_in_duration": fade_in_duration,
-                    "fade_out_duration": fade_out_duration,
-                    "total_duration": len(audio) / 1000,
-                    "fade_type": "linear"
-                }
+            upload.remove()
+
+    def apply_fades(self, y, sr, fade_in_duration=2.0, fade_out_duration=2.0):
+        """Linear fade in/out on a decoded signal, each capped at half its length"""
+        half = y.shape[-1] // 2
+        fade_in_samples = min(int(fade_in_duration * sr), half) if fade_in_duration > 0 else 0
+        fade_out_samples = min(int(fade_out_duration * sr), half) if fade_out_duration > 0 else 0
+        return AudioUtils.apply_fade(y, fade_in_samples, fade_out_samples)
+
+    def _fade(self, upload_path, fade_in_duration, fade_out_duration):
+        """Blocking fades, runs in the worker pool"""
+        # Load audio
+        audio = AudioSegment.from_file(upload_path)
+        
+        # Apply fade effects
+        y = AudioUtils.segment_to_array(audio)
+        y_faded = self.apply_fades(y, audio.frame_rate, fade_in_duration, fade_out_duration)
+        audio = AudioUtils.array_to_segment(y_faded, audio.frame_rate, audio.sample_width)
+        
+        # Save processed file
+        output_filename = f"fade_effect_{uuid.uuid4()}.wav"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        audio.export(output_path, format="wav")
+        
+        return {
+            "success": True,
+            "message": "Fade effects applied successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "fade_settings": {
+                "fade_in_duration": fade_in_duration,
+                "fade_out_duration": fade_out_duration,
+                "total_duration": len(audio) / 1000,
+                "fade_type": "linear"
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Fade effect processing failed: {str(e)}")
\ No newline at end of file
+        }
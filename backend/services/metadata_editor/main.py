@@ -0,0 +1,29 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import MetadataEditorProcessor
+
+app = create_service_app("metadata_editor", "Metadata Editor Service")
+processor = MetadataEditorProcessor()
+
+@app.post("/process")
+async def process_metadata(
+    file: UploadFile = File(...),
+    title: str = Form(None),
+    artist: str = Form(None),
+    album: str = Form(None),
+    year: str = Form(None),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Edit audio metadata and MP3 tags"""
+    if run_async:
+        return await submit_upload_job("metadata_editor", file, processor.process_file,
+                                       title, artist, album, year, use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, title, artist, album, year, use_cache)
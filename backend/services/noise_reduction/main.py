@@ -0,0 +1,31 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import NoiseReductionProcessor
+
+app = create_service_app("noise_reduction", "Noise Reduction Service")
+processor = NoiseReductionProcessor()
+
+@app.post("/process")
+async def process_noise_reduction(
+    file: UploadFile = File(...),
+    reduction_strength: float = Form(0.8),
+    stationary: bool = Form(True),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Reduce background noise using advanced algorithms"""
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await submit_upload_job("noise_reduction", file, processor.process_file,
+                                       reduction_strength, stationary, output_format, output_quality, use_cache,
+                                       upload_dir=processor.upload_dir)
+    return await processor.process(file, reduction_strength, stationary, output_format, output_quality, use_cache)
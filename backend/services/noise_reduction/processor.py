@@ -2,77 +2,122 @@ import os
 import uuid
 import numpy as np
 import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype
+from shared.audio_stream import ArraySource, collect, open_source, write_peak_normalized
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.stft import default_stft
+from shared.upload import ingest_upload
 
 class NoiseReductionProcessor:
+    service_name = "noise_reduction"
+    version = "3"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, reduction_strength=0.8, stationary=True):
+    def check(self, output_format="wav", output_quality="high"):
+        check_output(output_format, output_quality)
+
+    async def process(self, file, reduction_strength=0.8, stationary=True, output_format="wav",
+                      output_quality="high", use_cache=True):
         """Advanced noise reduction using spectral subtraction"""
+        self.check(output_format, output_quality)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, reduction_strength, stationary, output_format, output_quality,
+                                       use_cache)
+
+    async def process_file(self, upload, reduction_strength=0.8, stationary=True, output_format="wav",
+                           output_quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"reduction_strength": reduction_strength, "stationary": stationary,
+                  "output_format": output_format, "output_quality": output_quality}
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            self.check(output_format, output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._reduce_noise, upload, reduction_strength, stationary,
+                                      output_format, output_quality),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Noise reduction failed: {str(e)}")
+        finally:
+            # Clean up
+            upload.remove()
+
+    def reduce_noise_stream(self, source, reduction_strength=0.8, stationary=True):
+        """Spectral subtraction over a block source, yields un-normalized output blocks"""
+        engine = default_stft()
+        
+        # Estimate noise profile from first 10% of audio
+        noise_frames = max(1, int(engine.frame_count(source.frames) * 0.1))
+        profile_sum, seen = 0.0, 0
+        for spectrum in engine.spectra(source.blocks()):
+            take = min(spectrum.shape[-1], noise_frames - seen)
+            profile_sum = profile_sum + np.abs(spectrum[..., :take]).sum(axis=-1, keepdims=True)
+            seen += take
+            if seen >= noise_frames:
+                break
+        noise_profile = profile_sum / max(seen, 1)
+        
+        return engine.process(source.blocks(), self.spectral_subtractor(noise_profile, reduction_strength, stationary))
 
-            # Load audio
-            y, sr = librosa.load(upload_path, sr=None)
-            
-            # Apply spectral subtraction noise reduction
-            S = librosa.stft(y)
-            magnitude = np.abs(S)
-            phase = np.angle(S)
-            
-            # Estimate noise profile from first 10% of audio
-            noise_frames = max(1, int(magnitude.shape[1] * 0.1))
-            noise_profile = np.mean(magnitude[:, :noise_frames], axis=1, keepdims=True)
-            
-            # Apply spectral subtraction
-            alpha = reduction_strength + 1  # Over-subtraction factor
-            subtracted = magnitude - alpha * noise_profile
-            
+    def spectral_subtractor(self, noise_profile, reduction_strength=0.8, stationary=True):
+        """Frame operation subtracting a (channels, bins, 1) magnitude profile from spectrum batches"""
+        alpha = reduction_strength + 1  # Over-subtraction factor
+        floor_factor = self._noise_floor(stationary)
+        tiny = np.finfo(np.float32).tiny
+        
+        def subtract(spectrum):
+            magnitude = np.abs(spectrum)
             # Set floor to prevent over-subtraction artifacts
-            floor_factor = 0.1 if stationary else 0.2
-            y_cleaned_magnitude = np.maximum(subtracted, floor_factor * magnitude)
-            
-            # Reconstruct audio
-            cleaned_S = y_cleaned_magnitude * np.exp(1j * phase)
-            y_cleaned = librosa.istft(cleaned_S)
-            
-            # Normalize
-            y_cleaned = librosa.util.normalize(y_cleaned)
-            
-            # Save processed file
-            output_filename = f"noise_reduced_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, y_cleaned, sr)
-            
-            # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Spectral subtraction noise reduction completed successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "parameters": {
-                    "reduction_strength": reduction_strength,
-                    "stationary_noise": stationary,
-                    "noise_floor": f"{floor_factor*100}%"
-                }
+            cleaned = np.maximum(magnitude - alpha * noise_profile, floor_factor * magnitude)
+            # Scaling the complex bins keeps the original phase
+            return spectrum * (cleaned / np.maximum(magnitude, tiny))
+        
+        return subtract
+
+    def reduce_noise(self, y, sr, reduction_strength=0.8, stationary=True):
+        """Spectral subtraction on a decoded signal, returns the cleaned signal"""
+        y_cleaned = collect(self.reduce_noise_stream(ArraySource(y, sr), reduction_strength, stationary))
+        
+        # Normalize
+        y_cleaned = librosa.util.normalize(y_cleaned, axis=None)
+        return y_cleaned if y.ndim == 2 else y_cleaned[0]
+
+    def _noise_floor(self, stationary):
+        return 0.1 if stationary else 0.2
+
+    def _reduce_noise(self, upload, reduction_strength, stationary, output_format="wav", output_quality="high"):
+        """Blocking spectral subtraction, runs in the worker pool"""
+        # Stream audio from disk, block by block, all channels at once (twice: peak, then the normalized output)
+        source = open_source(upload)
+        
+        # Save processed file
+        output_filename = f"noise_reduced_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        write_peak_normalized(
+            lambda: self.reduce_noise_stream(source, reduction_strength, stationary),
+            output_path, source.samplerate, source.channels, output_subtype(upload, output_format),
+            output_format, output_quality
+        )
+        
+        return {
+            "success": True,
+            "message": "Spectral subtraction noise reduction completed successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "parameters": {
+                "reduction_strength": reduction_strength,
+                "stationary_noise": stationary,
+                "noise_floor": f"{self._noise_floor(stationary)*100}%"
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Noise reduction failed: {str(e)}")
\ No newline at end of file
+        }
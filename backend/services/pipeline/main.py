@@ -0,0 +1,26 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import PipelineProcessor
+
+app = create_service_app("pipeline", "Processing Pipeline Service")
+processor = PipelineProcessor()
+
+@app.post("/process")
+async def process_pipeline(
+    file: UploadFile = File(...),
+    steps: str = Form(...),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Run several tools in sequence, keeping audio in memory between steps"""
+    if run_async:
+        return await submit_upload_job("pipeline", file, processor.process_file,
+                                       processor.parse_steps(steps), use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, steps, use_cache)
@@ -0,0 +1,146 @@
+import os
+import uuid
+import json
+import inspect
+from fastapi import HTTPException
+from shared.audio_io import output_subtype, read_audio, write_audio
+from shared.encoder import OUTPUT_FORMATS, QUALITIES
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
+from noise_reduction.processor import NoiseReductionProcessor
+from equalizer.processor import EqualizerProcessor
+from volume_normalizer.processor import VolumeNormalizerProcessor
+from fade_effect.processor import FadeEffectProcessor
+from converter.processor import ConverterProcessor
+
+class PipelineProcessor:
+    service_name = "pipeline"
+    version = "2"
+
+    def __init__(self):
+        self.upload_dir = "uploads"
+        self.processed_dir = "processed"
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.processed_dir, exist_ok=True)
+
+        self.noise_processor = NoiseReductionProcessor()
+        self.equalizer_processor = EqualizerProcessor()
+        self.volume_processor = VolumeNormalizerProcessor()
+        self.fade_processor = FadeEffectProcessor()
+        self.converter_processor = ConverterProcessor()
+
+    def stages(self):
+        """Array-level DSP cores by tool name, each called as core(y, sr, **params)"""
+        return {
+            "noise_reduction": self.noise_processor.reduce_noise,
+            "equalizer": self.equalizer_processor.equalize,
+            "volume_normalizer": self.volume_processor.normalize_volume,
+            "fade_effect": self.fade_processor.apply_fades,
+        }
+
+    def parse_steps(self, steps):
+        """Validate a step list (JSON string or list) into [{"tool", "params"}]"""
+        if isinstance(steps, str):
+            try:
+                steps = json.loads(steps)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="steps must be a JSON list")
+        if not isinstance(steps, list) or not steps:
+            raise HTTPException(status_code=400, detail="steps must be a non-empty list")
+
+        stages = self.stages()
+        parsed = []
+        for index, step in enumerate(steps):
+            if not isinstance(step, dict) or "tool" not in step:
+                raise HTTPException(status_code=400, detail=f"Step {index} must be an object with a 'tool'")
+            tool = str(step["tool"]).replace("-", "_")
+            params = step.get("params") or {}
+            if not isinstance(params, dict):
+                raise HTTPException(status_code=400, detail=f"Step {index} params must be an object")
+
+            if tool == "converter":
+                if index != len(steps) - 1:
+                    raise HTTPException(status_code=400, detail="converter can only be the last step")
+                core, fixed_args = self.converter_processor.export, (None, None, None)
+            elif tool in stages:
+                core, fixed_args = stages[tool], (None, None)
+            else:
+                raise HTTPException(status_code=400, detail=f"Step {index}: unknown tool '{step['tool']}'")
+
+            try:
+                inspect.signature(core).bind(*fixed_args, **params)
+            except TypeError as e:
+                raise HTTPException(status_code=400, detail=f"Step {index} ({tool}): {str(e)}")
+            parsed.append({"tool": tool, "params": params})
+        return parsed
+
+    async def process(self, file, steps, use_cache=True):
+        """Run several tools in sequence with one decode and one encode"""
+        steps = self.parse_steps(steps)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, steps, use_cache)
+
+    async def process_file(self, upload, steps, use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        steps = self.parse_steps(steps)
+        params = {"steps": steps}
+        try:
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._run_pipeline, upload, steps),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Pipeline processing failed: {str(e)}")
+        finally:
+            # Clean up
+            upload.remove()
+
+    def apply_steps(self, y, sr, steps):
+        """Run parsed DSP steps on a decoded signal, returns (signal, per-step info, converter params or None)"""
+        stages = self.stages()
+        stage_info = []
+        for step in steps:
+            tool, params = step["tool"], step["params"]
+            if tool == "converter":
+                return y, stage_info, params
+            result = stages[tool](y, sr, **params)
+            info = {"tool": tool, "params": params}
+            if isinstance(result, tuple):
+                y, info["stats"] = result
+            else:
+                y = result
+            stage_info.append(info)
+        return y, stage_info, None
+
+    def _run_pipeline(self, upload, steps):
+        """Blocking pipeline, runs in the worker pool"""
+        # Decode once, keeping every channel
+        y, sr = read_audio(upload)
+        y, stage_info, encoder = self.apply_steps(y, sr, steps)
+
+        # Encode once, straight from the buffer unless only ffmpeg has the codec
+        output_format = (encoder or {}).get("output_format", "mp3" if encoder is not None else "wav")
+        quality = (encoder or {}).get("quality", "high")
+        output_filename = f"pipeline_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        if output_format in OUTPUT_FORMATS and quality in QUALITIES:
+            write_audio(output_path, y, sr, output_subtype(upload, output_format), output_format, quality)
+        else:
+            self.converter_processor.export(y, sr, output_path, **encoder)
+
+        return {
+            "success": True,
+            "message": f"Pipeline of {len(steps)} steps completed successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "pipeline": {
+                "steps": stage_info,
+                "output_format": output_format,
+                "sample_rate": int(sr),
+                "duration": y.shape[-1] / sr
+            }
+        }
@@ -1,18 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, Form
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
 from .processor import PitchTempoProcessor
 
-app = FastAPI(title="Pitch & Tempo Service")
+app = create_service_app("pitch_tempo", "Pitch & Tempo Service")
 processor = PitchTempoProcessor()
 
-@app.get("/health")
-async def health():
-    return {"status": "healthy", "service": "pitch_tempo"}
-
 @app.post("/process")
 async def process_pitch_tempo(
     file: UploadFile = File(...),
     pitch_shift: float = Form(0.0),
-    tempo_change: float = Form(1.0)
+    tempo_change: float = Form(1.0),
+    quality: str = Form("high"),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
 ):
-    """Adjust pitch and tempo independently"""
-    return await processor.process(file, pitch_shift, tempo_change)
\ No newline at end of file
+    """Adjust pitch and tempo independently; quality is "high" (phase vocoder) or "fast" (WSOLA)"""
+    if run_async:
+        processor.check(tempo_change, quality, output_format, output_quality)
+        return await submit_upload_job("pitch_tempo", file, processor.process_file,
+                                       pitch_shift, tempo_change, quality, output_format, output_quality, use_cache,
+                                       upload_dir=processor.upload_dir)
+    return await processor.process(file, pitch_shift, tempo_change, quality, output_format, output_quality,
+                                   use_cache)
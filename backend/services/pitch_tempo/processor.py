@@ -2,67 +2,93 @@ import os
 import uuid
 import numpy as np
 import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype, read_audio, write_audio
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.timestretch import QUALITIES, shift_pitch_tempo
+from shared.upload import ingest_upload
 
 class PitchTempoProcessor:
+    service_name = "pitch_tempo"
+    version = "3"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, pitch_shift=0.0, tempo_change=1.0):
-        """Adjust pitch and tempo independently using librosa"""
-        try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+    def check(self, tempo_change=1.0, quality="high", output_format="wav", output_quality="high"):
+        if tempo_change <= 0:
+            raise HTTPException(status_code=400, detail="tempo_change must be positive")
+        if quality not in QUALITIES:
+            raise HTTPException(status_code=400, detail=f"quality must be one of: {', '.join(QUALITIES)}")
+        check_output(output_format, output_quality)
 
-            # Load audio
-            y, sr = librosa.load(upload_path, sr=None)
-            
-            # Apply tempo change first (if needed)
-            if tempo_change != 1.0:
-                # Time-stretch without changing pitch
-                y = librosa.effects.time_stretch(y, rate=tempo_change)
-            
-            # Apply pitch shift (if needed)
-            if pitch_shift != 0.0:
-                # Pitch shift without changing tempo
-                y = librosa.effects.pitch_shift(y, sr=sr, n_steps=pitch_shift)
-            
-            # Normalize to prevent clipping
-            y = librosa.util.normalize(y)
-            
-            # Save processed file
-            output_filename = f"pitch_tempo_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, y, sr)
-            
+    async def process(self, file, pitch_shift=0.0, tempo_change=1.0, quality="high", output_format="wav",
+                      output_quality="high", use_cache=True):
+        """Adjust pitch and tempo independently; quality "fast" trades smoothness for speed (speech, previews)"""
+        self.check(tempo_change, quality, output_format, output_quality)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, pitch_shift, tempo_change, quality, output_format, output_quality,
+                                       use_cache)
+
+    async def process_file(self, upload, pitch_shift=0.0, tempo_change=1.0, quality="high", output_format="wav",
+                           output_quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"pitch_shift": pitch_shift, "tempo_change": tempo_change, "quality": quality,
+                  "output_format": output_format, "output_quality": output_quality}
+        try:
+            self.check(tempo_change, quality, output_format, output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._shift, upload, pitch_shift, tempo_change, quality,
+                                      output_format, output_quality),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Pitch/tempo adjustment failed: {str(e)}")
+        finally:
             # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Pitch and tempo adjusted successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "parameters": {
-                    "pitch_shift_semitones": pitch_shift,
-                    "tempo_multiplier": tempo_change,
-                    "sample_rate": int(sr),
-                    "duration": len(y) / sr
-                }
+            upload.remove()
+
+    def shift(self, y, sr, pitch_shift=0.0, tempo_change=1.0, quality="high"):
+        """Change pitch and tempo of a decoded signal, returns the peak-normalized result"""
+        # One time stretch plus one resample covers both changes, on every channel at once
+        channels = y if y.ndim == 2 else y[np.newaxis, :]
+        shifted = shift_pitch_tempo(channels, sr, pitch_shift, tempo_change, quality)
+        if y.ndim == 1:
+            shifted = shifted[0]
+        
+        # Normalize to prevent clipping
+        return librosa.util.normalize(shifted, axis=None)
+
+    def _shift(self, upload, pitch_shift, tempo_change, quality="high", output_format="wav", output_quality="high"):
+        """Blocking pitch/tempo change, runs in the worker pool"""
+        # Load audio, all channels
+        y, sr = read_audio(upload)
+        y = self.shift(y, sr, pitch_shift, tempo_change, quality)
+        
+        # Save processed file
+        output_filename = f"pitch_tempo_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        write_audio(output_path, y, sr, output_subtype(upload, output_format), output_format, output_quality)
+        
+        return {
+            "success": True,
+            "message": "Pitch and tempo adjusted successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "parameters": {
+                "pitch_shift_semitones": pitch_shift,
+                "tempo_multiplier": tempo_change,
+                "quality": quality,
+                "sample_rate": int(sr),
+                "duration": y.shape[-1] / sr,
+                "channels": y.shape[0]
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Pitch/tempo adjustment failed: {str(e)}")
\ No newline at end of file
+        }
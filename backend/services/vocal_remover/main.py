@@ -1,14 +1,28 @@
-from fastapi import FastAPI, File, UploadFile
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
 from .processor import VocalRemoverProcessor
 
-app = FastAPI(title="Vocal Remover Service")
+app = create_service_app("vocal_remover", "Vocal Remover Service")
 processor = VocalRemoverProcessor()
 
-@app.get("/health")
-async def health():
-    return {"status": "healthy", "service": "vocal_remover"}
-
 @app.post("/process")
-async def process_vocal_removal(file: UploadFile = File(...)):
+async def process_vocal_removal(
+    file: UploadFile = File(...),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
     """Remove vocals from audio using AI separation"""
-    return await processor.process(file)
\ No newline at end of file
+    if run_async:
+        processor.check(output_format, output_quality)
+        return await submit_upload_job("vocal_remover", file, processor.process_file, output_format, output_quality,
+                                       use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, output_format, output_quality, use_cache)
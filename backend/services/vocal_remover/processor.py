@@ -1,101 +1,99 @@
 import os
 import uuid
 import numpy as np
-import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype
+from shared.audio_stream import open_source, write_peak_normalized
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.result_cache import cached_result
+from shared.stft import default_stft
+from shared.upload import ingest_upload
 
 class VocalRemoverProcessor:
+    service_name = "vocal_remover"
+    version = "3"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file):
+    def check(self, output_format="wav", output_quality="high"):
+        check_output(output_format, output_quality)
+
+    async def process(self, file, output_format="wav", output_quality="high", use_cache=True):
         """Remove vocals using center channel extraction and spectral subtraction"""
+        self.check(output_format, output_quality)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, output_format, output_quality, use_cache)
+
+    async def process_file(self, upload, output_format="wav", output_quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"output_format": output_format, "output_quality": output_quality}
         try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            self.check(output_format, output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._remove_vocals, upload, output_format, output_quality),
+                use_cache
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Vocal removal failed: {str(e)}")
+        finally:
+            # Clean up
+            upload.remove()
 
-            # Load audio file
-            y, sr = librosa.load(upload_path, sr=None, mono=False)
-            
-            # Ensure stereo
-            if y.ndim == 1:
-                # Convert mono to stereo by duplicating channel
-                y = np.array([y, y])
-            
-            # Method 1: Center channel extraction (simple karaoke effect)
-            if y.shape[0] >= 2:
-                # Subtract right channel from left channel to remove center vocals
-                vocals_removed_simple = y[0] - y[1]
-            else:
-                vocals_removed_simple = y[0]
-            
-            # Method 2: Advanced spectral subtraction for vocals
-            # Convert to STFT for frequency domain processing
-            S = librosa.stft(y[0] if y.ndim > 1 else y)
-            magnitude = np.abs(S)
-            phase = np.angle(S)
-            
-            # Estimate vocal frequencies (typically 80Hz - 255Hz for fundamentals, harmonics up to 8kHz)
-            vocal_freq_range = (80, 8000)  # Hz
-            freq_bins = librosa.fft_frequencies(sr=sr, n_fft=2048)
-            
-            # Create vocal suppression mask
-            vocal_mask = np.ones_like(magnitude)
-            vocal_start_bin = np.argmax(freq_bins >= vocal_freq_range[0])
-            vocal_end_bin = np.argmax(freq_bins >= vocal_freq_range[1])
-            
+    def remove_vocals_stream(self, source):
+        """Center channel extraction plus spectral suppression, yields mono output blocks"""
+        engine = default_stft()
+        
+        # Estimate vocal frequencies (typically 80Hz - 255Hz for fundamentals, harmonics up to 8kHz)
+        vocal_freq_range = (80, 8000)  # Hz
+        freq_bins = engine.frequencies(source.samplerate)
+        vocal_start_bin = np.argmax(freq_bins >= vocal_freq_range[0])
+        vocal_end_bin = np.argmax(freq_bins >= vocal_freq_range[1])
+        
+        def split(block):
+            # Ensure stereo by duplicating a mono channel
+            if block.shape[0] < 2:
+                block = np.repeat(block, 2, axis=0)
+            # Channel 0 feeds the spectral method; channel 1 is the simple
+            # karaoke signal (left minus right), passed through unchanged
+            return np.stack([block[0], block[0] - block[1]])
+        
+        def suppress(spectrum):
             # Reduce vocal frequencies by 70%
-            vocal_mask[vocal_start_bin:vocal_end_bin, :] *= 0.3
-            
-            # Apply vocal suppression
-            suppressed_magnitude = magnitude * vocal_mask
-            
-            # Reconstruct audio
-            vocals_removed_advanced = librosa.istft(suppressed_magnitude * np.exp(1j * phase))
-            
-            # Combine both methods for better results
+            spectrum[0, vocal_start_bin:vocal_end_bin] *= 0.3
+            return spectrum
+        
+        for block in engine.process((split(block) for block in source.blocks()), suppress):
             # Weight: 60% center channel extraction + 40% spectral subtraction
-            if y.ndim > 1 and y.shape[0] >= 2:
-                final_result = 0.6 * vocals_removed_simple + 0.4 * vocals_removed_advanced
-            else:
-                final_result = vocals_removed_advanced
-            
-            # Normalize audio to prevent clipping
-            final_result = librosa.util.normalize(final_result)
-            
-            # Save processed file
-            output_filename = f"vocal_removed_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, final_result, sr)
-            
-            # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Vocals removed successfully using AI separation",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "methods_used": ["center_channel_extraction", "spectral_subtraction"],
-                "processing_details": {
-                    "sample_rate": int(sr),
-                    "duration": len(final_result) / sr,
-                    "vocal_suppression": "70% reduction in 80Hz-8kHz range"
-                }
+            yield 0.6 * block[1:2] + 0.4 * block[0:1]
+
+    def _remove_vocals(self, upload, output_format="wav", output_quality="high"):
+        """Blocking vocal removal, runs in the worker pool"""
+        # Stream audio from disk, block by block (twice: peak, then the normalized output)
+        source = open_source(upload)
+        
+        # Save processed file, normalized to prevent clipping
+        output_filename = f"vocal_removed_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        frames = write_peak_normalized(lambda: self.remove_vocals_stream(source), output_path, source.samplerate,
+                                       1, output_subtype(upload, output_format), output_format, output_quality)
+        
+        return {
+            "success": True,
+            "message": "Vocals removed successfully using AI separation",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "methods_used": ["center_channel_extraction", "spectral_subtraction"],
+            "processing_details": {
+                "sample_rate": source.samplerate,
+                "duration": frames / source.samplerate,
+                "vocal_suppression": "70% reduction in 80Hz-8kHz range"
             }
-            
-        except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Vocal removal failed: {str(e)}")
\ No newline at end of file
+        }
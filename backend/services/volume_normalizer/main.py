@@ -0,0 +1,34 @@
+import os
+import sys
+from fastapi import File, UploadFile, Form
+
+# Add backend (for shared) and services to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.service_app import create_service_app, submit_upload_job
+from .processor import VolumeNormalizerProcessor
+
+app = create_service_app("volume_normalizer", "Volume Normalizer Service")
+processor = VolumeNormalizerProcessor()
+
+@app.post("/process")
+async def process_volume_normalization(
+    file: UploadFile = File(...),
+    target_level: float = Form(-14.0),
+    normalize: bool = Form(True),
+    true_peak: float = Form(-1.0),
+    gain_db: float = Form(0.0),
+    output_format: str = Form("wav"),
+    output_quality: str = Form("high"),
+    use_cache: bool = Form(True),
+    run_async: bool = Form(False)
+):
+    """Normalize loudness to target_level LUFS (EBU R128), or by gain_db without normalize, limited to true_peak dBTP"""
+    if run_async:
+        processor.check(true_peak, output_format, output_quality)
+        return await submit_upload_job("volume_normalizer", file, processor.process_file,
+                                       target_level, normalize, true_peak, gain_db, output_format, output_quality,
+                                       use_cache, upload_dir=processor.upload_dir)
+    return await processor.process(file, target_level, normalize, true_peak, gain_db, output_format,
+                                   output_quality, use_cache)
@@ -1,83 +1,97 @@
 import os
 import uuid
-import numpy as np
-import librosa
-import soundfile as sf
 from fastapi import HTTPException
+from shared.audio_io import output_subtype
+from shared.audio_stream import ArraySource, collect, open_source, write_blocks
+from shared.encoder import check_output
+from shared.executor import run_in_worker
+from shared.loudness import normalize_loudness
+from shared.result_cache import cached_result
+from shared.upload import ingest_upload
 
 class VolumeNormalizerProcessor:
+    service_name = "volume_normalizer"
+    version = "3"
+
     def __init__(self):
         self.upload_dir = "uploads"
         self.processed_dir = "processed"
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
 
-    async def process(self, file, target_level=-6.0, normalize=True):
-        """Normalize and boost audio volume professionally"""
-        try:
-            # Save uploaded file
-            upload_path = f"{self.upload_dir}/{uuid.uuid4()}_{file.filename}"
-            with open(upload_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+    def check(self, true_peak=-1.0, output_format="wav", output_quality="high"):
+        if not -20.0 <= true_peak <= 0.0:
+            raise HTTPException(status_code=400, detail="true_peak must be between -20 and 0 dBTP")
+        check_output(output_format, output_quality)
 
-            # Load audio
-            y, sr = librosa.load(upload_path, sr=None)
-            
-            if normalize:
-                # RMS-based normalization
-                rms = np.sqrt(np.mean(y**2))
-                if rms > 0:
-                    # Target RMS level (convert dB to linear)
-                    target_rms = 10**(target_level/20)
-                    gain = target_rms / rms
-                    y_normalized = y * gain
-                else:
-                    y_normalized = y
-            else:
-                # Simple amplitude boost
-                boost_factor = 10**(target_level/20)
-                y_normalized = y * boost_factor
-            
-            # Apply soft limiter to prevent clipping
-            y_normalized = np.tanh(y_normalized * 0.95) * 0.95
-            
-            # Final safety normalization
-            if np.max(np.abs(y_normalized)) > 0.95:
-                y_normalized = y_normalized / np.max(np.abs(y_normalized)) * 0.95
-            
-            # Save processed file
-            output_filename = f"volume_normalized_{uuid.uuid4()}.wav"
-            output_path = f"{self.processed_dir}/{output_filename}"
-            sf.write(output_path, y_normalized, sr)
-            
-            # Calculate statistics
-            original_peak = np.max(np.abs(y))
-            normalized_peak = np.max(np.abs(y_normalized))
-            gain_applied = 20 * np.log10(normalized_peak / original_peak) if original_peak > 0 else 0
-            
-            # Clean up
-            os.remove(upload_path)
-            
-            return {
-                "success": True,
-                "message": "Audio volume normalized successfully",
-                "output_file": f"/download/{output_filename}",
-                "download_url": f"/download/{output_filename}",
-                "processing_stats": {
-                    "target_level_db": target_level,
-                    "gain_applied_db": round(gain_applied, 2),
-                    "original_peak": round(original_peak, 4),
-                    "normalized_peak": round(normalized_peak, 4),
-                    "normalization_method": "RMS" if normalize else "Simple Boost"
-                }
-            }
-            
+    async def process(self, file, target_level=-14.0, normalize=True, true_peak=-1.0, gain_db=0.0,
+                      output_format="wav", output_quality="high", use_cache=True):
+        """Normalize loudness to target_level LUFS (EBU R128), or apply gain_db, under a true-peak ceiling"""
+        self.check(true_peak, output_format, output_quality)
+        upload = await ingest_upload(file, self.upload_dir)
+        return await self.process_file(upload, target_level, normalize, true_peak, gain_db, output_format,
+                                       output_quality, use_cache)
+
+    async def process_file(self, upload, target_level=-14.0, normalize=True, true_peak=-1.0, gain_db=0.0,
+                           output_format="wav", output_quality="high", use_cache=True):
+        """Like process(), for an upload already on disk; removes it afterwards"""
+        params = {"target_level": target_level, "normalize": normalize, "true_peak": true_peak,
+                  "output_format": output_format, "output_quality": output_quality}
+        if not normalize:
+            params["gain_db"] = gain_db
+        try:
+            self.check(true_peak, output_format, output_quality)
+            return await cached_result(
+                self.service_name, self.version, upload.content_hash, params,
+                lambda: run_in_worker(self.service_name, self._normalize, upload, target_level, normalize, true_peak,
+                                      gain_db, output_format, output_quality),
+                use_cache
+            )
         except Exception as e:
-            # Clean up on error
-            if 'upload_path' in locals():
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            raise HTTPException(status_code=500, detail=f"Volume normalization failed: {str(e)}")
\ No newline at end of file
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Volume normalization failed: {str(e)}")
+        finally:
+            # Clean up
+            upload.remove()
+
+    def loudness_blocks(self, source, target_level=-14.0, normalize=True, true_peak=-1.0, gain_db=0.0):
+        """Measure a block source, then stream it normalized; returns (blocks, stats).
+
+        normalize=True reaches target_level LUFS integrated loudness,
+        normalize=False applies gain_db of plain gain instead (none by
+        default, leaving only the limiter). Either way a true-peak limiter
+        keeps the result under true_peak dBTP. The stats are complete once
+        the blocks are consumed.
+        """
+        blocks, stats = normalize_loudness(source, target_level, true_peak, gain_db=None if normalize else gain_db)
+        stats["target_level_db"] = target_level
+        stats["normalization_method"] = "EBU R128" if normalize else "Simple Boost"
+        return blocks, stats
+
+    def normalize_volume(self, y, sr, target_level=-14.0, normalize=True, true_peak=-1.0, gain_db=0.0):
+        """Normalize a decoded signal, returns (normalized signal, stats)"""
+        blocks, stats = self.loudness_blocks(ArraySource(y, sr), target_level, normalize, true_peak, gain_db)
+        y_normalized = collect(blocks)
+        return (y_normalized if y.ndim == 2 else y_normalized[0]), stats
+
+    def _normalize(self, upload, target_level, normalize, true_peak=-1.0, gain_db=0.0, output_format="wav",
+                   output_quality="high"):
+        """Blocking normalization, runs in the worker pool"""
+        # Two reads of the input (measure, then apply), never holding the whole signal
+        source = open_source(upload)
+        blocks, stats = self.loudness_blocks(source, target_level, normalize, true_peak, gain_db)
+        
+        # Save processed file
+        output_filename = f"volume_normalized_{uuid.uuid4()}.{output_format}"
+        output_path = f"{self.processed_dir}/{output_filename}"
+        write_blocks(blocks, output_path, source.samplerate, source.channels, output_subtype(upload, output_format),
+                     output_format, output_quality)
+        
+        return {
+            "success": True,
+            "message": "Audio volume normalized successfully",
+            "output_file": f"/download/{output_filename}",
+            "download_url": f"/download/{output_filename}",
+            "processing_stats": stats
+        }
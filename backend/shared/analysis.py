@@ -0,0 +1,293 @@
+"""
+Audio analysis for ODOREMOVER Audio Suite
+Loudness, level and clipping statistics in one streaming pass, remembered per input content hash
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+from fastapi import HTTPException
+from mutagen import File as MutagenFile
+
+from shared.audio_stream import open_source
+from shared.config import Config
+from shared.executor import run_in_worker
+from shared.loudness import LoudnessMeter, to_db
+from shared.result_cache import artifacts
+from shared.storage import get_storage
+from shared.waveform import SIDECAR_SUFFIX, WaveformBuilder
+
+# Bump when the analysis output changes, so indexed results are recomputed
+ANALYSIS_VERSION = "2"
+
+
+def read_header(path: str) -> Optional[dict]:
+    """Format, rate, channels and duration from container headers, without decoding"""
+    try:
+        info = sf.info(path)
+        return {
+            "source": "soundfile",
+            "container": info.format,
+            "subtype": info.subtype,
+            "sample_rate": int(info.samplerate),
+            "channels": int(info.channels),
+            "frames": int(info.frames),
+            "duration": info.frames / info.samplerate if info.samplerate else 0.0,
+        }
+    except (RuntimeError, sf.LibsndfileError):
+        pass
+    try:
+        audio = MutagenFile(path)
+    except Exception:
+        audio = None
+    if audio is None or not getattr(audio, "info", None):
+        return None
+    info = audio.info
+    sample_rate = int(getattr(info, "sample_rate", 0) or 0)
+    duration = float(getattr(info, "length", 0.0) or 0.0)
+    return {
+        "source": "mutagen",
+        "container": type(audio).__name__,
+        "codec": getattr(info, "codec", None) or getattr(info, "codec_description", None),
+        "bitrate": getattr(info, "bitrate", None),
+        "sample_rate": sample_rate,
+        "channels": int(getattr(info, "channels", 0) or 0),
+        # Compressed headers only give the duration; frames are estimated from it
+        "frames": int(round(duration * sample_rate)),
+        "duration": duration,
+    }
+
+
+class ClipCounter:
+    """Counts samples at or above the clip level, and runs of them long enough to be clipping"""
+
+    def __init__(self, channels: int, level: Optional[float] = None, min_run: Optional[int] = None):
+        self.level = level if level is not None else Config.ANALYSIS_CLIP_LEVEL
+        self.min_run = min_run or Config.ANALYSIS_CLIP_RUN
+        self.samples = 0
+        self.events = 0
+        self._open = np.zeros(channels, dtype=np.int64)  # length of the run still going at the block end
+
+    def push(self, block: np.ndarray):
+        clipped = np.abs(block) >= self.level
+        self.samples += int(np.count_nonzero(clipped))
+        if not clipped.any() and not self._open.any():
+            return
+        length = block.shape[1]
+        for channel, mask in enumerate(clipped):
+            edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+            starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+            runs = ends - starts
+            carried = self._open[channel]
+            if len(runs) and starts[0] == 0:
+                runs[0] += carried
+            elif carried >= self.min_run:
+                self.events += 1
+            if len(runs) and ends[-1] == length:
+                self._open[channel] = runs[-1]
+                runs = runs[:-1]
+            else:
+                self._open[channel] = 0
+            self.events += int(np.count_nonzero(runs >= self.min_run))
+
+    def result(self) -> dict:
+        return {
+            "level": self.level,
+            "min_run": self.min_run,
+            "clipped_samples": self.samples,
+            "clipping_events": self.events + int(np.count_nonzero(self._open >= self.min_run)),
+        }
+
+
+def analyze_upload(upload) -> dict:
+    """Blocking full analysis of an IngestedUpload, runs in the worker pool"""
+    header = read_header(upload.path)
+    source = open_source(upload)
+    channels = source.channels
+    meter = LoudnessMeter(source.samplerate, channels)
+    clips = ClipCounter(channels)
+    waveform = WaveformBuilder(source.samplerate, channels) if Config.WAVEFORM_ENABLED else None
+    squares = np.zeros(channels)
+    sums = np.zeros(channels)
+    peaks = np.zeros(channels)
+    frames = 0
+
+    for block in source.blocks():
+        if not block.shape[1]:
+            continue
+        meter.push(block)
+        clips.push(block)
+        if waveform is not None:
+            waveform.push(block)
+        block = block.astype(np.float64)
+        squares += np.einsum("ij,ij->i", block, block)
+        sums += block.sum(axis=1)
+        peaks = np.maximum(peaks, np.abs(block).max(axis=1))
+        frames += block.shape[1]
+
+    loudness = meter.result()
+    waveform_name = None
+    if waveform is not None:
+        # Uploads get the same overview as outputs, named by content so it is shared by identical files
+        waveform_name = f"upload_{upload.content_hash}{SIDECAR_SUFFIX}"
+        waveform.save(os.path.join(str(Config.PROCESSED_DIR), waveform_name))
+    mean_squares = squares / max(frames, 1)
+    rms = float(np.sqrt(mean_squares.mean()))
+    peak = float(peaks.max()) if channels else 0.0
+    clipping = clips.result()
+    clipping["clipped_ratio"] = round(clipping["clipped_samples"] / max(frames * channels, 1), 6)
+
+    audio_format = dict(header or {"source": "decoder"})
+    # The decoded stream is authoritative for rate, channels and length
+    audio_format.update(sample_rate=source.samplerate, channels=channels, frames=frames,
+                        duration=round(frames / source.samplerate, 6))
+    return {
+        "version": ANALYSIS_VERSION,
+        "format": audio_format,
+        "loudness": {
+            "integrated_lufs": _round(loudness["integrated_lufs"]),
+            "loudness_range_lu": _round(loudness["loudness_range_lu"]),
+            "true_peak_dbtp": _round(loudness["true_peak_dbtp"]),
+        },
+        "levels": {
+            "sample_peak_dbfs": _round(to_db(peak)),
+            "rms_dbfs": _round(to_db(rms)),
+            "crest_factor_db": _round(to_db(peak / rms)) if rms > 0 else None,
+            "channels": [
+                {
+                    "peak_dbfs": _round(to_db(float(channel_peak))),
+                    "rms_dbfs": _round(to_db(float(np.sqrt(channel_square)))),
+                    "dc_offset": round(float(channel_sum) / max(frames, 1), 6),
+                }
+                for channel_peak, channel_square, channel_sum in zip(peaks, mean_squares, sums)
+            ],
+        },
+        "clipping": clipping,
+        "waveform": f"/download/{waveform_name}" if waveform_name else None,
+    }
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if value is not None else None
+
+
+class AnalysisIndex:
+    """Persistent analysis results by input content hash, least recently used dropped past max_entries"""
+
+    def __init__(self, index_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or Config.ANALYSIS_INDEX_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+
+        index_path = str(index_path or Config.CACHE_DIR / "analysis.sqlite3")
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                content_hash TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access)")
+
+    def lookup(self, content_hash: str) -> Optional[dict]:
+        """The stored analysis, or None if missing or made by an older analysis version"""
+        row = self._conn.execute(
+            "SELECT payload FROM analyses WHERE content_hash = ? AND version = ?", (content_hash, ANALYSIS_VERSION)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE analyses SET last_access = ? WHERE content_hash = ?", (time.time(), content_hash))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def store(self, content_hash: str, analysis: dict):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)",
+            (content_hash, ANALYSIS_VERSION, json.dumps(analysis), now, now)
+        )
+        self._conn.execute(
+            "DELETE FROM analyses WHERE content_hash IN "
+            "(SELECT content_hash FROM analyses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        entries = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        return {"entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+_index: Optional[AnalysisIndex] = None
+
+
+def get_analysis_index() -> AnalysisIndex:
+    """Return the process-wide analysis index"""
+    global _index
+    if _index is None:
+        _index = AnalysisIndex()
+    return _index
+
+
+def _artifacts_exist(analysis: dict) -> bool:
+    """Whether the files an indexed analysis links to (its waveform) are still stored"""
+    storage = get_storage()
+    return all(storage.exists(name) for name in artifacts(analysis))
+
+
+def _response(upload, analysis: dict, cached: bool, header_only: bool = False) -> dict:
+    return {
+        "success": True,
+        "message": "Audio header read successfully" if header_only else "Audio analyzed successfully",
+        "filename": upload.filename,
+        "content_hash": upload.content_hash,
+        "cached": cached,
+        "header_only": header_only,
+        "analysis": analysis,
+    }
+
+
+async def analyze(upload, header_only: bool = False, use_cache: bool = True) -> dict:
+    """Analyze an IngestedUpload, serving a previous analysis of the same content if indexed.
+
+    header_only answers from the container headers when they can be read
+    (no loudness, level or clipping figures); otherwise the file is
+    decoded once and measured. The upload is removed afterwards.
+    """
+    index = get_analysis_index()
+    try:
+        analysis = await asyncio.to_thread(index.lookup, upload.content_hash) if use_cache else None
+        if analysis is not None and await asyncio.to_thread(_artifacts_exist, analysis):
+            return _response(upload, analysis, cached=True)
+        if header_only:
+            header = await asyncio.to_thread(read_header, upload.path)
+            if header is not None:
+                return _response(upload, {"version": ANALYSIS_VERSION, "format": header}, cached=False,
+                                 header_only=True)
+        analysis = await run_in_worker("analysis", analyze_upload, upload)
+        await asyncio.to_thread(index.store, upload.content_hash, analysis)
+        return _response(upload, analysis, cached=False)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Audio analysis failed: {str(e)}")
+    finally:
+        upload.remove()
+
+
+async def indexed(content_hash: str) -> dict:
+    """A previous analysis by content hash alone, without uploading the file again"""
+    analysis = await asyncio.to_thread(get_analysis_index().lookup, content_hash.lower())
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="No analysis indexed for this content hash")
+    return {"success": True, "content_hash": content_hash.lower(), "cached": True, "analysis": analysis}
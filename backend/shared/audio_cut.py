@@ -0,0 +1,88 @@
+"""
+Range cutting for ODOREMOVER Audio Suite
+Copies only the requested frames instead of decoding and re-encoding whole files
+"""
+import subprocess
+from typing import Optional, Tuple
+
+import soundfile as sf
+from mutagen import File as MutagenFile
+
+from shared.config import Config
+
+# Containers where libsndfile seeks to an exact frame and round-trips samples losslessly
+SEEKABLE_FORMATS = {"WAV", "WAVEX", "RF64", "W64", "AIFF", "FLAC", "CAF"}
+
+# Compressed containers ffmpeg can cut on packet boundaries with -c copy
+STREAM_COPY_EXTENSIONS = {"mp3", "aac", "m4a", "ogg", "wma"}
+
+
+def frame_range(start_time: float, end_time: Optional[float], samplerate: int, frames: int) -> Tuple[int, int]:
+    """Clamp a [start_time, end_time) range in seconds to frame indices"""
+    start = min(max(int(round(start_time * samplerate)), 0), frames)
+    if end_time is None:
+        return start, frames
+    return start, min(max(int(round(end_time * samplerate)), start), frames)
+
+
+def is_seekable(path: str) -> bool:
+    try:
+        return sf.info(path).format in SEEKABLE_FORMATS
+    except (RuntimeError, sf.LibsndfileError):
+        return False
+
+
+def cut_frames(path: str, output_path: str, start_time: float, end_time: Optional[float]) -> dict:
+    """Copy a frame range of a PCM/FLAC file into the same format and subtype.
+
+    Seeks to the first frame and reads only the requested range; integer
+    samples are copied as int32 so PCM data comes out bit-identical.
+    """
+    with sf.SoundFile(path) as src:
+        start, end = frame_range(start_time, end_time, src.samplerate, src.frames)
+        dtype = "float64" if src.subtype in ("FLOAT", "DOUBLE") else "int32"
+        src.seek(start)
+        with sf.SoundFile(output_path, "w", samplerate=src.samplerate, channels=src.channels,
+                          format=src.format, subtype=src.subtype, endian=src.endian) as out:
+            remaining = end - start
+            while remaining > 0:
+                block = src.read(min(Config.STREAM_BLOCK_SIZE, remaining), dtype=dtype, always_2d=True)
+                if not len(block):
+                    break
+                out.write(block)
+                remaining -= len(block)
+        return {
+            "method": "frame_copy",
+            "start_frame": start,
+            "end_frame": end,
+            "original_duration": src.frames / src.samplerate,
+            "processed_duration": (end - start) / src.samplerate
+        }
+
+
+def stream_copy(path: str, output_path: str, start_time: float, end_time: Optional[float]) -> dict:
+    """Cut a compressed file with ffmpeg stream copy, aligned to the codec's frames.
+
+    Raises FileNotFoundError when ffmpeg is missing and CalledProcessError when it fails.
+    """
+    command = [Config.FFMPEG_BINARY, "-v", "error", "-y", "-ss", f"{max(start_time, 0.0):.6f}"]
+    if end_time is not None:
+        command += ["-t", f"{max(end_time - start_time, 0.0):.6f}"]
+    command += ["-i", path, "-map", "0:a", "-c", "copy", output_path]
+    subprocess.run(command, check=True, capture_output=True, timeout=Config.PROCESSING_TIMEOUT)
+    return {
+        "method": "stream_copy",
+        "original_duration": media_duration(path),
+        "processed_duration": media_duration(output_path)
+    }
+
+
+def media_duration(path: str) -> Optional[float]:
+    """Duration from container headers, without decoding"""
+    try:
+        info = sf.info(path)
+        return info.frames / info.samplerate
+    except (RuntimeError, sf.LibsndfileError):
+        pass
+    audio = MutagenFile(path)
+    return float(audio.info.length) if audio is not None and audio.info else None
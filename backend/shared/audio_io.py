@@ -0,0 +1,55 @@
+"""
+Shared audio I/O for ODOREMOVER Audio Suite
+Decodes every channel as (channels, samples) float32 and writes output in the source's sample format
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from shared.audio_stream import ArraySource, write_blocks
+from shared.decode_cache import load_audio
+from shared.encoder import OUTPUT_FORMATS, UNCOMPRESSED_SUBTYPES, codec_subtype
+
+
+def read_audio(upload) -> Tuple[np.ndarray, int]:
+    """Decode an IngestedUpload with its native channel layout, through the decode cache.
+
+    Always returns a 2-D (channels, samples) array; it may be read-only.
+    """
+    y, sr = load_audio(upload, mono=False)
+    return (y if y.ndim == 2 else y[np.newaxis, :]), sr
+
+
+def source_subtype(path: str) -> Optional[str]:
+    """libsndfile subtype of a file (PCM_16, PCM_24, FLOAT...), None when libsndfile can't read it"""
+    try:
+        return sf.info(path).subtype
+    except (RuntimeError, sf.LibsndfileError):
+        return None
+
+
+def output_subtype(upload, output_format: str = "wav") -> Optional[str]:
+    """Subtype that keeps the upload's bit depth in output_format.
+
+    Only uncompressed PCM/float subtypes are carried over: compressed sources
+    (MP3, Vorbis...) and subtypes that don't fit the output container fall back
+    to None (libsndfile's default, PCM_16 for WAV); lossy formats get their
+    codec.
+    """
+    subtype = source_subtype(upload.path)
+    if subtype not in UNCOMPRESSED_SUBTYPES:
+        subtype = None
+    if output_format in OUTPUT_FORMATS:
+        return codec_subtype(output_format, subtype)
+    if subtype and sf.check_format(output_format.upper(), subtype):
+        return subtype
+    return None
+
+
+def write_audio(output_path: str, y: np.ndarray, sr: int, subtype: Optional[str] = None,
+                output_format: Optional[str] = None, quality: str = "high", waveform: Optional[bool] = None):
+    """Encode a (channels, samples) or 1-D signal block by block, with its waveform sidecar as in write_blocks"""
+    y = y if y.ndim == 2 else y[np.newaxis, :]
+    write_blocks(ArraySource(y, sr).blocks(), output_path, sr, y.shape[0], subtype, output_format, quality,
+                 waveform=waveform)
@@ -0,0 +1,96 @@
+"""
+Streaming concatenation for ODOREMOVER Audio Suite
+Joins sources one at a time into a common sample rate and channel layout, with optional crossfades
+"""
+from itertools import chain
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+import soxr
+
+
+def remix(block: np.ndarray, channels: int) -> np.ndarray:
+    """Map a (ch, n) block onto the target channel count"""
+    if block.shape[0] == channels:
+        return block
+    if block.shape[0] == 1:
+        return np.repeat(block, channels, axis=0)
+    if channels == 1:
+        return block.mean(axis=0, keepdims=True)
+    if block.shape[0] > channels:
+        return block[:channels]
+    return np.concatenate([block, np.zeros((channels - block.shape[0], block.shape[1]), dtype=block.dtype)])
+
+
+def conform(source, samplerate: int, channels: int) -> Iterator[np.ndarray]:
+    """Yield a source's blocks remixed and (statefully) resampled to the target layout"""
+    resampler = None
+    if source.samplerate != samplerate:
+        resampler = soxr.ResampleStream(source.samplerate, samplerate, channels, dtype="float32")
+    for block in source.blocks():
+        block = remix(block, channels)
+        if resampler is not None:
+            block = resampler.resample_chunk(np.ascontiguousarray(block.T)).T
+        if block.shape[1]:
+            yield block
+    if resampler is not None:
+        flushed = resampler.resample_chunk(np.zeros((0, channels), dtype=np.float32), last=True).T
+        if flushed.shape[1]:
+            yield flushed
+
+
+def equal_power_crossfade(outgoing: np.ndarray, incoming: np.ndarray) -> np.ndarray:
+    """Mix two equally long blocks with cos/sin gains, keeping perceived loudness constant"""
+    t = (np.arange(outgoing.shape[1], dtype=np.float32) + 0.5) / outgoing.shape[1]
+    return outgoing * np.cos(t * np.pi / 2) + incoming * np.sin(t * np.pi / 2)
+
+
+def _take(blocks: Iterator[np.ndarray], frames: int) -> Tuple[np.ndarray, Iterator[np.ndarray]]:
+    """Pull up to `frames` frames off a block stream, returning them and the rest of the stream"""
+    taken, count = [], 0
+    for block in blocks:
+        taken.append(block)
+        count += block.shape[1]
+        if count >= frames:
+            break
+    if not taken:
+        return None, blocks
+    head = np.concatenate(taken, axis=1)
+    return head[:, :frames], chain([head[:, frames:]], blocks)
+
+
+def join_stream(sources: Iterable, samplerate: int, channels: int,
+                crossfade_frames: int = 0) -> Iterator[np.ndarray]:
+    """Concatenate sources into one block stream.
+
+    Sources are consumed one after another (pass a generator to open them
+    lazily). Only the last crossfade_frames of the previous source are held
+    back, so memory stays bounded by block size plus the crossfade length.
+    Boundaries next to a source shorter than the crossfade fade over what is
+    available.
+    """
+    tail = np.zeros((channels, 0), dtype=np.float32)
+    for source in sources:
+        blocks = conform(source, samplerate, channels)
+        if tail.shape[1]:
+            head, blocks = _take(blocks, tail.shape[1])
+            if head is not None and head.shape[1]:
+                overlap = head.shape[1]
+                if tail.shape[1] > overlap:
+                    yield tail[:, :-overlap]
+                blocks = chain([equal_power_crossfade(tail[:, -overlap:], head)], blocks)
+            else:
+                blocks = chain([tail], blocks)
+            tail = np.zeros((channels, 0), dtype=np.float32)
+
+        # Hold back the end of this source for the next boundary
+        held = tail
+        for block in blocks:
+            held = np.concatenate([held, block], axis=1) if held.shape[1] else block
+            if held.shape[1] > crossfade_frames:
+                cut = held.shape[1] - crossfade_frames
+                yield held[:, :cut]
+                held = held[:, cut:]
+        tail = held
+    if tail.shape[1]:
+        yield tail
@@ -0,0 +1,138 @@
+"""
+Block-wise audio sources and sinks for ODOREMOVER Audio Suite
+Lets DSP run over (channels, samples) float32 blocks with memory bounded by block size
+"""
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import soundfile as sf
+
+from shared.config import Config
+from shared.encoder import StreamEncoder
+from shared.waveform import SIDECAR_SUFFIX, WaveformBuilder
+
+
+class ArraySource:
+    """Block source over an in-memory (or memory-mapped) signal"""
+
+    def __init__(self, y: np.ndarray, samplerate: int):
+        self.y = y if y.ndim == 2 else y[np.newaxis, :]
+        self.samplerate = int(samplerate)
+        self.channels = self.y.shape[0]
+        self.frames = self.y.shape[1]
+
+    def blocks(self, blocksize: Optional[int] = None) -> Iterator[np.ndarray]:
+        blocksize = blocksize or Config.STREAM_BLOCK_SIZE
+        for start in range(0, self.frames, blocksize):
+            yield np.asarray(self.y[:, start:start + blocksize], dtype=np.float32)
+
+
+class FileSource:
+    """Block source that reads straight from a libsndfile-readable file"""
+
+    def __init__(self, path: str, mono: bool = False):
+        info = sf.info(path)
+        self.path = path
+        self.mono = mono
+        self.samplerate = int(info.samplerate)
+        self.channels = 1 if mono else info.channels
+        self.frames = int(info.frames)
+
+    def blocks(self, blocksize: Optional[int] = None) -> Iterator[np.ndarray]:
+        blocksize = blocksize or Config.STREAM_BLOCK_SIZE
+        for block in sf.blocks(self.path, blocksize=blocksize, dtype="float32", always_2d=True):
+            block = block.T
+            if self.mono and block.shape[0] > 1:
+                block = block.mean(axis=0, keepdims=True)
+            yield block
+
+
+def open_source(upload, mono: bool = False):
+    """Stream an IngestedUpload from disk when libsndfile can read it, else via the decode cache"""
+    try:
+        return FileSource(upload.path, mono=mono)
+    except (RuntimeError, sf.LibsndfileError):
+        # Compressed formats libsndfile can't read (AAC, M4A, WMA) go through ffmpeg once
+        from shared.decode_cache import load_audio
+        y, sr = load_audio(upload, mono=mono)
+        return ArraySource(y, sr)
+
+
+def collect(blocks: Iterable[np.ndarray]) -> np.ndarray:
+    """Concatenate a block stream into one (channels, samples) array"""
+    blocks = list(blocks)
+    if not blocks:
+        return np.zeros((1, 0), dtype=np.float32)
+    return np.concatenate(blocks, axis=1)
+
+
+class BlockSink:
+    """One encoded output of a block stream, with its waveform sidecar built from the same blocks.
+
+    Blocks are passed to a StreamEncoder as they arrive. Unless waveform is
+    False (default: WAVEFORM_ENABLED), a WaveformBuilder sees every block too
+    and the sidecar is saved next to the output once it closes without error.
+    """
+
+    def __init__(self, output_path: str, samplerate: int, channels: int, subtype: Optional[str] = None,
+                 output_format: Optional[str] = None, quality: str = "high", waveform: Optional[bool] = None):
+        self.output_path = output_path
+        self.frames = 0
+        self._builder = WaveformBuilder(samplerate, channels) if _wants_waveform(waveform) else None
+        self._encoder = StreamEncoder(output_path, samplerate, channels, output_format, quality, subtype)
+
+    def write(self, block: np.ndarray):
+        self._encoder.write(block)
+        if self._builder is not None:
+            self._builder.push(block)
+        self.frames += block.shape[1]
+
+    def close(self, save_waveform: bool = True):
+        self._encoder.close()
+        if save_waveform and self._builder is not None:
+            self._builder.save(self.output_path + SIDECAR_SUFFIX)
+            self._builder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        self.close(save_waveform=exc_type is None)
+
+
+def write_blocks(blocks: Iterable[np.ndarray], output_path: str, samplerate: int,
+                 channels: int, subtype: Optional[str] = None, output_format: Optional[str] = None,
+                 quality: str = "high", waveform: Optional[bool] = None) -> int:
+    """Encode a block stream to a file, returns the number of (source rate) frames written.
+
+    output_format (wav, flac, ogg, opus, mp3; default: the path's extension)
+    and quality are applied by a BlockSink as the blocks arrive, which also
+    saves the output's waveform sidecar unless waveform is False.
+    """
+    with BlockSink(output_path, samplerate, channels, subtype, output_format, quality, waveform) as out:
+        for block in blocks:
+            out.write(block)
+    return out.frames
+
+
+def _wants_waveform(waveform: Optional[bool]) -> bool:
+    return Config.WAVEFORM_ENABLED if waveform is None else waveform
+
+
+def write_peak_normalized(make_blocks: Callable[[], Iterable[np.ndarray]], output_path: str, samplerate: int,
+                          channels: int, subtype: Optional[str] = None, output_format: Optional[str] = None,
+                          quality: str = "high") -> int:
+    """Peak-normalize a block stream (like librosa.util.normalize) in two passes.
+
+    make_blocks() is called twice, like the loudness normalizer's two reads of
+    its source: the first stream is only measured for its peak, the second
+    is rescaled and encoded into output_path as it arrives, so nothing is
+    written in between.
+    """
+    peak = 0.0
+    for block in make_blocks():
+        if block.size:
+            peak = max(peak, float(np.max(np.abs(block))))
+    gain = np.float32(1.0 / peak if peak > np.finfo(np.float32).tiny else 1.0)
+    return write_blocks((block * gain for block in make_blocks()), output_path, samplerate, channels, subtype,
+                        output_format, quality)
@@ -2,11 +2,13 @@
 Common audio processing utilities for ODOREMOVER Audio Suite
 """
 import os
+import shutil
 import uuid
 import numpy as np
-import librosa
-import soundfile as sf
-from pathlib import Path
+
+from shared.analysis import read_header
+from shared.config import Config
+from shared.upload import ingest_upload
 
 class AudioUtils:
     """Shared audio processing utilities"""
@@ -23,18 +25,14 @@ class AudioUtils:
         """Save uploaded file and return path"""
         upload_path = f"uploads/{prefix}_{uuid.uuid4()}_{file.filename}"
         with open(upload_path, "wb") as buffer:
-            content = file.read()
-            buffer.write(content)
+            shutil.copyfileobj(file, buffer, Config.UPLOAD_CHUNK_SIZE)
         return upload_path
     
     @staticmethod
     async def save_uploaded_file_async(file, prefix="audio"):
-        """Async version of save_uploaded_file"""
-        upload_path = f"uploads/{prefix}_{uuid.uuid4()}_{file.filename}"
-        with open(upload_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        return upload_path
+        """Async version of save_uploaded_file, streamed with size/type checks"""
+        upload = await ingest_upload(file, "uploads", prefix)
+        return upload.path
     
     @staticmethod
     def cleanup_file(file_path):
@@ -70,31 +68,54 @@ class AudioUtils:
     
     @staticmethod
     def get_audio_info(file_path):
-        """Get basic audio file information"""
+        """Get basic audio file information from the container headers, without decoding"""
         try:
-            y, sr = librosa.load(file_path, sr=None)
-            duration = len(y) / sr
-            
+            header = read_header(file_path)
+            if header is None:
+                return {"error": "Unrecognized audio format"}
             return {
-                "duration": duration,
-                "sample_rate": int(sr),
-                "channels": 1 if y.ndim == 1 else y.shape[0],
-                "samples": len(y)
+                "duration": header["duration"],
+                "sample_rate": header["sample_rate"],
+                "channels": header["channels"],
+                "samples": header["frames"]
             }
         except Exception as e:
             return {"error": str(e)}
     
     @staticmethod
     def apply_fade(audio_data, fade_in_samples=0, fade_out_samples=0):
-        """Apply fade in/out to audio data"""
-        result = audio_data.copy()
+        """Apply fade in/out to audio data along its last (time) axis"""
+        result = np.array(audio_data, dtype=np.float32)
         
         if fade_in_samples > 0:
-            fade_in = np.linspace(0, 1, fade_in_samples)
-            result[:fade_in_samples] *= fade_in
+            fade_in = np.linspace(0, 1, fade_in_samples, dtype=np.float32)
+            result[..., :fade_in_samples] *= fade_in
         
         if fade_out_samples > 0:
-            fade_out = np.linspace(1, 0, fade_out_samples)
-            result[-fade_out_samples:] *= fade_out
+            fade_out = np.linspace(1, 0, fade_out_samples, dtype=np.float32)
+            result[..., -fade_out_samples:] *= fade_out
+        
+        return result
+    
+    @staticmethod
+    def segment_to_array(segment):
+        """Convert a pydub AudioSegment to a float32 (channels, samples) array"""
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        samples = samples.reshape(-1, segment.channels).T
+        return samples / float(1 << (8 * segment.sample_width - 1))
+    
+    @staticmethod
+    def array_to_segment(audio_data, sample_rate, sample_width=2):
+        """Convert a float array (samples or channels x samples) to a pydub AudioSegment"""
+        from pydub import AudioSegment
         
-        return result
\ No newline at end of file
+        data = np.atleast_2d(audio_data)
+        scale = float(1 << (8 * sample_width - 1))
+        dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+        pcm = np.clip(data.T * scale, -scale, scale - 1).astype(dtype)
+        return AudioSegment(
+            data=pcm.tobytes(),
+            sample_width=sample_width,
+            frame_rate=int(sample_rate),
+            channels=data.shape[0]
+        )
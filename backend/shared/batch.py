@@ -0,0 +1,185 @@
+"""
+Batch processing for ODOREMOVER Audio Suite
+Runs one tool over many uploads with bounded parallelism and bundles the outputs into a zip
+"""
+import asyncio
+import inspect
+import json
+import os
+import shutil
+import uuid
+import zipfile
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from shared.config import Config
+from shared.jobs import report_progress
+from shared.result_cache import artifacts
+from shared.retention import pin, unpin
+from shared.storage import get_storage
+from shared.upload import IngestedUpload, ingest_upload, store_file
+
+
+def parse_batch_params(process_file: Callable, params) -> dict:
+    """Validate a JSON object of tool parameters against process_file(upload, ...)"""
+    if isinstance(params, str):
+        try:
+            params = json.loads(params or "{}")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="params must be a JSON object")
+    if not isinstance(params, dict):
+        raise HTTPException(status_code=400, detail="params must be a JSON object")
+    params = {key: value for key, value in params.items() if key != "use_cache"}
+    try:
+        inspect.signature(process_file).bind(None, **params)
+    except TypeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid params: {str(e)}")
+    return params
+
+
+def _failure(filename: str, status_code: int, error) -> dict:
+    return {"filename": filename, "success": False, "status_code": status_code, "error": str(error)}
+
+
+def extract_archive(archive_path: str, upload_dir: Optional[str] = None) -> Tuple[List[IngestedUpload], List[dict]]:
+    """Store every audio member of a zip as an upload; other members are reported, not fatal"""
+    uploads, rejected = [], []
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or os.path.basename(member.filename).startswith("."):
+                    continue
+                if len(uploads) + len(rejected) >= Config.BATCH_MAX_FILES:
+                    rejected.append(_failure(member.filename, 413, f"Batch is limited to {Config.BATCH_MAX_FILES} files"))
+                    continue
+                try:
+                    with archive.open(member) as fileobj:
+                        uploads.append(store_file(fileobj, member.filename, upload_dir, prefix="batch"))
+                except HTTPException as e:
+                    rejected.append(_failure(member.filename, e.status_code, e.detail))
+                except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                    rejected.append(_failure(member.filename, 400, e))
+    except zipfile.BadZipFile:
+        for upload in uploads:
+            upload.remove()
+        raise HTTPException(status_code=400, detail="archive is not a valid zip file")
+    return uploads, rejected
+
+
+async def ingest_batch(files: Optional[List[UploadFile]], archive: Optional[UploadFile],
+                       upload_dir: Optional[str] = None) -> Tuple[List[IngestedUpload], List[dict]]:
+    """Ingest loose files and/or a zip archive; unusable files become per-file failures"""
+    uploads, rejected = [], []
+    try:
+        for file in files or []:
+            if len(uploads) >= Config.BATCH_MAX_FILES:
+                raise HTTPException(status_code=413, detail=f"Batch is limited to {Config.BATCH_MAX_FILES} files")
+            try:
+                uploads.append(await ingest_upload(file, upload_dir, prefix="batch"))
+            except HTTPException as e:
+                rejected.append(_failure(file.filename, e.status_code, e.detail))
+
+        if archive is not None:
+            stored = await ingest_upload(archive, upload_dir, prefix="batch", allowed_extensions={"zip"},
+                                         max_size=Config.BATCH_MAX_ARCHIVE_SIZE)
+            try:
+                extracted, failed = await asyncio.to_thread(extract_archive, stored.path, upload_dir)
+            finally:
+                stored.remove()
+            uploads.extend(extracted)
+            rejected.extend(failed)
+    except BaseException:
+        for upload in uploads:
+            upload.remove()
+        raise
+
+    if not uploads and not rejected:
+        raise HTTPException(status_code=400, detail="No files to process: send 'files' or a zip 'archive'")
+    return uploads, rejected
+
+
+def bundle_outputs(results: List[dict], processed_dir: str) -> Optional[str]:
+    """Zip every successful output (plus a manifest) and publish it to result storage, returns the zip filename"""
+    storage = get_storage()
+    entries = []
+    for index, entry in enumerate(results, start=1):
+        if not entry["success"]:
+            continue
+        stem = os.path.splitext(os.path.basename(entry["filename"]))[0]
+        outputs = [name for name in artifacts(entry["result"]) if storage.exists(name)]
+        for name in outputs:
+            if len(outputs) == 1:
+                arcname = f"{index:03d}_{stem}{os.path.splitext(name)[1]}"
+            else:
+                arcname = f"{index:03d}_{stem}/{name}"
+            entries.append((name, arcname))
+    if not entries:
+        return None
+
+    zip_filename = f"batch_{uuid.uuid4()}.zip"
+    zip_path = os.path.join(processed_dir, zip_filename)
+    # Audio outputs are already dense; storing them keeps zipping I/O-bound
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as bundle:
+        for name, arcname in entries:
+            with storage.open(name) as source, bundle.open(arcname, "w", force_zip64=True) as target:
+                shutil.copyfileobj(source, target, Config.DOWNLOAD_CHUNK_SIZE)
+        bundle.writestr("manifest.json", json.dumps(results, indent=2, default=str))
+    storage.publish([zip_filename], processed_dir)
+    return zip_filename
+
+
+async def run_batch(tool: str, uploads: List[IngestedUpload], process_file: Callable, params: dict,
+                    rejected: Optional[List[dict]] = None, processed_dir: str = "processed",
+                    parallelism: Optional[int] = None) -> dict:
+    """Run process_file(upload, **params) over every upload, at most `parallelism` at a time.
+
+    process_file removes each upload when it finishes. Failures are recorded
+    per file instead of failing the batch.
+    """
+    semaphore = asyncio.Semaphore(parallelism or Config.BATCH_PARALLELISM)
+    total = len(uploads)
+    finished = 0
+    outputs = []
+
+    async def run_one(upload):
+        nonlocal finished
+        async with semaphore:
+            try:
+                entry = {"filename": upload.filename, "success": True,
+                         "result": await process_file(upload, **params)}
+                # Keep finished outputs until they are bundled
+                paths = [os.path.join(processed_dir, name) for name in artifacts(entry["result"])]
+                pin(*paths)
+                outputs.extend(paths)
+            except HTTPException as e:
+                entry = _failure(upload.filename, e.status_code, e.detail)
+            except Exception as e:
+                entry = _failure(upload.filename, 500, e)
+        finished += 1
+        report_progress(finished / total)
+        return entry
+
+    try:
+        results = list(await asyncio.gather(*(run_one(upload) for upload in uploads)))
+        results.extend(rejected or [])
+        zip_filename = await asyncio.to_thread(bundle_outputs, results, processed_dir)
+    finally:
+        unpin(*outputs)
+
+    succeeded = sum(1 for entry in results if entry["success"])
+    download_url = f"/download/{zip_filename}" if zip_filename else None
+    return {
+        "success": succeeded > 0,
+        "message": f"Batch {tool}: {succeeded} of {len(results)} files processed successfully",
+        "output_file": download_url,
+        "download_url": download_url,
+        "batch_info": {
+            "tool": tool,
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "parallelism": parallelism or Config.BATCH_PARALLELISM
+        },
+        "results": results
+    }
@@ -13,22 +13,113 @@ class Config:
     
     # File Upload Settings
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 100 * 1024 * 1024))  # 100MB
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1MB
     ALLOWED_EXTENSIONS = {
-        "mp3", "wav", "flac", "aac", "ogg", "m4a", "wma"
+        "mp3", "wav", "flac", "aac", "ogg", "opus", "m4a", "wma"
     }
     
     # Processing Settings
     DEFAULT_SAMPLE_RATE = int(os.getenv("DEFAULT_SAMPLE_RATE", 44100))
     PROCESSING_TIMEOUT = int(os.getenv("PROCESSING_TIMEOUT", 300))  # 5 minutes
-    
+    FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+    # Worker Pool Settings
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))
+    WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+    WORKER_MAX_PENDING = int(os.getenv("WORKER_MAX_PENDING", 64))  # across all services
+    SERVICE_MAX_QUEUE_DEPTH = int(os.getenv("SERVICE_MAX_QUEUE_DEPTH", 16))  # waiting per service
+    WORKER_WARMUP = os.getenv("WORKER_WARMUP", "false").lower() == "true"  # pre-JIT kernels after startup
+    SERVICE_CONCURRENCY = {
+        # Heavy STFT / phase-vocoder tools get fewer concurrent slots
+        "vocal_remover": int(os.getenv("VOCAL_REMOVER_CONCURRENCY", 2)),
+        "pitch_tempo": int(os.getenv("PITCH_TEMPO_CONCURRENCY", 2)),
+        "noise_reduction": int(os.getenv("NOISE_REDUCTION_CONCURRENCY", 2)),
+    }
+
+    # Streaming DSP Settings
+    STREAM_BLOCK_SIZE = int(os.getenv("STREAM_BLOCK_SIZE", 65536))  # frames per block
+    STFT_N_FFT = 2048
+    STFT_HOP_LENGTH = 512
+    EQ_COEFFICIENT_CACHE_SIZE = int(os.getenv("EQ_COEFFICIENT_CACHE_SIZE", 256))  # memoized (sr, band spec) filter designs
+    LOUDNESS_LIMITER_LOOKAHEAD = float(os.getenv("LOUDNESS_LIMITER_LOOKAHEAD", 0.005))  # seconds, true-peak limiter attack
+
+    # Real-time Settings (WebSocket streaming)
+    REALTIME_MAX_BLOCK_FRAMES = int(os.getenv("REALTIME_MAX_BLOCK_FRAMES", 65536))
+    REALTIME_MAX_CHANNELS = int(os.getenv("REALTIME_MAX_CHANNELS", 8))
+    REALTIME_N_FFT = int(os.getenv("REALTIME_N_FFT", 1024))  # noise reduction frame size, sets its latency
+    REALTIME_LOUDNESS_WINDOW = float(os.getenv("REALTIME_LOUDNESS_WINDOW", 3.0))  # seconds of loudness the volume gain tracks
+
+    # Preview Settings (excerpt renders while tweaking parameters)
+    PREVIEW_DURATION = float(os.getenv("PREVIEW_DURATION", 15))  # seconds rendered per preview
+    PREVIEW_MIN_DURATION = float(os.getenv("PREVIEW_MIN_DURATION", 3))  # shortest excerpt the budget may trim to
+    PREVIEW_MAX_DURATION = float(os.getenv("PREVIEW_MAX_DURATION", 60))
+    PREVIEW_LATENCY_BUDGET = float(os.getenv("PREVIEW_LATENCY_BUDGET", 1.5))  # seconds per render
+    PREVIEW_PROXY_RATE = int(os.getenv("PREVIEW_PROXY_RATE", 22050))  # Hz, used when full rate would miss the budget
+    PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "ogg")  # any output format: ogg (Vorbis), opus, mp3, flac, wav
+    PREVIEW_SESSION_TTL = float(os.getenv("PREVIEW_SESSION_TTL", 15 * 60))  # idle seconds before a session closes
+    PREVIEW_MAX_SESSIONS = int(os.getenv("PREVIEW_MAX_SESSIONS", 32))
+    PREVIEW_CONCURRENCY = int(os.getenv("PREVIEW_CONCURRENCY", 2))  # renders running at once in the gateway
+
+    # Job Settings
+    JOB_STORE = os.getenv("JOB_STORE", "memory")  # memory, sqlite
+    JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", "jobs.sqlite3"))
+    JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", 8))
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+
     # Directory Settings
     BASE_DIR = Path(os.getenv("BASE_DIR", "."))
     UPLOAD_DIR = BASE_DIR / "uploads"
     PROCESSED_DIR = BASE_DIR / "processed"
     TEMP_DIR = BASE_DIR / "temp"
+    CACHE_DIR = BASE_DIR / "cache"
+
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))  # 5GB
+    RESULT_CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", 7 * 24 * 3600))  # 7 days
+
+    # Decoded Audio Cache Settings
+    DECODE_CACHE_DIR = TEMP_DIR / "decoded"
+    DECODE_CACHE_MAX_BYTES = int(os.getenv("DECODE_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))  # 2GB
+    DECODE_CACHE_MEMORY_BYTES = int(os.getenv("DECODE_CACHE_MEMORY_BYTES", 256 * 1024 * 1024))  # per worker
+
+    # Batch Settings
+    BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 500))
+    BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", 4))  # files in flight per batch
+    BATCH_MAX_ARCHIVE_SIZE = int(os.getenv("BATCH_MAX_ARCHIVE_SIZE", 2 * 1024 * 1024 * 1024))  # 2GB
+
+    # Download Settings
+    DOWNLOAD_CACHE_MAX_AGE = int(os.getenv("DOWNLOAD_CACHE_MAX_AGE", 24 * 3600))  # seconds
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))  # bytes per read when not zero-copy
+    DOWNLOAD_TRANSCODE = os.getenv("DOWNLOAD_TRANSCODE", "true").lower() == "true"  # negotiate flac/gzip for WAV
+    # gzip WAVs for every client sending Accept-Encoding: gzip (browsers always do), not just ?encoding=gzip;
+    # off by default since gzip responses drop Content-Length and range support
+    DOWNLOAD_GZIP = os.getenv("DOWNLOAD_GZIP", "false").lower() == "true"
+    DOWNLOAD_GZIP_LEVEL = int(os.getenv("DOWNLOAD_GZIP_LEVEL", 1))
     
+    # Retention Settings (per-directory TTL since last access, and byte quota)
+    RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+    RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", 60))  # seconds between runs
+    RETENTION_SCAN_BATCH = int(os.getenv("RETENTION_SCAN_BATCH", 5000))  # directory entries visited per run
+    RETENTION_GRACE_SECONDS = float(os.getenv("RETENTION_GRACE_SECONDS", PROCESSING_TIMEOUT))  # never delete younger files
+    UPLOAD_RETENTION_SECONDS = int(os.getenv("UPLOAD_RETENTION_SECONDS", 6 * 3600))
+    UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", 10 * 1024 * 1024 * 1024))  # 10GB
+    PROCESSED_RETENTION_SECONDS = int(os.getenv("PROCESSED_RETENTION_SECONDS", 7 * 24 * 3600))  # 7 days
+    PROCESSED_QUOTA_BYTES = int(os.getenv("PROCESSED_QUOTA_BYTES", 20 * 1024 * 1024 * 1024))  # 20GB
+    TEMP_RETENTION_SECONDS = int(os.getenv("TEMP_RETENTION_SECONDS", 24 * 3600))
+    TEMP_QUOTA_BYTES = int(os.getenv("TEMP_QUOTA_BYTES", 10 * 1024 * 1024 * 1024))  # 10GB
+
     # Storage Settings
-    STORAGE_PROVIDER = os.getenv("STORAGE_PROVIDER", "local")  # local, cloudinary, supabase
+    STORAGE_PROVIDER = os.getenv("STORAGE_PROVIDER", "local")  # local, s3 (any S3-compatible service)
+    S3_BUCKET = os.getenv("S3_BUCKET", "")
+    S3_PREFIX = os.getenv("S3_PREFIX", "processed/")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://localhost:9000 for MinIO
+    S3_REGION = os.getenv("S3_REGION") or None
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 32))
+    S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 16 * 1024 * 1024))  # 16MB
+    S3_MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", 16 * 1024 * 1024))  # 16MB
+    S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", 4))  # parts in flight per upload
+    S3_PRESIGN_EXPIRY = int(os.getenv("S3_PRESIGN_EXPIRY", 3600))  # seconds
     
     # Cloudinary Settings (if used)
     CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
@@ -39,13 +130,27 @@ class Config:
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     
+    # Waveform Settings (peak pyramids and spectrogram tiles stored next to each output)
+    WAVEFORM_ENABLED = os.getenv("WAVEFORM_ENABLED", "true").lower() == "true"
+    WAVEFORM_SAMPLES_PER_PIXEL = int(os.getenv("WAVEFORM_SAMPLES_PER_PIXEL", 256))  # finest pyramid level
+    WAVEFORM_MIN_PIXELS = int(os.getenv("WAVEFORM_MIN_PIXELS", 1024))  # coarsest level has at most this many
+    WAVEFORM_SPECTROGRAM_N_FFT = int(os.getenv("WAVEFORM_SPECTROGRAM_N_FFT", 2048))  # also the column hop
+    WAVEFORM_SPECTROGRAM_BANDS = int(os.getenv("WAVEFORM_SPECTROGRAM_BANDS", 64))  # mel bands per column
+    WAVEFORM_TILE_COLUMNS = int(os.getenv("WAVEFORM_TILE_COLUMNS", 256))
+
+    # Analysis Settings (/analyze)
+    ANALYSIS_CLIP_LEVEL = float(os.getenv("ANALYSIS_CLIP_LEVEL", 0.999))  # |sample| counted as clipped
+    ANALYSIS_CLIP_RUN = int(os.getenv("ANALYSIS_CLIP_RUN", 3))  # consecutive clipped samples making one clipping event
+    ANALYSIS_INDEX_MAX_ENTRIES = int(os.getenv("ANALYSIS_INDEX_MAX_ENTRIES", 100000))  # analyses kept by content hash
+
     # Security Settings
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
     
     # Audio Processing Defaults
     DEFAULT_VOCAL_REMOVAL_METHOD = "center_channel"
     DEFAULT_NOISE_REDUCTION_STRENGTH = 0.8
-    DEFAULT_VOLUME_TARGET_DB = -6.0
+    DEFAULT_VOLUME_TARGET_DB = -14.0  # LUFS integrated
+    DEFAULT_TRUE_PEAK_DB = -1.0  # dBTP
     DEFAULT_FADE_DURATION = 2.0
     
     # Service Ports (for microservice deployment)
@@ -59,8 +164,18 @@ class Config:
         "fade_effect": 8007,
         "metadata_editor": 8008,
         "audio_reverse": 8009,
-        "equalizer": 8010
+        "equalizer": 8010,
+        "audio_splitter": 8011,
+        "pipeline": 8012
     }
+
+    # Service Forwarding Settings
+    # forward: send every tool to its service (SERVICE_PORTS or <SERVICE>_URLS); inprocess: only
+    # services with <SERVICE>_URLS set are forwarded, the rest run inside the gateway
+    GATEWAY_MODE = os.getenv("GATEWAY_MODE", "inprocess")
+    FORWARD_MAX_CONNECTIONS = int(os.getenv("FORWARD_MAX_CONNECTIONS", 100))
+    FORWARD_MAX_KEEPALIVE = int(os.getenv("FORWARD_MAX_KEEPALIVE", 20))
+    SERVICE_HEALTH_INTERVAL = float(os.getenv("SERVICE_HEALTH_INTERVAL", 10))  # seconds
     
     @classmethod
     def create_directories(cls):
@@ -74,8 +189,23 @@ class Config:
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in cls.ALLOWED_EXTENSIONS
     
+    @classmethod
+    def get_service_concurrency(cls, service_name: str) -> int:
+        """Maximum number of jobs a service may run in the worker pool at once"""
+        return max(1, min(cls.SERVICE_CONCURRENCY.get(service_name, cls.WORKER_PROCESSES),
+                          cls.WORKER_PROCESSES))
+
     @classmethod
     def get_service_url(cls, service_name: str) -> str:
         """Get service URL for microservice communication"""
         port = cls.SERVICE_PORTS.get(service_name, 8000)
-        return f"http://localhost:{port}"
\ No newline at end of file
+        return f"http://localhost:{port}"
+
+    @classmethod
+    def get_service_urls(cls, service_name: str) -> list:
+        """Instances to forward a service to; empty means it runs in-process"""
+        urls = os.getenv(f"{service_name.upper()}_URLS", "")
+        urls = [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+        if not urls and cls.GATEWAY_MODE == "forward" and service_name in cls.SERVICE_PORTS:
+            urls = [cls.get_service_url(service_name)]
+        return urls
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Decoded-audio cache for ODOREMOVER Audio Suite
+Keeps decoded PCM as memory-mapped float32 .npy files so chained tools skip the decoder
+"""
+import json
+import os
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import librosa
+
+from shared.config import Config
+
+
+class DecodeCache:
+    """Disk-backed LRU of decoded uploads with a bounded in-memory front"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_disk_bytes: Optional[int] = None,
+                 max_memory_bytes: Optional[int] = None):
+        self.cache_dir = str(cache_dir or Config.DECODE_CACHE_DIR)
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else Config.DECODE_CACHE_MAX_BYTES
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else Config.DECODE_CACHE_MEMORY_BYTES
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash: str, sr: Optional[int], mono: bool) -> str:
+        return f"{content_hash}_{sr or 'native'}_{'mono' if mono else 'multi'}"
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.npy", f"{base}.json"
+
+    def load(self, path: str, content_hash: str, sr: Optional[int] = None,
+             mono: bool = True) -> Tuple[np.ndarray, int]:
+        """Decode path like librosa.load, reusing a cached copy when one exists.
+
+        The returned array is read-only; copy it before modifying in place.
+        """
+        key = self.make_key(content_hash, sr, mono)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        npy_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as meta_file:
+                sample_rate = json.load(meta_file)["sample_rate"]
+            y = np.load(npy_path, mmap_mode="r")
+            os.utime(npy_path)  # mark as recently used for disk eviction
+        except (OSError, ValueError, KeyError):
+            y, sample_rate = self._decode_and_store(path, key, sr, mono)
+
+        self._remember(key, y, int(sample_rate))
+        return y, int(sample_rate)
+
+    def _decode_and_store(self, path: str, key: str, sr: Optional[int], mono: bool):
+        y, sample_rate = librosa.load(path, sr=sr, mono=mono)
+        y = np.ascontiguousarray(y, dtype=np.float32)
+
+        npy_path, meta_path = self._paths(key)
+        # Write under temporary names and rename, so concurrent workers never see partial files
+        tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+        with open(npy_path + tmp_suffix, "wb") as npy_file:
+            np.save(npy_file, y)
+        with open(meta_path + tmp_suffix, "w") as meta_file:
+            json.dump({"sample_rate": int(sample_rate), "shape": list(y.shape), "dtype": "float32"}, meta_file)
+        os.replace(meta_path + tmp_suffix, meta_path)
+        os.replace(npy_path + tmp_suffix, npy_path)
+
+        self._evict_disk(keep=npy_path)
+        return np.load(npy_path, mmap_mode="r"), sample_rate
+
+    def _remember(self, key: str, y: np.ndarray, sample_rate: int):
+        if y.nbytes > self.max_memory_bytes:
+            return
+        self._memory[key] = (y, sample_rate)
+        self._memory_bytes += y.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (old, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= old.nbytes
+
+    def _evict_disk(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits max_disk_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, npy_path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            if npy_path == keep:
+                continue
+            for stale in (npy_path, npy_path[:-len(".npy")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+
+_cache: Optional[DecodeCache] = None
+
+
+def get_decode_cache() -> DecodeCache:
+    """Return this process's decode cache"""
+    global _cache
+    if _cache is None:
+        _cache = DecodeCache()
+    return _cache
+
+
+def load_audio(upload, sr: Optional[int] = None, mono: bool = True) -> Tuple[np.ndarray, int]:
+    """Decode an IngestedUpload through the decode cache"""
+    return get_decode_cache().load(upload.path, upload.content_hash, sr=sr, mono=mono)
@@ -0,0 +1,272 @@
+"""
+Download serving for ODOREMOVER Audio Suite
+Range requests, content-hash ETags and cache headers for processed files, with optional FLAC/gzip negotiation
+"""
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+import zlib
+from email.utils import formatdate
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import soundfile as sf
+from fastapi import HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from shared.config import Config
+from shared.retention import get_retention_manager
+from shared.storage import get_storage
+
+# Per-download sidecars (content hashes, transcoded variants) live here, inside the served directory
+VARIANT_DIRNAME = ".variants"
+
+# WAV subtypes FLAC stores losslessly
+FLAC_SUBTYPES = {"PCM_S8", "PCM_U8", "PCM_16", "PCM_24"}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single-range "bytes=" header, None to serve the whole file.
+
+    Multi-range and malformed headers are ignored, as RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if size == 0 and (first or last):
+        # An empty file has no byte to start from, not even for a suffix range
+        raise RangeNotSatisfiable()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _accepts(header: Optional[str], *values: str) -> bool:
+    """True when a comma-separated Accept-style header lists one of values with q > 0"""
+    for item in (header or "").lower().split(","):
+        token, _, params = item.strip().partition(";")
+        if token.strip() in values:
+            q = re.search(r"q=([0-9.]+)", params)
+            if q is None or float(q.group(1)) > 0:
+                return True
+    return False
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def content_hash(path: str) -> str:
+    """sha256 of a file, remembered in a sidecar keyed by size and mtime (blocking)"""
+    stat = os.stat(path)
+    directory, name = os.path.split(path)
+    sidecar = os.path.join(directory, VARIANT_DIRNAME, f"{name}.sha256")
+    stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+    try:
+        with open(sidecar) as f:
+            saved_stamp, digest = f.read().split()
+        if saved_stamp == stamp:
+            return digest
+    except (OSError, ValueError):
+        pass
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(Config.DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+    with open(sidecar, "w") as f:
+        f.write(f"{stamp} {digest}")
+    return digest
+
+
+def flac_variant(path: str) -> Optional[str]:
+    """Lossless FLAC copy of a 8-24 bit PCM WAV, created on first use; None if FLAC can't hold it (blocking)"""
+    directory, name = os.path.split(path)
+    variant = os.path.join(directory, VARIANT_DIRNAME, f"{name}.flac")
+    if os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(path):
+        return variant
+    info = sf.info(path)
+    if info.format != "WAV" or info.subtype not in FLAC_SUBTYPES:
+        return None
+
+    os.makedirs(os.path.dirname(variant), exist_ok=True)
+    partial = f"{variant}.{uuid.uuid4().hex}.part"
+    try:
+        with sf.SoundFile(partial, "w", samplerate=info.samplerate, channels=info.channels,
+                          subtype=info.subtype, format="FLAC") as out:
+            for block in sf.blocks(path, blocksize=Config.STREAM_BLOCK_SIZE, dtype="int32", always_2d=True):
+                out.write(block)
+        os.replace(partial, variant)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return variant
+
+
+class RangeFileResponse(Response):
+    """Sends bytes [start, start + length) of a file.
+
+    Uses the ASGI zero-copy send extension when the server offers it,
+    otherwise positional reads in DOWNLOAD_CHUNK_SIZE pieces off the event loop.
+    """
+
+    def __init__(self, path: str, start: int, length: int, status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        headers = dict(headers or {})
+        headers["content-length"] = str(length)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd,
+                            "offset": self.start, "count": self.length, "more_body": False})
+                return
+            offset, remaining = self.start, self.length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(Config.DOWNLOAD_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; end the body rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+
+def _record_download(source: str, served: str):
+    """Bump last access of the file and the representation sent, for retention's LRU order"""
+    retention = get_retention_manager()
+    retention.touch(source)
+    if served != source:
+        retention.touch(served)
+
+
+async def _gzip_chunks(path: str) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(Config.DOWNLOAD_GZIP_LEVEL, zlib.DEFLATED, 31)
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, Config.DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            compressed = await asyncio.to_thread(compressor.compress, chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
+
+
+async def serve_download(request: Request, directory: str, filename: str) -> Response:
+    """Serve directory/filename honouring If-None-Match, Range/If-Range and FLAC/gzip negotiation.
+
+    A WAV is sent as FLAC when the client asks for it (?format=flac or an
+    Accept listing audio/flac), or gzip-encoded when Accept-Encoding allows it,
+    no range is requested and either ?encoding=gzip or DOWNLOAD_GZIP is set.
+    Each representation has its own strong ETag. With remote result storage
+    the client is redirected to a presigned object URL instead.
+    """
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="File not found")
+    storage = get_storage()
+    if storage.remote:
+        # The object store serves ranges and ETags itself
+        return RedirectResponse(await asyncio.to_thread(storage.download_url, filename), status_code=307)
+    path = os.path.join(directory, filename)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    digest = await asyncio.to_thread(content_hash, path)
+    etag = f'"{digest}"'
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    headers = {
+        "cache-control": f"public, max-age={Config.DOWNLOAD_CACHE_MAX_AGE}",
+        "accept-ranges": "bytes",
+    }
+
+    transcodable = Config.DOWNLOAD_TRANSCODE and filename.lower().endswith(".wav")
+    encoding = None
+    if transcodable:
+        headers["vary"] = "Accept, Accept-Encoding"
+        wants_flac = (request.query_params.get("format", "").lower() == "flac"
+                      or _accepts(request.headers.get("accept"), "audio/flac", "audio/x-flac"))
+        variant = await asyncio.to_thread(flac_variant, path) if wants_flac else None
+        if variant is not None:
+            path, etag, media_type = variant, f'"{digest}-flac"', "audio/flac"
+            headers["content-disposition"] = f'inline; filename="{os.path.splitext(filename)[0]}.flac"'
+        elif (not request.headers.get("range")
+              and (Config.DOWNLOAD_GZIP or request.query_params.get("encoding", "").lower() == "gzip")
+              and _accepts(request.headers.get("accept-encoding"), "gzip")):
+            encoding, etag = "gzip", f'"{digest}-gzip"'
+
+    await asyncio.to_thread(_record_download, os.path.join(directory, filename), path)
+    stat = os.stat(path)
+    headers["etag"] = etag
+    headers["last-modified"] = formatdate(stat.st_mtime, usegmt=True)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding == "gzip":
+        headers["content-encoding"] = "gzip"
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers, media_type=media_type)
+        return StreamingResponse(_gzip_chunks(path), headers=headers, media_type=media_type)
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return RangeFileResponse(path, 0, size, headers=headers, media_type=media_type)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return RangeFileResponse(path, start, end - start + 1, status_code=206, headers=headers, media_type=media_type)
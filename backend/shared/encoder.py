@@ -0,0 +1,175 @@
+"""
+Streaming output encoder for ODOREMOVER Audio Suite
+Encodes (channels, samples) float32 blocks straight to WAV, FLAC, Ogg Vorbis, Opus or MP3 through libsndfile
+"""
+import inspect
+import os
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+import soxr
+from fastapi import HTTPException
+
+# Output format -> (libsndfile container, codec subtype or None to keep the source's, sample rates the codec takes)
+OUTPUT_FORMATS = {
+    "wav": ("WAV", None, None),
+    "flac": ("FLAC", None, None),
+    "ogg": ("OGG", "VORBIS", None),
+    "opus": ("OGG", "OPUS", (8000, 12000, 16000, 24000, 48000)),
+    "mp3": ("MP3", "MPEG_LAYER_III", (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)),
+}
+
+# libsndfile compression level (0 is best) per lossy format and quality: Vorbis about q6/q4/q2,
+# stereo Opus about 192/128/96 kbps, constant-bitrate MP3 at the converter's 320/192/128 kbps
+COMPRESSION_LEVELS = {
+    "ogg": {"high": 0.4, "medium": 0.6, "low": 0.8},
+    "opus": {"high": 0.63, "medium": 0.75, "low": 0.81},
+    "mp3": {"high": 0.0, "medium": 0.4, "low": 0.66},
+}
+QUALITIES = ("high", "medium", "low")
+
+# Uncompressed sample formats, the only source subtypes worth carrying over: a compressed
+# source's codec (MPEG_LAYER_III, VORBIS...) may pass check_format yet fail to encode
+UNCOMPRESSED_SUBTYPES = ("PCM_16", "PCM_24", "PCM_32", "FLOAT", "DOUBLE")
+
+# Subtypes that store samples past full scale; everything else is clipped to [-1, 1] first
+FLOAT_SUBTYPES = ("FLOAT", "DOUBLE")
+
+# libsndfile commands for the encoder settings, for soundfile versions without
+# SoundFile(compression_level=, bitrate_mode=) (added in 0.13)
+SFC_SET_COMPRESSION_LEVEL = 0x1301
+SFC_SET_BITRATE_MODE = 0x1305
+SF_BITRATE_MODE_CONSTANT = 0
+
+# How encoder settings reach libsndfile: "keywords" (public SoundFile arguments), "command"
+# (soundfile's private cffi handles, as in 0.12), or None (codec defaults)
+if "compression_level" in inspect.signature(sf.SoundFile.__init__).parameters:
+    SETTINGS_API = "keywords"
+elif hasattr(sf, "_ffi") and hasattr(sf, "_snd"):
+    SETTINGS_API = "command"
+else:
+    SETTINGS_API = None
+
+
+def check_output(output_format: str = "wav", quality: str = "high"):
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unsupported output format. Available: {', '.join(OUTPUT_FORMATS)}")
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"output_quality must be one of: {', '.join(QUALITIES)}")
+
+
+def encoded_rate(output_format: str, samplerate: int) -> int:
+    """Sample rate output_format is written at: the source's, or the nearest the codec takes above it"""
+    rates = OUTPUT_FORMATS[output_format][2]
+    if rates is None or samplerate in rates:
+        return samplerate
+    return next((rate for rate in rates if rate > samplerate), rates[-1])
+
+
+def codec_subtype(output_format: str, source_subtype: Optional[str] = None) -> Optional[str]:
+    """libsndfile subtype for output_format, keeping source_subtype (the bit depth) where it fits"""
+    container, subtype, _ = OUTPUT_FORMATS[output_format]
+    if subtype is not None:
+        return subtype
+    if source_subtype in UNCOMPRESSED_SUBTYPES and sf.check_format(container, source_subtype):
+        return source_subtype
+    if container == "FLAC" and source_subtype in ("FLOAT", "DOUBLE"):
+        # Float sources keep as much of their resolution as FLAC stores
+        return "PCM_24"
+    return None
+
+
+def format_for_path(path: str) -> Optional[str]:
+    """Output format named by a file extension, None for other extensions"""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in OUTPUT_FORMATS else None
+
+
+def _open_output(output_path: str, samplerate: int, channels: int, subtype: Optional[str],
+                 container: Optional[str], level: Optional[float], constant_bitrate: bool) -> sf.SoundFile:
+    """SoundFile for writing with the encoder settings applied before the first write"""
+    settings = {}
+    if SETTINGS_API == "keywords":
+        if level is not None:
+            settings["compression_level"] = level
+        if constant_bitrate:
+            settings["bitrate_mode"] = "CONSTANT"
+    out = sf.SoundFile(output_path, "w", samplerate=samplerate, channels=channels, subtype=subtype,
+                       format=container, **settings)
+    if SETTINGS_API == "command" and hasattr(out, "_file"):
+        if constant_bitrate:
+            _command(out, SFC_SET_BITRATE_MODE, "int", SF_BITRATE_MODE_CONSTANT)
+        if level is not None:
+            _command(out, SFC_SET_COMPRESSION_LEVEL, "double", level)
+    return out
+
+
+def _command(out: sf.SoundFile, command: int, ctype: str, value) -> bool:
+    """Send a libsndfile command through soundfile's private handles; True if libsndfile accepted it"""
+    data = sf._ffi.new(f"{ctype}*", value)
+    return sf._snd.sf_command(out._file, command, data, sf._ffi.sizeof(ctype)) == 1
+
+
+class StreamEncoder:
+    """Encodes blocks into output_path as they arrive, with no intermediate file.
+
+    output_format defaults to the one named by the path's extension; other
+    extensions (AIFF, CAF...) are left to libsndfile with no encoder settings.
+    Blocks are resampled statefully when the codec doesn't take the source
+    rate (Opus, MP3) and clipped to [-1, 1] unless the subtype stores float.
+    """
+
+    def __init__(self, output_path: str, samplerate: int, channels: int, output_format: Optional[str] = None,
+                 quality: str = "high", subtype: Optional[str] = None):
+        self.output_format = output_format or format_for_path(output_path)
+        self.quality = quality
+        self.channels = channels
+        self.samplerate = samplerate
+        self.subtype = subtype
+        container = None
+        if self.output_format is not None:
+            check_output(self.output_format, quality)
+            if self.output_format == "mp3" and channels > 2:
+                raise ValueError("MP3 output supports at most 2 channels")
+            container = OUTPUT_FORMATS[self.output_format][0]
+            self.samplerate = encoded_rate(self.output_format, samplerate)
+            self.subtype = codec_subtype(self.output_format, subtype)
+        self._resampler = None
+        if self.samplerate != samplerate:
+            self._resampler = soxr.ResampleStream(samplerate, self.samplerate, channels, dtype="float32")
+
+        self._out = _open_output(output_path, self.samplerate, channels, self.subtype, container,
+                                 COMPRESSION_LEVELS.get(self.output_format, {}).get(quality),
+                                 self.output_format == "mp3")
+        self._clip = self._out.subtype not in FLOAT_SUBTYPES
+
+    def write(self, block: np.ndarray):
+        frames = np.ascontiguousarray(block.T, dtype=np.float32)
+        if self._resampler is not None:
+            frames = self._resampler.resample_chunk(frames)
+        self._write(frames)
+
+    def _write(self, frames: np.ndarray):
+        if not frames.shape[0]:
+            return
+        if self._clip:
+            frames = np.clip(frames, -1.0, 1.0)
+        self._out.write(frames)
+
+    def close(self):
+        if self._out.closed:
+            return
+        try:
+            if self._resampler is not None:
+                self._write(self._resampler.resample_chunk(np.zeros((0, self.channels), dtype=np.float32),
+                                                           last=True))
+        finally:
+            self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
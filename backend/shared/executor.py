@@ -0,0 +1,209 @@
+"""
+CPU worker pool for ODOREMOVER Audio Suite
+Runs the blocking DSP part of every processor off the event loop
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from shared.config import Config
+
+# Worker calls started from the current task, each a future resolved once its worker stops
+_worker_calls: contextvars.ContextVar[Optional[List[asyncio.Future]]] = contextvars.ContextVar(
+    "worker_calls", default=None)
+
+
+class ProcessingExecutor:
+    """Shared, bounded process pool with per-service admission control"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or Config.WORKER_PROCESSES
+        self.max_pending = max_pending or Config.WORKER_MAX_PENDING
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._pending = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Create the process pool on first use"""
+        if self._pool is None:
+            context = multiprocessing.get_context(Config.WORKER_START_METHOD)
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._pool
+
+    def _get_semaphore(self, service: str) -> asyncio.Semaphore:
+        if service not in self._semaphores:
+            self._semaphores[service] = asyncio.Semaphore(Config.get_service_concurrency(service))
+        return self._semaphores[service]
+
+    async def run(self, service: str, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the worker pool under the service's limits"""
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Audio processing capacity exhausted, please retry shortly"
+            )
+
+        semaphore = self._get_semaphore(service)
+        if semaphore.locked() and self._waiting.get(service, 0) >= Config.SERVICE_MAX_QUEUE_DEPTH:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many queued requests for {service}, please retry shortly"
+            )
+
+        self._pending += 1
+        self._waiting[service] = self._waiting.get(service, 0) + 1
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            # Cancelled before a slot became free
+            self._pending -= 1
+            raise
+        finally:
+            self._waiting[service] -= 1
+        self._running[service] = self._running.get(service, 0) + 1
+
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+
+        def release():
+            self._running[service] -= 1
+            self._pending -= 1
+            semaphore.release()
+            stopped.set_result(None)
+
+        pool = self._get_pool()
+        try:
+            work = pool.submit(functools.partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            release()
+            raise self._restart(pool)
+        except BaseException:
+            release()
+            raise
+
+        def finished(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(release)
+
+        # A worker process can't be interrupted: if the caller is cancelled or
+        # times out, the slot stays taken until the call actually returns
+        work.add_done_callback(finished)
+        _track(stopped)
+        try:
+            return await asyncio.wrap_future(work)
+        except BrokenProcessPool:
+            raise self._restart(pool)
+
+    def _restart(self, pool: ProcessPoolExecutor) -> HTTPException:
+        """Drop a pool whose worker died (OOM kill, segfault) so the next call starts a fresh one"""
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        return HTTPException(status_code=503, detail="Audio worker process crashed, please retry")
+
+    async def warm_up(self, fn: Callable) -> list:
+        """Start the workers and run fn once per worker slot, outside the service limits.
+
+        The pool hands the calls to idle workers, so with slow enough fn each
+        worker typically runs it once. Exceptions are returned, not raised.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        return await asyncio.gather(
+            *(loop.run_in_executor(pool, fn) for _ in range(self.max_workers)),
+            return_exceptions=True
+        )
+
+    def stats(self) -> dict:
+        """Current pool utilisation, per service"""
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "services": {
+                service: {
+                    "running": self._running.get(service, 0),
+                    "waiting": self._waiting.get(service, 0),
+                    "limit": Config.get_service_concurrency(service)
+                }
+                for service in self._semaphores
+            }
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def track_worker_calls() -> List[asyncio.Future]:
+    """Record the worker calls of the current task and of the tasks it starts from now on"""
+    calls = _worker_calls.get()
+    if calls is None:
+        calls = []
+        _worker_calls.set(calls)
+    return calls
+
+
+def _track(stopped: asyncio.Future):
+    calls = track_worker_calls()
+    calls[:] = [call for call in calls if not call.done()]
+    calls.append(stopped)
+
+
+def after_workers(callback: Callable[[], None]):
+    """Run callback once every worker call started from the current task has stopped.
+
+    Right away unless a cancelled or timed-out call is still running in its
+    worker, which may still be reading the inputs the callback cleans up.
+    """
+    running = {call for call in (_worker_calls.get() or []) if not call.done()}
+    if not running:
+        callback()
+        return
+
+    def stopped(call):
+        running.discard(call)
+        if not running:
+            callback()
+
+    for call in running:
+        call.add_done_callback(stopped)
+
+
+_executor: Optional[ProcessingExecutor] = None
+
+
+def get_executor() -> ProcessingExecutor:
+    """Return the process-wide executor"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessingExecutor()
+    return _executor
+
+
+def _run_and_publish(fn: Callable, *args, **kwargs):
+    """Worker side of run_in_worker: run fn, then hand the outputs its response links to result storage"""
+    from shared.result_cache import artifacts
+    from shared.storage import get_storage
+
+    result = fn(*args, **kwargs)
+    if Config.WAVEFORM_ENABLED and isinstance(result, dict):
+        from shared.waveform import attach_waveforms
+        attach_waveforms(result)
+    get_storage().publish(artifacts(result))
+    return result
+
+
+async def run_in_worker(service: str, fn: Callable, *args, **kwargs):
+    """Run a blocking processing function in the shared worker pool"""
+    return await get_executor().run(service, _run_and_publish, fn, *args, **kwargs)
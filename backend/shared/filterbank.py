@@ -0,0 +1,149 @@
+"""
+Streaming filter banks for ODOREMOVER Audio Suite
+IIR second-order-section filters with carried state, processed block by block
+"""
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import scipy.signal
+
+from shared.config import Config
+
+# Parametric band types accepted by biquad_sos
+FILTER_TYPES = ("peaking", "low_shelf", "high_shelf", "lowpass", "highpass")
+
+
+class SOSFilter:
+    """A cascade of second-order sections that keeps its state between blocks"""
+
+    def __init__(self, sos: np.ndarray, channels: int):
+        self.sos = np.array(sos, dtype=np.float64)  # own copy, shared designs are read-only
+        self.zi = np.zeros((self.sos.shape[0], channels, 2))
+
+    def __call__(self, block: np.ndarray) -> np.ndarray:
+        filtered, self.zi = scipy.signal.sosfilt(self.sos, block, axis=-1, zi=self.zi)
+        return filtered.astype(np.float32)
+
+
+def allpass_sos(freq: float, sr: int, q: float = 1 / np.sqrt(2)) -> np.ndarray:
+    """Second-order allpass biquad (RBJ cookbook) as a single SOS row"""
+    w0 = 2 * np.pi * freq / sr
+    alpha = np.sin(w0) / (2 * q)
+    b = [1 - alpha, -2 * np.cos(w0), 1 + alpha]
+    a = [1 + alpha, -2 * np.cos(w0), 1 - alpha]
+    return np.array([np.concatenate([b, a]) / a[0]])
+
+
+def biquad_sos(filter_type: str, freq: float, sr: int, gain_db: float = 0.0,
+               q: float = 1 / np.sqrt(2)) -> np.ndarray:
+    """Design one RBJ cookbook biquad as a single normalized SOS row"""
+    if filter_type not in FILTER_TYPES:
+        raise ValueError(f"Unknown filter type '{filter_type}', expected one of {', '.join(FILTER_TYPES)}")
+    if not 0 < freq < sr / 2:
+        raise ValueError(f"Filter frequency must lie between 0 and {sr / 2:g} Hz")
+    if q <= 0:
+        raise ValueError("Filter Q must be positive")
+
+    A = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * freq / sr
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+
+    if filter_type == "peaking":
+        b = [1 + alpha * A, -2 * cos_w0, 1 - alpha * A]
+        a = [1 + alpha / A, -2 * cos_w0, 1 - alpha / A]
+    elif filter_type in ("low_shelf", "high_shelf"):
+        sign = 1 if filter_type == "low_shelf" else -1
+        root = 2 * np.sqrt(A) * alpha
+        b = [A * ((A + 1) - sign * (A - 1) * cos_w0 + root),
+             sign * 2 * A * ((A - 1) - sign * (A + 1) * cos_w0),
+             A * ((A + 1) - sign * (A - 1) * cos_w0 - root)]
+        a = [(A + 1) + sign * (A - 1) * cos_w0 + root,
+             -sign * 2 * ((A - 1) + sign * (A + 1) * cos_w0),
+             (A + 1) + sign * (A - 1) * cos_w0 - root]
+    elif filter_type == "lowpass":
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    else:
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    return np.array([np.concatenate([b, a]) / a[0]])
+
+
+@lru_cache(maxsize=Config.EQ_COEFFICIENT_CACHE_SIZE)
+def parametric_sos(sr: int, bands: Tuple[Tuple[str, float, float, float], ...]) -> np.ndarray:
+    """Whole parametric chain as one SOS cascade, memoized per (sample rate, band spec).
+
+    bands is a tuple of (filter_type, freq, gain_db, q). The returned array
+    is shared between callers and marked read-only.
+    """
+    sos = np.vstack([biquad_sos(filter_type, freq, sr, gain_db, q) for filter_type, freq, gain_db, q in bands])
+    sos.setflags(write=False)
+    return sos
+
+
+def linkwitz_riley_sos(freq: float, sr: int):
+    """4th-order Linkwitz-Riley low/high pass pair (two cascaded Butterworth biquads each)"""
+    lowpass = scipy.signal.butter(2, freq, btype="lowpass", fs=sr, output="sos")
+    highpass = scipy.signal.butter(2, freq, btype="highpass", fs=sr, output="sos")
+    return np.vstack([lowpass, lowpass]), np.vstack([highpass, highpass])
+
+
+class CrossoverFilterBank:
+    """Splits a block stream into len(crossovers) + 1 bands with LR4 crossovers.
+
+    Every band except the top one is passed through the allpass sections of
+    the crossovers above it, so the bands sum back to an allpass of the input
+    (flat magnitude) and per-band gains behave like a classic crossover EQ.
+    """
+
+    def __init__(self, crossovers: Sequence[float], sr: int, channels: int):
+        self.crossovers = sorted(float(freq) for freq in crossovers)
+        if not self.crossovers:
+            raise ValueError("At least one crossover frequency is required")
+        if self.crossovers[0] <= 0 or self.crossovers[-1] >= sr / 2:
+            raise ValueError(f"Crossover frequencies must lie between 0 and {sr / 2:g} Hz")
+        self.sr = sr
+        self.channels = channels
+
+        self._lowpass: List[SOSFilter] = []
+        self._highpass: List[SOSFilter] = []
+        self._compensation: List[SOSFilter] = []
+        for index, freq in enumerate(self.crossovers):
+            lowpass, highpass = linkwitz_riley_sos(freq, sr)
+            self._lowpass.append(SOSFilter(lowpass, channels))
+            self._highpass.append(SOSFilter(highpass, channels))
+            later = self.crossovers[index + 1:]
+            self._compensation.append(
+                SOSFilter(np.vstack([allpass_sos(f, sr) for f in later]), channels) if later else None
+            )
+
+    @property
+    def band_count(self) -> int:
+        return len(self.crossovers) + 1
+
+    def band_ranges(self) -> List[str]:
+        edges = [0.0] + self.crossovers
+        labels = [f"{edges[i]:g}-{edges[i + 1]:g}Hz" for i in range(len(self.crossovers))]
+        return labels + [f"{self.crossovers[-1]:g}Hz+"]
+
+    def split(self, block: np.ndarray) -> List[np.ndarray]:
+        """Split one (channels, n) block into band blocks, lowest band first"""
+        bands = []
+        rest = block
+        for lowpass, highpass, compensation in zip(self._lowpass, self._highpass, self._compensation):
+            band = lowpass(rest)
+            bands.append(compensation(band) if compensation is not None else band)
+            rest = highpass(rest)
+        bands.append(rest)
+        return bands
+
+    def apply_gains(self, block: np.ndarray, gains_db: Sequence[float]) -> np.ndarray:
+        """Split a block and sum the bands back with per-band gains in dB"""
+        if len(gains_db) != self.band_count:
+            raise ValueError(f"Expected {self.band_count} band gains, got {len(gains_db)}")
+        out = np.zeros_like(block, dtype=np.float32)
+        for band, gain_db in zip(self.split(block), gains_db):
+            out += band * np.float32(10 ** (gain_db / 20))
+        return out
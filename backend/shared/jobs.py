@@ -0,0 +1,258 @@
+"""
+Asynchronous job subsystem for ODOREMOVER Audio Suite
+Long-running tools are submitted as jobs and polled via /jobs/{id}
+"""
+import asyncio
+import contextvars
+import json
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from shared.config import Config
+from shared.executor import after_workers, track_worker_calls
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED, TIMED_OUT}
+
+_current_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_job_id", default=None)
+
+
+class JobStore:
+    """Interface for job state persistence"""
+
+    def create(self, job: dict):
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def list(self, limit: int = 100) -> List[dict]:
+        raise NotImplementedError
+
+    def prune(self, finished_before: float) -> int:
+        """Drop finished jobs older than the given timestamp"""
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    """Job store backed by a dict, lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+
+    def create(self, job: dict):
+        self._jobs[job["job_id"]] = dict(job)
+
+    def update(self, job_id: str, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list(self, limit: int = 100) -> List[dict]:
+        jobs = sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)
+        return [dict(job) for job in jobs[:limit]]
+
+    def prune(self, finished_before: float) -> int:
+        stale = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATES and job["updated_at"] < finished_before
+        ]
+        for job_id in stale:
+            del self._jobs[job_id]
+        return len(stale)
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a SQLite file, survives restarts"""
+
+    COLUMNS = ("job_id", "service", "status", "progress", "result", "error",
+               "created_at", "started_at", "updated_at")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+        # Jobs that were in flight when the previous process died will never finish
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+            (FAILED, "Interrupted by server restart", time.time(), QUEUED, RUNNING)
+        )
+
+    def _row_to_job(self, row) -> dict:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, job: dict):
+        values = dict(job, result=json.dumps(job.get("result")) if job.get("result") else None)
+        self._conn.execute(
+            f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            tuple(values.get(column) for column in self.COLUMNS)
+        )
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"]) if fields["result"] is not None else None
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, limit: int = 100) -> List[dict]:
+        rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def prune(self, finished_before: float) -> int:
+        placeholders = ", ".join("?" * len(FINISHED_STATES))
+        cursor = self._conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+            (*FINISHED_STATES, finished_before)
+        )
+        return cursor.rowcount
+
+
+class JobManager:
+    """Runs submitted jobs in the background with bounded concurrency and timeouts"""
+
+    def __init__(self, store: JobStore, max_running: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.store = store
+        self.timeout = timeout or Config.PROCESSING_TIMEOUT
+        self._slots = asyncio.Semaphore(max_running or Config.JOB_MAX_RUNNING)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, service: str, job_factory: Callable[[], Awaitable[dict]],
+               on_finish: Optional[Callable[[], None]] = None, reports_progress: bool = False) -> dict:
+        """Queue a job; job_factory is only called once a slot is free.
+
+        Only jobs that call report_progress (reports_progress=True) have a
+        progress field; the others just move through the states.
+        """
+        now = time.time()
+        self.store.prune(now - Config.JOB_RETENTION_SECONDS)
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "service": service,
+            "status": QUEUED,
+            "progress": 0.0 if reports_progress else None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "updated_at": now
+        }
+        self.store.create(job)
+        self._tasks[job["job_id"]] = asyncio.create_task(
+            self._run(job["job_id"], job_factory, on_finish, reports_progress))
+        return job
+
+    async def _run(self, job_id: str, job_factory, on_finish, reports_progress: bool = False):
+        _current_job_id.set(job_id)
+        # Shared with the task wait_for runs the job in, so cleanup can wait for its workers
+        track_worker_calls()
+        try:
+            async with self._slots:
+                self.store.update(job_id, status=RUNNING, started_at=time.time())
+                result = await asyncio.wait_for(job_factory(), timeout=self.timeout)
+            finished = {"progress": 1.0} if reports_progress else {}
+            self.store.update(job_id, status=COMPLETED, result=result, **finished)
+        except asyncio.TimeoutError:
+            self.store.update(job_id, status=TIMED_OUT,
+                              error=f"Processing exceeded {self.timeout} seconds")
+        except asyncio.CancelledError:
+            self.store.update(job_id, status=CANCELLED, error="Cancelled by request")
+        except HTTPException as e:
+            self.store.update(job_id, status=FAILED, error=str(e.detail))
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, error=str(e))
+        finally:
+            self._tasks.pop(job_id, None)
+            if on_finish is not None:
+                # A cancelled or timed-out job's worker may still be running on its inputs
+                after_workers(on_finish)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is not None and job.get("progress") is None:
+            del job["progress"]
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def set_progress(self, job_id: str, progress: float):
+        self.store.update(job_id, progress=max(0.0, min(1.0, progress)))
+
+    async def shutdown(self):
+        """Cancel every job still in flight"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def report_progress(progress: float):
+    """Update the progress of the job the caller is running in, if any"""
+    job_id = _current_job_id.get()
+    if job_id is not None and _manager is not None:
+        _manager.set_progress(job_id, progress)
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by Config.JOB_STORE"""
+    if Config.JOB_STORE == "sqlite":
+        return SQLiteJobStore(str(Config.JOB_DB_PATH))
+    if Config.JOB_STORE == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown job store: {Config.JOB_STORE}")
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager"""
+    global _manager
+    if _manager is None:
+        _manager = JobManager(create_job_store())
+    return _manager
@@ -0,0 +1,353 @@
+"""
+Loudness measurement and normalization for ODOREMOVER Audio Suite
+ITU-R BS.1770 / EBU R128 integrated loudness, loudness range and true peak, measured and applied block by block
+"""
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from scipy.ndimage import minimum_filter1d
+import scipy.signal
+
+from shared.config import Config
+from shared.filterbank import SOSFilter
+
+# BS.1770 K-weighting: a +4 dB high shelf (head diffraction) and the RLB high-pass,
+# as analog prototypes (frequency, gain, Q) so the filters can be designed for any sample rate
+SHELF = (1681.974450955533, 3.999843853973347, 0.7071752369554196)
+HIGHPASS = (38.13547087602444, 0.5003270373238773)
+
+# Gating blocks of 400 ms every 100 ms (75% overlap); short-term loudness over 3 s
+STEP_SECONDS = 0.1
+BLOCK_STEPS = 4
+SHORT_TERM_STEPS = 30
+
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU below the absolute-gated loudness (integrated)
+RANGE_RELATIVE_GATE = -20.0  # LU, for loudness range (EBU Tech 3342)
+RANGE_PERCENTILES = (10, 95)
+
+# Gated loudness values are binned, so memory does not grow with duration
+HISTOGRAM_RESOLUTION = 0.01  # LU per bin
+HISTOGRAM_CEILING = 10.0  # LUFS, louder blocks land in the top bin
+
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_TAPS = 12  # per phase, a 48-tap interpolator as in BS.1770 Annex 2
+# Frames the limiter turns down by more than 0.01 dB count as limited
+LIMITED_GAIN = 10 ** (-0.01 / 20)
+# Input samples of context either side of a block, more than the oversampling filter reaches
+TRUE_PEAK_CONTEXT = 32
+
+
+@lru_cache(maxsize=16)
+def k_weighting_sos(sr: int) -> np.ndarray:
+    """K-weighting pre-filter as two SOS rows; matches the BS.1770 coefficients at 48 kHz"""
+    freq, gain_db, q = SHELF
+    k = np.tan(np.pi * freq / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    shelf = np.array([vh + vb * k / q + k * k, 2 * (k * k - vh), vh - vb * k / q + k * k,
+                      1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k])
+    freq, q = HIGHPASS
+    k = np.tan(np.pi * freq / sr)
+    highpass = np.array([1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / (1 + k / q + k * k),
+                         (1 - k / q + k * k) / (1 + k / q + k * k)])
+    sos = np.vstack([shelf / shelf[3], highpass])
+    sos.setflags(write=False)
+    return sos
+
+
+def channel_weights(channels: int) -> np.ndarray:
+    """BS.1770 channel weights: surrounds of a 5.1 layout (L R C LFE Ls Rs) count 1.41, the LFE is left out"""
+    weights = np.ones(channels)
+    if channels == 6:
+        weights[3] = 0.0
+        weights[4:] = 1.41
+    return weights
+
+
+def to_db(value: float) -> Optional[float]:
+    return 20 * np.log10(value) if value > 0 else None
+
+
+def loudness_of(power):
+    """BS.1770 loudness (LUFS) of a K-weighted, channel-weighted mean power"""
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10 * np.log10(power)
+
+
+class LoudnessHistogram:
+    """Counts and summed block powers of gated loudness values in fixed-width bins"""
+
+    def __init__(self):
+        self.bins = int(round((HISTOGRAM_CEILING - ABSOLUTE_GATE) / HISTOGRAM_RESOLUTION))
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.power = np.zeros(self.bins)
+
+    def add(self, power: np.ndarray):
+        loudness = loudness_of(power)
+        keep = loudness >= ABSOLUTE_GATE
+        index = ((loudness[keep] - ABSOLUTE_GATE) / HISTOGRAM_RESOLUTION).astype(np.int64)
+        index = np.minimum(index, self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.power += np.bincount(index, weights=power[keep], minlength=self.bins)
+
+    def _relative_floor(self, gate: float) -> Optional[int]:
+        """First bin at or above gate LU relative to the mean power of all (absolute-gated) blocks"""
+        total = self.counts.sum()
+        if not total:
+            return None
+        threshold = loudness_of(self.power.sum() / total) + gate
+        return max(0, int(np.ceil((threshold - ABSOLUTE_GATE) / HISTOGRAM_RESOLUTION)))
+
+    def integrated(self) -> Optional[float]:
+        """Gated loudness (absolute then relative gate), None for silence"""
+        floor = self._relative_floor(RELATIVE_GATE)
+        if floor is None or not self.counts[floor:].sum():
+            return None
+        return float(loudness_of(self.power[floor:].sum() / self.counts[floor:].sum()))
+
+    def range(self) -> Optional[float]:
+        """Loudness range: spread between the gated percentiles of the binned values"""
+        floor = self._relative_floor(RANGE_RELATIVE_GATE)
+        if floor is None or not self.counts[floor:].sum():
+            return None
+        cumulative = np.cumsum(self.counts[floor:])
+        low, high = (np.searchsorted(cumulative, cumulative[-1] * p / 100) for p in RANGE_PERCENTILES)
+        return float((high - low) * HISTOGRAM_RESOLUTION)
+
+
+@lru_cache(maxsize=1)
+def _oversampling_phases() -> np.ndarray:
+    """(taps, phases) polyphase interpolator, tap j weighting the j-th sample of a window"""
+    taps = TRUE_PEAK_OVERSAMPLING * TRUE_PEAK_TAPS
+    h = scipy.signal.firwin(taps, 1 / TRUE_PEAK_OVERSAMPLING, window=("kaiser", 5.0)) * TRUE_PEAK_OVERSAMPLING
+    return h.reshape(TRUE_PEAK_TAPS, TRUE_PEAK_OVERSAMPLING)[::-1].astype(np.float32)
+
+
+def oversampled_peaks(block: np.ndarray) -> np.ndarray:
+    """Per-sample true-peak envelope of a (channels, n) block, max over channels.
+
+    Sample i gets the largest 4x oversampled magnitude on either side of it,
+    so the envelope covers the inter-sample peaks next to each sample. The
+    first and last TRUE_PEAK_TAPS samples lack filter context.
+    """
+    length = block.shape[1]
+    between = np.zeros(length, dtype=np.float32)  # peak over [i, i + 1)
+    windows = length - TRUE_PEAK_TAPS + 1
+    if windows > 0:
+        phases = _oversampling_phases()
+        # Window m interpolates the interval starting at sample m + taps / 2 - 1
+        core = between[TRUE_PEAK_TAPS // 2 - 1:][:windows]
+        for phase in range(TRUE_PEAK_OVERSAMPLING):
+            # Shifted multiply-adds beat a matmul over a strided window view several times over
+            acc = phases[0, phase] * block[:, :windows]
+            for tap in range(1, TRUE_PEAK_TAPS):
+                acc += phases[tap, phase] * block[:, tap:tap + windows]
+            np.maximum(core, np.abs(acc, out=acc).max(axis=0), out=core)
+    envelope = np.maximum(between, np.abs(block).max(axis=0))
+    envelope[1:] = np.maximum(envelope[1:], between[:-1])
+    return envelope
+
+
+def with_context(blocks: Iterable[np.ndarray], channels: int, context: int) -> Iterator[np.ndarray]:
+    """Each block padded with `context` samples of its neighbours (silence at the ends)"""
+    history = np.zeros((channels, context), dtype=np.float32)
+    iterator = iter(blocks)
+    current = next(iterator, None)
+    while current is not None:
+        following = next(iterator, None)
+        ahead = following[:, :context] if following is not None else np.zeros((channels, 0), dtype=np.float32)
+        ahead = np.pad(ahead, ((0, 0), (0, context - ahead.shape[1])))
+        yield np.concatenate([history, current, ahead], axis=1)
+        history = np.concatenate([history, current], axis=1)[:, -context:]
+        current = following
+
+
+class LoudnessMeter:
+    """Streaming BS.1770 meter: push (channels, n) blocks, then read result().
+
+    K-weighted power is summed per 100 ms step; each completed step closes a
+    400 ms gating block and a 3 s short-term window, whose powers go into
+    histograms for the integrated loudness and the loudness range.
+    """
+
+    def __init__(self, samplerate: int, channels: int, true_peak: bool = True):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.weights = channel_weights(channels)
+        self.true_peak = true_peak
+        self._filter = SOSFilter(k_weighting_sos(samplerate), channels)
+        self._step = max(1, int(round(samplerate * STEP_SECONDS)))
+        self._partial = np.zeros(0)  # weighted power of samples not yet in a complete step
+        self._steps = np.zeros(0)  # last SHORT_TERM_STEPS - 1 step powers
+        self._step_count = 0
+        self.blocks = LoudnessHistogram()
+        self.short_term = LoudnessHistogram()
+        self.sample_peak = 0.0
+        self.peak = 0.0
+        self._history = np.zeros((channels, TRUE_PEAK_CONTEXT), dtype=np.float32)
+
+    def push(self, block: np.ndarray):
+        if not block.shape[1]:
+            return
+        self.sample_peak = max(self.sample_peak, float(np.abs(block).max()))
+        if self.true_peak:
+            self._push_peak(block)
+
+        filtered = self._filter(block).astype(np.float64)
+        power = np.concatenate([self._partial, self.weights @ (filtered * filtered)])
+        complete = len(power) // self._step * self._step
+        steps = power[:complete].reshape(-1, self._step).mean(axis=1)
+        self._partial = power[complete:]
+        if not len(steps):
+            return
+
+        self._step_count += len(steps)
+        history = np.concatenate([self._steps, steps])
+        sums = np.concatenate([[0.0], np.cumsum(history)])
+        for histogram, length in ((self.blocks, BLOCK_STEPS), (self.short_term, SHORT_TERM_STEPS)):
+            # Windows ending at each new step that lie fully inside the signal
+            ends = np.arange(len(self._steps), len(history)) + 1
+            ends = ends[ends >= length - (self._step_count - len(history))]
+            if len(ends):
+                histogram.add((sums[ends] - sums[ends - length]) / length)
+        self._steps = history[-(SHORT_TERM_STEPS - 1):]
+
+    def _push_peak(self, block: np.ndarray):
+        # Only the middle of the padded block is counted; the rest lacks context and is redone next time
+        context = TRUE_PEAK_CONTEXT
+        padded = np.concatenate([self._history, block], axis=1)
+        envelope = oversampled_peaks(padded)[context // 2:-(context // 2)]
+        if len(envelope):
+            self.peak = max(self.peak, float(envelope.max()))
+        self._history = padded[:, -context:]
+
+    def result(self) -> dict:
+        if self.true_peak:
+            tail = np.concatenate([self._history, np.zeros_like(self._history)], axis=1)
+            self.peak = max(self.peak, float(oversampled_peaks(tail)[TRUE_PEAK_CONTEXT // 2:].max()))
+        return {
+            "integrated_lufs": self.blocks.integrated(),
+            "loudness_range_lu": self.short_term.range(),
+            "true_peak_dbtp": to_db(max(self.peak, self.sample_peak)) if self.true_peak else None,
+            "sample_peak_dbfs": to_db(self.sample_peak),
+        }
+
+
+class TruePeakLimiter:
+    """Look-ahead limiter keeping the 4x oversampled peak under a ceiling.
+
+    The gain each sample needs is held as a minimum over the next `lookahead`
+    samples, then smoothed with a Hann kernel of the same length: every
+    sample's smoothed gain averages minima whose windows include that sample,
+    so it never exceeds what the sample needs. Blocks are processed with
+    enough neighbouring context that the result does not depend on block size.
+    process() limits a whole block stream; push()/flush() do the same for
+    live input, `context` samples behind it.
+    """
+
+    def __init__(self, samplerate: int, channels: int, ceiling_db: float = -1.0,
+                 lookahead: Optional[float] = None):
+        self.channels = channels
+        self.ceiling = 10 ** (ceiling_db / 20)
+        self.length = max(2, int(round(samplerate * (lookahead or Config.LOUDNESS_LIMITER_LOOKAHEAD))))
+        kernel = np.hanning(self.length + 2)[1:-1]
+        self.kernel = kernel / kernel.sum()
+        self.context = self.length + TRUE_PEAK_CONTEXT
+        self.min_gain = 1.0
+        self.limited_frames = 0
+        self.output_peak = 0.0
+        self._pending: Optional[np.ndarray] = None  # push(): `context` samples already out, then those not yet
+
+    def process(self, blocks: Iterable[np.ndarray], gain: float = 1.0) -> Iterator[np.ndarray]:
+        """Apply gain to a block stream, limiting where the result would pass the ceiling"""
+        for padded in with_context(blocks, self.channels, self.context):
+            yield self._limit(padded * np.float32(gain))
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        """Limit live input: returns the samples whose look-ahead has now arrived"""
+        if self._pending is None:
+            self._pending = np.zeros((self.channels, self.context), dtype=np.float32)
+        self._pending = np.concatenate([self._pending, block], axis=1)
+        ready = self._pending.shape[1] - 2 * self.context
+        if ready <= 0:
+            return np.zeros((self.channels, 0), dtype=np.float32)
+        out = self._limit(self._pending)
+        self._pending = self._pending[:, ready:]
+        return out
+
+    def flush(self) -> Optional[np.ndarray]:
+        """The last `context` samples pushed, limited against trailing silence"""
+        if self._pending is None:
+            return None
+        padded = np.pad(self._pending, ((0, 0), (0, self.context)))
+        self._pending = None
+        return self._limit(padded)
+
+    def _limit(self, padded: np.ndarray) -> np.ndarray:
+        """The middle of a block padded with `context` samples either side, limited"""
+        context = self.context
+        envelope = oversampled_peaks(padded)
+        needed = np.minimum(1.0, self.ceiling / np.maximum(envelope, 1e-12))
+        held = minimum_filter1d(needed, self.length, origin=-(self.length // 2), mode="nearest")
+        smoothed = np.minimum(scipy.signal.oaconvolve(held, self.kernel)[:len(held)], 1.0)
+
+        core = slice(context, padded.shape[1] - context)
+        gains = smoothed[core]
+        if len(gains):
+            self.min_gain = min(self.min_gain, float(gains.min()))
+            self.limited_frames += int(np.count_nonzero(gains < LIMITED_GAIN))
+            self.output_peak = max(self.output_peak, float((envelope[core] * gains).max()))
+        return padded[:, core] * gains.astype(np.float32)
+
+
+def normalize_loudness(source, target_lufs: float = -14.0, true_peak_db: float = -1.0,
+                       gain_db: Optional[float] = None):
+    """Two-pass loudness normalization over a block source (ArraySource / FileSource).
+
+    Pass one measures the source; pass two streams it again with the gain
+    that reaches target_lufs (or a fixed gain_db) through the true-peak
+    limiter, which is skipped when the measured peak already fits.
+    Returns (block iterator, stats); the stats are complete once the
+    iterator is exhausted.
+    """
+    meter = LoudnessMeter(source.samplerate, source.channels)
+    for block in source.blocks():
+        meter.push(block)
+    measured = meter.result()
+
+    if gain_db is None:
+        integrated = measured["integrated_lufs"]
+        gain_db = target_lufs - integrated if integrated is not None else 0.0
+    gain = 10 ** (gain_db / 20)
+    peak = max(meter.peak, meter.sample_peak) * gain
+    limiter = TruePeakLimiter(source.samplerate, source.channels, true_peak_db) if peak > 10 ** (true_peak_db / 20) else None
+
+    stats = {
+        "input_integrated_lufs": _round(measured["integrated_lufs"]),
+        "input_loudness_range_lu": _round(measured["loudness_range_lu"]),
+        "input_true_peak_dbtp": _round(measured["true_peak_dbtp"]),
+        "input_sample_peak_dbfs": _round(measured["sample_peak_dbfs"]),
+        "gain_applied_db": round(float(gain_db), 2),
+        "true_peak_ceiling_dbtp": true_peak_db,
+        "limiter_applied": limiter is not None,
+    }
+    output = LoudnessMeter(source.samplerate, source.channels, true_peak=False)
+
+    def blocks():
+        stream = limiter.process(source.blocks(), gain) if limiter else (block * np.float32(gain) for block in source.blocks())
+        for block in stream:
+            output.push(block)
+            yield block
+        result = output.result()
+        stats["output_integrated_lufs"] = _round(result["integrated_lufs"])
+        stats["output_true_peak_dbtp"] = _round(to_db(limiter.output_peak if limiter else peak))
+        stats["max_gain_reduction_db"] = round(-20 * np.log10(limiter.min_gain), 2) if limiter else 0.0
+        stats["limited_frames"] = limiter.limited_frames if limiter else 0
+
+    return blocks(), stats
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if value is not None else None
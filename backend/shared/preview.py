@@ -0,0 +1,385 @@
+"""
+Preview rendering for ODOREMOVER Audio Suite
+Runs a tool's DSP on a short excerpt of a session's upload, optionally at a reduced-rate proxy, within a latency budget
+"""
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional, Tuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+from fastapi import HTTPException
+from scipy.signal import resample_poly
+
+from shared.audio_cut import media_duration
+from shared.batch import parse_batch_params
+from shared.config import Config
+from shared.encoder import OUTPUT_FORMATS, StreamEncoder
+from shared.executor import run_in_worker
+from shared.storage import get_storage
+
+# Encoder quality of previews, which only need to be small enough to come back fast
+PREVIEW_QUALITY = "medium"
+
+# Tool parameters that only choose a full render's encoding
+RENDER_OUTPUT_PARAMS = ("output_format", "output_quality")
+
+# Previewable tools -> name of the processor's array-level core, called as core(y, sr, **params)
+PREVIEW_CORES = {
+    "pitch-tempo": "shift",
+    "noise-reduction": "reduce_noise",
+    "equalizer": "equalize",
+    "volume-normalizer": "normalize_volume",
+    "fade-effect": "apply_fades",
+    "pipeline": "apply_steps",
+}
+
+# Decoded excerpts and rendered previews kept per session
+SESSION_EXCERPTS = 4
+SESSION_OUTPUTS = 4
+
+# Weight of the newest render in each tool's cost estimate
+COST_SMOOTHING = 0.3
+
+
+class PreviewSession:
+    """An upload kept on disk for repeated previews, with its recently decoded excerpts in memory"""
+
+    def __init__(self, upload):
+        self.id = uuid.uuid4().hex
+        self.upload = upload
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.outputs: deque = deque()
+        self._excerpts: "OrderedDict[tuple, Tuple[np.ndarray, int]]" = OrderedDict()
+        self.duration: Optional[float] = None
+        self.samplerate: Optional[int] = None
+        self.channels: Optional[int] = None
+
+    def probe(self):
+        """Read duration, rate and channel count from the headers (blocking)"""
+        self.duration = media_duration(self.upload.path)
+        try:
+            info = sf.info(self.upload.path)
+            self.samplerate, self.channels = info.samplerate, info.channels
+        except (RuntimeError, sf.LibsndfileError):
+            pass
+
+    def window(self, offset: float, duration: float) -> Tuple[float, float]:
+        """(start, duration) of an excerpt centred on offset, kept inside the file"""
+        start = max(offset - duration / 2, 0.0)
+        if self.duration is not None:
+            start = max(min(start, self.duration - duration), 0.0)
+            duration = min(duration, self.duration - start)
+        return round(start, 3), round(duration, 3)
+
+    def excerpt(self, start: float, duration: float, samplerate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """(channels, samples) float32 excerpt, resampled down to samplerate if given (blocking).
+
+        Excerpts are read-only and cached, so repeated renders skip the decoder.
+        """
+        if samplerate is not None and self.samplerate is not None and samplerate >= self.samplerate:
+            samplerate = None
+        key = (start, duration, samplerate)
+        if key in self._excerpts:
+            self._excerpts.move_to_end(key)
+            return self._excerpts[key]
+
+        if samplerate is None:
+            y, sr = self._decode(start, duration)
+        else:
+            y, sr = self.excerpt(start, duration)
+            if samplerate < sr:
+                divisor = math.gcd(samplerate, sr)
+                y = resample_poly(y, samplerate // divisor, sr // divisor, axis=-1).astype(np.float32)
+                sr = samplerate
+        y = np.ascontiguousarray(y, dtype=np.float32)
+        y.setflags(write=False)
+
+        self._excerpts[key] = (y, sr)
+        while len(self._excerpts) > SESSION_EXCERPTS:
+            self._excerpts.popitem(last=False)
+        return y, sr
+
+    def _decode(self, start: float, duration: float) -> Tuple[np.ndarray, int]:
+        """Decode only the excerpt: seek with libsndfile where it can read the file, else librosa/ffmpeg"""
+        try:
+            with sf.SoundFile(self.upload.path) as src:
+                src.seek(min(int(start * src.samplerate), src.frames))
+                y = src.read(int(duration * src.samplerate), dtype="float32", always_2d=True).T
+                sr = src.samplerate
+        except (RuntimeError, sf.LibsndfileError):
+            y, sr = librosa.load(self.upload.path, sr=None, mono=False, offset=start, duration=duration)
+            y = y if y.ndim == 2 else y[np.newaxis, :]
+        self.samplerate, self.channels = int(sr), y.shape[0]
+        return y, int(sr)
+
+    def close(self):
+        """Remove the upload and every preview rendered from it (blocking)"""
+        self.upload.remove()
+        storage = get_storage()
+        while self.outputs:
+            storage.delete(self.outputs.popleft())
+        self._excerpts.clear()
+
+
+class PreviewManager:
+    """Preview sessions of this gateway process, and the per-tool cost model behind the latency budget.
+
+    Excerpts are decoded in a thread of the gateway process, so a session's
+    decoded excerpts stay in memory between parameter changes; the tool's DSP
+    and the encode run in the worker pool like a full render. When a tool's measured cost says a full-rate render would miss
+    PREVIEW_LATENCY_BUDGET, the excerpt is rendered at PREVIEW_PROXY_RATE
+    and then shortened, unless the client fixed sample_rate or duration.
+    """
+
+    def __init__(self, processed_dir: Optional[str] = None):
+        self.processed_dir = str(processed_dir or Config.PROCESSED_DIR)
+        self.sessions: "OrderedDict[str, PreviewSession]" = OrderedDict()
+        self.renders = 0
+        self.budget_misses = 0
+        self._cost: Dict[str, float] = {}  # tool -> render seconds per sample
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        os.makedirs(self.processed_dir, exist_ok=True)
+
+    async def open(self, upload) -> PreviewSession:
+        """Start a session for an ingested upload"""
+        session = PreviewSession(upload)
+        try:
+            await asyncio.to_thread(session.probe)
+        except Exception:
+            upload.remove()
+            raise HTTPException(status_code=400, detail="Could not read audio file")
+        self.sessions[session.id] = session
+        await self._expire()
+        return session
+
+    def get(self, session_id: str) -> PreviewSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Preview session not found or expired")
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    async def close(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Preview session not found or expired")
+        await asyncio.to_thread(session.close)
+
+    async def _expire(self):
+        """Close sessions idle past PREVIEW_SESSION_TTL, then the least recent over PREVIEW_MAX_SESSIONS"""
+        cutoff = time.monotonic() - Config.PREVIEW_SESSION_TTL
+        expired = [session for session in self.sessions.values() if session.last_used < cutoff]
+        overflow = len(self.sessions) - len(expired) - Config.PREVIEW_MAX_SESSIONS
+        if overflow > 0:
+            expired += [session for session in self.sessions.values() if session not in expired][:overflow]
+        for session in expired:
+            del self.sessions[session.id]
+            await asyncio.to_thread(session.close)
+
+    def estimate(self, tool: str, samples: float) -> Optional[float]:
+        """Expected render seconds for samples (frames x channels), None before the tool's first render"""
+        cost = self._cost.get(tool)
+        return cost * samples if cost is not None else None
+
+    def _record(self, tool: str, seconds: float, samples: int):
+        if samples <= 0:
+            return
+        cost = seconds / samples
+        previous = self._cost.get(tool)
+        self._cost[tool] = cost if previous is None else previous + COST_SMOOTHING * (cost - previous)
+
+    def _plan(self, tool: str, session: PreviewSession, duration: Optional[float],
+              samplerate: Optional[int]) -> Tuple[float, Optional[int], list]:
+        """Excerpt duration and rate to render; adjusts only what the client left unset"""
+        adjusted = []
+        budget = Config.PREVIEW_LATENCY_BUDGET
+        channels = session.channels or 1
+        native = session.samplerate
+        planned_duration = duration or Config.PREVIEW_DURATION
+        if native is None or self.estimate(tool, 1) is None:
+            return planned_duration, samplerate, adjusted
+
+        rate = samplerate or native
+        if samplerate is None and native > Config.PREVIEW_PROXY_RATE \
+                and self.estimate(tool, planned_duration * native * channels) > budget:
+            rate = Config.PREVIEW_PROXY_RATE
+            adjusted.append("sample_rate")
+        expected = self.estimate(tool, planned_duration * rate * channels)
+        if duration is None and expected > budget:
+            planned_duration = max(planned_duration * budget / expected, Config.PREVIEW_MIN_DURATION)
+            adjusted.append("duration")
+        return planned_duration, (rate if rate != native else None), adjusted
+
+    def _check(self, tool: str, processor, params, duration: Optional[float], samplerate: Optional[int],
+               output_format: Optional[str]) -> Tuple[Callable, dict, str]:
+        """Validate a preview request, returns (core, params, output format)"""
+        if tool not in PREVIEW_CORES:
+            raise HTTPException(status_code=400,
+                                detail=f"'{tool}' has no preview mode. Available: {', '.join(PREVIEW_CORES)}")
+        output_format = (output_format or Config.PREVIEW_FORMAT).lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unsupported preview format. Available: {', '.join(OUTPUT_FORMATS)}")
+        if duration is not None and not 0 < duration <= Config.PREVIEW_MAX_DURATION:
+            raise HTTPException(status_code=400,
+                                detail=f"duration must be between 0 and {Config.PREVIEW_MAX_DURATION:g} seconds")
+        if samplerate is not None and samplerate < 8000:
+            raise HTTPException(status_code=400, detail="sample_rate must be at least 8000 Hz")
+
+        params = parse_batch_params(processor.process_file, params)
+        for name in RENDER_OUTPUT_PARAMS:
+            params.pop(name, None)
+        if tool == "pipeline":
+            params["steps"] = processor.parse_steps(params.get("steps"))
+        return getattr(processor, PREVIEW_CORES[tool]), params, output_format
+
+    async def preview(self, tool: str, processor, params, upload=None, session_id: Optional[str] = None,
+                      offset: float = 0.0, duration: Optional[float] = None, samplerate: Optional[int] = None,
+                      output_format: Optional[str] = None) -> dict:
+        """Render tool with params on an excerpt centred on offset seconds, as a small compressed file.
+
+        Pass an ingested upload to start a session, or the session_id of an open
+        one. A new session is closed again if its first render fails.
+        """
+        try:
+            core, params, output_format = self._check(tool, processor, params, duration, samplerate, output_format)
+        except HTTPException:
+            if upload is not None:
+                upload.remove()
+            raise
+        await self._expire()
+        if upload is None:
+            return await self.render(self.get(session_id), tool, core, params, offset, duration, samplerate,
+                                     output_format)
+
+        session = await self.open(upload)
+        try:
+            return await self.render(session, tool, core, params, offset, duration, samplerate, output_format)
+        except BaseException:
+            self.sessions.pop(session.id, None)
+            await asyncio.to_thread(session.close)
+            raise
+
+    async def render(self, session: PreviewSession, tool: str, core: Callable, params: dict, offset: float,
+                     duration: Optional[float], samplerate: Optional[int], output_format: str) -> dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(Config.PREVIEW_CONCURRENCY)
+        async with session.lock, self._semaphore:
+            started = time.perf_counter()
+            planned_duration, rate, adjusted = self._plan(tool, session, duration, samplerate)
+            start, planned_duration = session.window(offset, planned_duration)
+            try:
+                rendered = await self._render(session, core, params, start, planned_duration, rate, output_format)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+            elapsed = time.perf_counter() - started
+
+        self._record(tool, rendered["render_seconds"], rendered["samples"])
+        self.renders += 1
+        within_budget = elapsed <= Config.PREVIEW_LATENCY_BUDGET
+        if not within_budget:
+            self.budget_misses += 1
+        session.last_used = time.monotonic()
+
+        filename = rendered["filename"]
+        preview = {
+            "tool": tool,
+            "start": start,
+            "duration": planned_duration,
+            "output_duration": rendered["output_duration"],
+            "sample_rate": rendered["sample_rate"],
+            "proxy": rendered["sample_rate"] != session.samplerate,
+            "format": output_format,
+            "source_duration": session.duration,
+            "adjusted": adjusted
+        }
+        if rendered["stats"] is not None:
+            preview["stats"] = rendered["stats"]
+        return {
+            "success": True,
+            "message": "Preview rendered successfully",
+            "session_id": session.id,
+            "output_file": f"/download/{filename}",
+            "download_url": f"/download/{filename}",
+            "preview": preview,
+            "timing": {
+                "decode_ms": round(rendered["decode_seconds"] * 1000, 1),
+                "processing_ms": round(rendered["render_seconds"] * 1000, 1),
+                "total_ms": round(elapsed * 1000, 1),
+                "budget_ms": round(Config.PREVIEW_LATENCY_BUDGET * 1000, 1),
+                "within_budget": within_budget
+            }
+        }
+
+    async def _render(self, session: PreviewSession, core: Callable, params: dict, start: float, duration: float,
+                      samplerate: Optional[int], output_format: str) -> dict:
+        """Decode (or reuse) the excerpt, then run the core and encode the preview in the worker pool"""
+        started = time.perf_counter()
+        y, sr = await asyncio.to_thread(session.excerpt, start, duration, samplerate)
+        decoded = time.perf_counter()
+
+        filename = f"preview_{uuid.uuid4()}.{output_format}"
+        rendered = await run_in_worker("preview", _render_excerpt, core, y, sr, params,
+                                       os.path.join(self.processed_dir, filename), output_format)
+        rendered_at = time.perf_counter()
+        await asyncio.to_thread(self._keep_output, session, filename)
+
+        return {
+            **rendered,
+            "filename": filename,
+            "sample_rate": int(sr),
+            "samples": y.size,
+            "decode_seconds": decoded - started,
+            "render_seconds": rendered_at - decoded
+        }
+
+    def _keep_output(self, session: PreviewSession, filename: str):
+        """Publish a rendered preview, dropping the session's oldest beyond SESSION_OUTPUTS (blocking)"""
+        storage = get_storage()
+        storage.publish([filename], self.processed_dir)
+        session.outputs.append(filename)
+        while len(session.outputs) > SESSION_OUTPUTS:
+            storage.delete(session.outputs.popleft())
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "renders": self.renders,
+            "budget_misses": self.budget_misses,
+            "render_us_per_sample": {tool: round(cost * 1e6, 4) for tool, cost in self._cost.items()}
+        }
+
+
+def _render_excerpt(core: Callable, y: np.ndarray, sr: int, params: dict, output_path: str,
+                    output_format: str) -> dict:
+    """Worker side of a preview: run the core on the excerpt and encode the result to output_path"""
+    result = core(y, sr, **params)
+    stats = None
+    if isinstance(result, tuple):
+        # (signal, stats), or the pipeline's (signal, step info, converter params)
+        result, stats = result[0], result[1]
+    result = result if result.ndim == 2 else result[np.newaxis, :]
+    with StreamEncoder(output_path, sr, result.shape[0], output_format, PREVIEW_QUALITY) as encoder:
+        encoder.write(np.nan_to_num(result).astype(np.float32))
+    return {"output_duration": round(result.shape[-1] / sr, 3), "stats": stats}
+
+
+_manager: Optional[PreviewManager] = None
+
+
+def get_preview_manager() -> PreviewManager:
+    """Return this gateway process's preview manager"""
+    global _manager
+    if _manager is None:
+        _manager = PreviewManager()
+    return _manager
@@ -0,0 +1,366 @@
+"""
+Real-time block processing for ODOREMOVER Audio Suite
+Stateful per-connection effect chains fed raw PCM chunks over a WebSocket
+
+Protocol (ws /ws/realtime):
+  1. Client sends a JSON config:
+       {"sample_rate": 48000, "channels": 2, "format": "f32le" | "s16le",
+        "steps": [{"tool": "noise-reduction", "params": {...}}, {"tool": "equalizer", "params": {...}}]}
+     Server answers {"type": "ready", "latency_frames": ..., ...}.
+  2. Client sends binary messages of interleaved PCM. Each one is answered
+     with a binary message of processed PCM (possibly shorter while a
+     delaying effect fills up) followed by a JSON "block" report carrying
+     the processing time and real-time factor for that block.
+  3. JSON control messages: {"type": "learn", "seconds": 1.0} re-learns the
+     noise profile, {"type": "fade_out"} starts the fade-out, {"type": "end"}
+     flushes held-back audio, sends a summary and closes.
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from shared.config import Config
+from shared.filterbank import CrossoverFilterBank, SOSFilter, parametric_sos
+from shared.loudness import ABSOLUTE_GATE, TruePeakLimiter, channel_weights, k_weighting_sos, loudness_of
+from shared.stft import OverlapAdd, StreamingSTFT
+
+SAMPLE_FORMATS = {"f32le": np.dtype("<f4"), "s16le": np.dtype("<i2")}
+
+
+class RealtimeEffect:
+    """A stateful effect fed one (channels, n) block at a time"""
+
+    latency = 0  # samples of algorithmic delay
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Audio still held back once the input has ended"""
+        return None
+
+    def control(self, message: dict) -> bool:
+        """Handle a control message; False if this effect doesn't understand it"""
+        return False
+
+
+class EqualizerEffect(RealtimeEffect):
+    """EqualizerProcessor's crossover or parametric filters with state carried across blocks"""
+
+    def __init__(self, processor, samplerate: int, channels: int, low_gain=0.0, mid_gain=0.0, high_gain=0.0,
+                 crossovers=None, band_gains=None, bands=None):
+        if bands is not None:
+            bands = processor.parse_bands(bands)
+            spec = tuple((band["type"], band["freq"], band["gain"], band["q"]) for band in bands)
+            cascade = SOSFilter(parametric_sos(samplerate, spec), channels)
+            self._apply = cascade
+        else:
+            crossovers, band_gains = processor.band_settings(low_gain, mid_gain, high_gain, crossovers, band_gains)
+            bank = CrossoverFilterBank(crossovers, samplerate, channels)
+            self._apply = lambda block: bank.apply_gains(block, band_gains)
+
+    def process(self, block):
+        return self._apply(block)
+
+
+class VolumeEffect(RealtimeEffect):
+    """VolumeNormalizerProcessor's loudness target and true-peak limiter on a live stream.
+
+    A live stream can't be measured in full first, so normalize=True follows
+    the K-weighted (BS.1770) loudness over roughly REALTIME_LOUDNESS_WINDOW
+    seconds and ramps the gain toward target_level LUFS across each block so
+    changes don't click. Blocks under the -70 LUFS absolute gate leave the
+    gain alone instead of pumping up the noise floor. normalize=False applies
+    gain_db of plain gain. The limiter's look-ahead is the latency.
+    """
+
+    def __init__(self, processor, samplerate: int, channels: int, target_level=-14.0, normalize=True,
+                 true_peak=-1.0, gain_db=0.0):
+        self.samplerate = samplerate
+        self.normalize = normalize
+        self.target_level = float(target_level)
+        self.gain = None if normalize else 10 ** (float(gain_db) / 20)
+        self._filter = SOSFilter(k_weighting_sos(samplerate), channels)
+        self._weights = channel_weights(channels)
+        self._power = None
+        self._limiter = TruePeakLimiter(samplerate, channels, true_peak)
+        self.latency = self._limiter.context
+
+    def process(self, block):
+        if not self.normalize or not block.shape[1]:
+            return self._limiter.push(block * np.float32(self.gain or 1.0))
+
+        filtered = self._filter(block).astype(np.float64)
+        power = float(self._weights @ np.mean(filtered * filtered, axis=1))
+        if loudness_of(power) >= ABSOLUTE_GATE:
+            if self._power is None:
+                self._power = power
+            else:
+                weight = 1 - np.exp(-block.shape[1] / (Config.REALTIME_LOUDNESS_WINDOW * self.samplerate))
+                self._power += weight * (power - self._power)
+        target_gain = 10 ** ((self.target_level - loudness_of(self._power)) / 20) if self._power else 1.0
+        previous = self.gain if self.gain is not None else target_gain
+        ramp = np.linspace(previous, target_gain, block.shape[1], dtype=np.float32)
+        self.gain = target_gain
+        return self._limiter.push(block * ramp)
+
+    def flush(self):
+        return self._limiter.flush()
+
+
+class NoiseReductionEffect(RealtimeEffect):
+    """NoiseReductionProcessor's spectral subtraction with a profile learned from the live input.
+
+    The first profile_seconds pass through unchanged while the noise profile
+    is averaged; a "learn" control message re-learns it (the old profile
+    keeps being applied meanwhile).
+    """
+
+    def __init__(self, processor, samplerate: int, channels: int, reduction_strength=0.8, stationary=True,
+                 profile_seconds=0.5, n_fft=None):
+        n_fft = int(n_fft or Config.REALTIME_N_FFT)
+        engine = StreamingSTFT(n_fft, n_fft // 4)
+        self.processor = processor
+        self.samplerate = samplerate
+        self.reduction_strength = reduction_strength
+        self.stationary = stationary
+        self._hop = engine.hop_length
+        self._subtract = None
+        self._learn(profile_seconds)
+        self._stream = OverlapAdd(engine, self._frame_op)
+        self.latency = self._stream.latency
+
+    def _learn(self, seconds):
+        self._learn_frames = max(1, int(np.ceil(float(seconds) * self.samplerate / self._hop)))
+        self._profile_sum, self._seen = 0.0, 0
+
+    def _frame_op(self, spectrum):
+        if self._seen < self._learn_frames:
+            take = min(spectrum.shape[-1], self._learn_frames - self._seen)
+            self._profile_sum = self._profile_sum + np.abs(spectrum[..., :take]).sum(axis=-1, keepdims=True)
+            self._seen += take
+            if self._seen >= self._learn_frames:
+                self._subtract = self.processor.spectral_subtractor(
+                    self._profile_sum / self._seen, self.reduction_strength, self.stationary
+                )
+            if self._subtract is None:
+                return spectrum
+        return self._subtract(spectrum)
+
+    def process(self, block):
+        return self._stream.push(block)
+
+    def flush(self):
+        return self._stream.flush()
+
+    def control(self, message):
+        if message.get("type") != "learn":
+            return False
+        self._learn(message.get("seconds", 0.5))
+        return True
+
+
+class FadeEffect(RealtimeEffect):
+    """FadeEffectProcessor's linear fades: fade-in from the first sample, fade-out on request.
+
+    A live stream has no known end, so the fade-out starts when the client
+    sends {"type": "fade_out"}; everything after it is silent.
+    """
+
+    def __init__(self, processor, samplerate: int, channels: int, fade_in_duration=2.0, fade_out_duration=2.0):
+        self.fade_in = max(0, int(fade_in_duration * samplerate))
+        self.fade_out = max(0, int(fade_out_duration * samplerate))
+        self.position = 0
+        self.fade_out_start = None
+
+    def _ramp(self, start, count, length, rising):
+        """Samples [start, start + count) of np.linspace(0, 1, length) (or 1 -> 0)"""
+        index = np.arange(start, start + count, dtype=np.float32)
+        ramp = np.clip(index / max(length - 1, 1), 0.0, 1.0)
+        return ramp if rising else 1.0 - ramp
+
+    def process(self, block):
+        n = block.shape[1]
+        gain = np.ones(n, dtype=np.float32)
+        if self.position < self.fade_in:
+            gain *= self._ramp(self.position, n, self.fade_in, rising=True)
+        if self.fade_out_start is not None:
+            if self.fade_out:
+                gain *= self._ramp(self.position - self.fade_out_start, n, self.fade_out, rising=False)
+            else:
+                gain[:] = 0.0
+        self.position += n
+        return block * gain
+
+    def control(self, message):
+        if message.get("type") != "fade_out":
+            return False
+        if self.fade_out_start is None:
+            self.fade_out_start = self.position
+        return True
+
+
+# Route name -> effect class, built around that tool's processor
+EFFECTS = {
+    "equalizer": EqualizerEffect,
+    "volume-normalizer": VolumeEffect,
+    "noise-reduction": NoiseReductionEffect,
+    "fade-effect": FadeEffect,
+}
+
+
+class RealtimeChain:
+    """An ordered list of effects plus PCM decoding/encoding and latency accounting"""
+
+    def __init__(self, effects: List[RealtimeEffect], samplerate: int, channels: int, sample_format: str):
+        self.effects = effects
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = SAMPLE_FORMATS[sample_format]
+        self.timings: List[float] = []
+
+    @property
+    def latency(self) -> int:
+        return sum(effect.latency for effect in self.effects)
+
+    def decode(self, payload: bytes) -> np.ndarray:
+        frame_bytes = self.dtype.itemsize * self.channels
+        if len(payload) % frame_bytes:
+            raise ValueError(f"PCM chunk must be a whole number of {frame_bytes}-byte frames")
+        samples = np.frombuffer(payload, dtype=self.dtype)
+        if samples.size // self.channels > Config.REALTIME_MAX_BLOCK_FRAMES:
+            raise ValueError(f"PCM chunk exceeds {Config.REALTIME_MAX_BLOCK_FRAMES} frames")
+        block = samples.reshape(-1, self.channels).T.astype(np.float32)
+        if self.dtype.kind == "i":
+            block /= 32768.0
+        return block
+
+    def encode(self, block: np.ndarray) -> bytes:
+        block = np.clip(block, -1.0, 1.0)
+        if self.dtype.kind == "i":
+            block = np.round(block * 32767.0)
+        return np.ascontiguousarray(block.T).astype(self.dtype).tobytes()
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        for effect in self.effects:
+            block = effect.process(block)
+        return block
+
+    def flush(self) -> np.ndarray:
+        """Drain every effect in order; what one releases still runs through the rest"""
+        out = np.zeros((self.channels, 0), dtype=np.float32)
+        for effect in self.effects:
+            if out.shape[1]:
+                out = effect.process(out)
+            tail = effect.flush()
+            if tail is not None and tail.shape[1]:
+                out = np.concatenate([out, tail], axis=1)
+        return out
+
+    def control(self, message: dict):
+        handled = [effect.control(message) for effect in self.effects]
+        if not any(handled):
+            raise ValueError(f"No effect in this chain handles '{message.get('type')}'")
+
+
+async def build_chain(config: dict, load_processor: Callable[[str], Awaitable]) -> RealtimeChain:
+    """Validate a session config and construct its effects; raises ValueError"""
+    samplerate = int(config.get("sample_rate", 0))
+    channels = int(config.get("channels", 0))
+    sample_format = config.get("format", "f32le")
+    if not 8000 <= samplerate <= 192000:
+        raise ValueError("sample_rate must be between 8000 and 192000")
+    if not 1 <= channels <= Config.REALTIME_MAX_CHANNELS:
+        raise ValueError(f"channels must be between 1 and {Config.REALTIME_MAX_CHANNELS}")
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(SAMPLE_FORMATS)}")
+    steps = config.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("steps must be a non-empty list of {\"tool\", \"params\"} objects")
+
+    effects = []
+    for step in steps:
+        tool = step.get("tool") if isinstance(step, dict) else None
+        if tool not in EFFECTS:
+            raise ValueError(f"Unsupported real-time tool '{tool}'. Available: {', '.join(EFFECTS)}")
+        params = step.get("params") or {}
+        if not isinstance(params, dict):
+            raise ValueError(f"params for '{tool}' must be an object")
+        processor = await load_processor(tool)
+        try:
+            effects.append(EFFECTS[tool](processor, samplerate, channels, **params))
+        except TypeError as e:
+            raise ValueError(f"Invalid params for '{tool}': {str(e)}")
+    return RealtimeChain(effects, samplerate, channels, sample_format)
+
+
+async def serve_realtime(websocket: WebSocket, load_processor: Callable[[str], Awaitable]):
+    """Accept a WebSocket and run one real-time session on it (see module docstring)"""
+    await websocket.accept()
+    try:
+        try:
+            chain = await build_chain(json.loads(await websocket.receive_text()), load_processor)
+        except (ValueError, TypeError, AttributeError) as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1008)
+            return
+
+        await websocket.send_json({
+            "type": "ready",
+            "sample_rate": chain.samplerate,
+            "channels": chain.channels,
+            "latency_frames": chain.latency,
+            "latency_ms": round(1000 * chain.latency / chain.samplerate, 2)
+        })
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                try:
+                    block = chain.decode(message["bytes"])
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                started = time.perf_counter()
+                out = await asyncio.to_thread(chain.process, block)
+                elapsed = time.perf_counter() - started
+                chain.timings.append(elapsed)
+                await websocket.send_bytes(chain.encode(out))
+                await websocket.send_json({
+                    "type": "block",
+                    "index": len(chain.timings) - 1,
+                    "frames": block.shape[1],
+                    "output_frames": out.shape[1],
+                    "processing_ms": round(elapsed * 1000, 3),
+                    "realtime_factor": round(elapsed * chain.samplerate / max(block.shape[1], 1), 4)
+                })
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "")
+                if control.get("type") == "end":
+                    break
+                chain.control(control)
+            except (ValueError, AttributeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+        tail = await asyncio.to_thread(chain.flush)
+        if tail.shape[1]:
+            await websocket.send_bytes(chain.encode(tail))
+        timings = chain.timings or [0.0]
+        await websocket.send_json({
+            "type": "end",
+            "blocks": len(chain.timings),
+            "flushed_frames": tail.shape[1],
+            "mean_processing_ms": round(1000 * sum(timings) / len(timings), 3),
+            "max_processing_ms": round(1000 * max(timings), 3)
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
@@ -0,0 +1,107 @@
+"""
+Processor registry for ODOREMOVER Audio Suite
+Imports and constructs processors on first use, so the gateway starts without loading the DSP stack
+"""
+import asyncio
+import importlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Route name -> "module:Class", resolved against the services directory
+PROCESSOR_SPECS = {
+    "vocal-remover": "vocal_remover.processor:VocalRemoverProcessor",
+    "pitch-tempo": "pitch_tempo.processor:PitchTempoProcessor",
+    "converter": "converter.processor:ConverterProcessor",
+    "cutter-joiner": "cutter_joiner.processor:CutterJoinerProcessor",
+    "noise-reduction": "noise_reduction.processor:NoiseReductionProcessor",
+    "volume-normalizer": "volume_normalizer.processor:VolumeNormalizerProcessor",
+    "fade-effect": "fade_effect.processor:FadeEffectProcessor",
+    "metadata-editor": "metadata_editor.processor:MetadataEditorProcessor",
+    "audio-reverse": "audio_reverse.processor:AudioReverseProcessor",
+    "equalizer": "equalizer.processor:EqualizerProcessor",
+    "audio-splitter": "audio_splitter.processor:AudioSplitterProcessor",
+    "pipeline": "pipeline.processor:PipelineProcessor",
+}
+
+
+class ProcessorRegistry:
+    """Lazily imported, process-wide processor singletons"""
+
+    def __init__(self, specs: Optional[Dict[str, str]] = None):
+        self.specs = dict(specs or PROCESSOR_SPECS)
+        self._instances: Dict[str, object] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str):
+        """Return the processor for a route name, importing and constructing it on first use"""
+        processor = self._instances.get(name)
+        if processor is not None:
+            return processor
+        # Warm-up may be loading the same module from another thread
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                module_name, class_name = self.specs[name].split(":")
+                processor_class = getattr(importlib.import_module(module_name), class_name)
+                self._instances[name] = processor_class()
+                self._load_seconds[name] = round(time.perf_counter() - started, 3)
+            return self._instances[name]
+
+    async def load(self, name: str):
+        """Like get(), but a first-time import runs in a thread instead of blocking the event loop"""
+        processor = self._instances.get(name)
+        if processor is not None:
+            return processor
+        return await asyncio.to_thread(self.get, name)
+
+    def load_all(self):
+        """Import and construct every processor (blocking)"""
+        for name in self.specs:
+            self.get(name)
+
+    def stats(self) -> dict:
+        return {
+            "registered": len(self.specs),
+            "loaded": sorted(self._instances),
+            "load_seconds": dict(self._load_seconds)
+        }
+
+
+def warm_up_kernels() -> float:
+    """Import the DSP stack and JIT-compile librosa/numba kernels; runs inside a worker process.
+
+    Returns the time it took, in seconds.
+    """
+    started = time.perf_counter()
+    import numpy as np
+    import librosa
+
+    for spec in PROCESSOR_SPECS.values():
+        importlib.import_module(spec.split(":")[0])
+
+    sr = 22050
+    y = (0.1 * np.random.default_rng(0).standard_normal(sr)).astype(np.float32)
+    from shared.timestretch import shift_pitch_tempo
+    shift_pitch_tempo(y[np.newaxis, :], sr, pitch_shift=1, tempo_change=1.1)
+    librosa.istft(librosa.stft(y))
+    librosa.resample(y, orig_sr=sr, target_sr=16000)
+    return time.perf_counter() - started
+
+
+_registry: Optional[ProcessorRegistry] = None
+
+
+def get_registry() -> ProcessorRegistry:
+    """Return the process-wide registry"""
+    global _registry
+    if _registry is None:
+        _registry = ProcessorRegistry()
+    return _registry
@@ -0,0 +1,173 @@
+"""
+Result cache for ODOREMOVER Audio Suite
+Maps (input content hash, service, parameters, processor version) to a finished response
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from shared.config import Config
+from shared.storage import StorageBackend, get_storage
+
+DOWNLOAD_PREFIX = "/download/"
+
+
+def _normalize(value):
+    """Make parameter values compare equal regardless of how the form sent them"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def artifacts(payload) -> List[str]:
+    """Filenames of every /download/... artifact referenced by a response payload"""
+    found = []
+    if isinstance(payload, str):
+        if payload.startswith(DOWNLOAD_PREFIX):
+            found.append(payload[len(DOWNLOAD_PREFIX):])
+    elif isinstance(payload, dict):
+        for value in payload.values():
+            found.extend(artifacts(value))
+    elif isinstance(payload, (list, tuple)):
+        for value in payload:
+            found.extend(artifacts(value))
+    return sorted(set(found))
+
+
+class ResultCache:
+    """Content-addressed cache of processed results with size/age LRU eviction"""
+
+    def __init__(self, storage: Optional[StorageBackend] = None, index_path: Optional[str] = None,
+                 max_bytes: Optional[int] = None, max_age: Optional[int] = None):
+        self.storage = storage or get_storage()
+        self.max_bytes = max_bytes if max_bytes is not None else Config.RESULT_CACHE_MAX_BYTES
+        self.max_age = max_age if max_age is not None else Config.RESULT_CACHE_MAX_AGE
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        index_path = str(index_path or Config.CACHE_DIR / "results.sqlite3")
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                files TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    @staticmethod
+    def make_key(content_hash: str, service: str, params: dict, version: str) -> str:
+        material = json.dumps(
+            {"input": content_hash, "service": service, "params": _normalize(params), "version": version},
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Return the cached payload, or None if missing or its artifacts are gone"""
+        row = self._conn.execute("SELECT payload, files FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            payload, files = json.loads(row[0]), json.loads(row[1])
+            if all(self.storage.exists(name) for name in files):
+                self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.hits += 1
+                return payload
+            self._drop(key, files)
+        self.misses += 1
+        return None
+
+    def store(self, key: str, service: str, payload: dict):
+        """Remember a finished response and evict old entries if over budget"""
+        files = artifacts(payload)
+        size = sum(self.storage.size(name) or 0 for name in files)
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, service, json.dumps(payload), json.dumps(files), size, now, now)
+        )
+        self.evict()
+
+    def _drop(self, key: str, files: List[str]):
+        self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        for name in files:
+            self.storage.delete(name)
+        self.evictions += 1
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        expired = self._conn.execute(
+            "SELECT key, files FROM results WHERE created_at < ?", (time.time() - self.max_age,)
+        ).fetchall()
+        for key, files in expired:
+            self._drop(key, json.loads(files))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, files, size in self._conn.execute(
+            "SELECT key, files, size FROM results ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(key, json.loads(files))
+            total -= size
+
+    def stats(self) -> dict:
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache"""
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+async def cached_result(service: str, version: str, content_hash: str, params: dict,
+                        compute: Callable[[], Awaitable[dict]], use_cache: bool = True) -> dict:
+    """Serve a previous identical result if there is one, otherwise compute and remember it"""
+    if not use_cache or not Config.RESULT_CACHE_ENABLED:
+        return await compute()
+
+    cache = get_result_cache()
+    key = cache.make_key(content_hash, service, params, version)
+    # Artifact checks are object-store round trips with remote storage
+    cached = await asyncio.to_thread(cache.lookup, key)
+    if cached is not None:
+        return cached
+
+    result = await compute()
+    await asyncio.to_thread(cache.store, key, service, result)
+    return result
@@ -0,0 +1,294 @@
+"""
+Retention manager for ODOREMOVER Audio Suite
+Enforces age TTLs and byte quotas on uploads/, processed/ and temp/ from a manifest index
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from shared.config import Config
+
+# Manifest rows fetched per query while evicting
+EVICTION_PAGE_SIZE = 1000
+
+# Paths held by in-flight work in this process (absolute path -> holders)
+_pins: Counter = Counter()
+_pins_lock = threading.Lock()
+
+
+def pin(*paths: str):
+    """Protect files from retention until unpin() is called as often"""
+    with _pins_lock:
+        for path in paths:
+            _pins[os.path.abspath(path)] += 1
+
+
+def unpin(*paths: str):
+    with _pins_lock:
+        for path in paths:
+            path = os.path.abspath(path)
+            _pins[path] -= 1
+            if _pins[path] <= 0:
+                del _pins[path]
+
+
+def is_pinned(path: str) -> bool:
+    with _pins_lock:
+        return os.path.abspath(path) in _pins
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits for one managed directory; files idle longer than max_age go, then oldest-accessed over quota"""
+    name: str
+    directory: str
+    max_age: float  # seconds since last access
+    max_bytes: int
+
+
+def default_policies() -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy("uploads", str(Config.UPLOAD_DIR), Config.UPLOAD_RETENTION_SECONDS, Config.UPLOAD_QUOTA_BYTES),
+        RetentionPolicy("processed", str(Config.PROCESSED_DIR), Config.PROCESSED_RETENTION_SECONDS,
+                        Config.PROCESSED_QUOTA_BYTES),
+        RetentionPolicy("temp", str(Config.TEMP_DIR), Config.TEMP_RETENTION_SECONDS, Config.TEMP_QUOTA_BYTES),
+    ]
+
+
+def _walk(directory: str) -> Iterator[os.DirEntry]:
+    """Every regular file below directory, lazily"""
+    pending = [directory]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+class RetentionManager:
+    """Manifest-indexed cleanup of the working directories.
+
+    The manifest (SQLite) records size and last access per file. Files are
+    registered when written (track), touched when downloaded (touch) and
+    reconciled by a sweep that resumes where it stopped, visiting at most
+    RETENTION_SCAN_BATCH entries per run; rows not seen by a completed sweep
+    are dropped. TTL and quota decisions are SQL queries over the manifest,
+    so a run's cost does not grow with the number of files on disk.
+
+    Pinned files and files younger than the grace period (which covers
+    outputs still being written by workers or other processes) are never
+    deleted.
+    """
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None, index_path: Optional[str] = None,
+                 scan_batch: Optional[int] = None, grace: Optional[float] = None):
+        self.policies = {policy.name: policy for policy in (policies or default_policies())}
+        self.scan_batch = scan_batch or Config.RETENTION_SCAN_BATCH
+        self.grace = grace if grace is not None else Config.RETENTION_GRACE_SECONDS
+        self.deleted: Counter = Counter()
+        self.deleted_bytes: Counter = Counter()
+        self._sweeps: Dict[str, Tuple[Iterator[os.DirEntry], float]] = {}
+        self._roots = {name: os.path.abspath(policy.directory) for name, policy in self.policies.items()}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        index_path = str(index_path or Config.CACHE_DIR / "retention.sqlite3")
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                area TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                seen_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_area_access ON files (area, last_access, path)")
+
+    def _area(self, path: str) -> Optional[str]:
+        for name, root in self._roots.items():
+            if path.startswith(root + os.sep):
+                return name
+        return None
+
+    def track(self, path: str, size: Optional[int] = None):
+        """Register a file just written in a managed directory"""
+        path = os.path.abspath(path)
+        area = self._area(path)
+        if area is None:
+            return
+        try:
+            size = size if size is not None else os.path.getsize(path)
+        except OSError:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET size = excluded.size, seen_at = excluded.seen_at""",
+                (path, area, size, now, now, now)
+            )
+
+    def touch(self, path: str):
+        """Record a download, keeping the file away from LRU eviction"""
+        path = os.path.abspath(path)
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE files SET last_access = ? WHERE path = ?", (time.time(), path)
+            ).rowcount
+        if not updated:
+            self.track(path)
+
+    def forget(self, path: str):
+        """Drop a file that its owner deleted"""
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+
+    def _sweep(self, name: str):
+        """Advance this area's resumable directory walk by up to scan_batch files"""
+        walk, started = self._sweeps.get(name) or (_walk(self._roots[name]), time.time())
+        rows = []
+        finished = True
+        for entry in walk:
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            rows.append((os.path.abspath(entry.path), name, stat.st_size, stat.st_mtime, stat.st_mtime, time.time()))
+            if len(rows) >= self.scan_batch:
+                finished = False
+                break
+
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET size = excluded.size, seen_at = excluded.seen_at""",
+                rows
+            )
+            if finished:
+                # Anything not seen since this walk began is gone from disk
+                self._conn.execute("DELETE FROM files WHERE area = ? AND seen_at < ?", (name, started))
+        if finished:
+            self._sweeps.pop(name, None)
+        else:
+            self._sweeps[name] = (walk, started)
+
+    def _least_recent(self, name: str, accessed_before: float) -> Iterator[Tuple[str, int, float]]:
+        """(path, size, created_at) of an area's files, least recently accessed first, in pages"""
+        last_access, last_path = -1.0, ""
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    """SELECT path, size, created_at, last_access FROM files
+                       WHERE area = ? AND last_access < ? AND (last_access, path) > (?, ?)
+                       ORDER BY last_access, path LIMIT ?""",
+                    (name, accessed_before, last_access, last_path, EVICTION_PAGE_SIZE)
+                ).fetchall()
+            if not page:
+                return
+            for path, size, created_at, _ in page:
+                yield path, size, created_at
+            last_path, last_access = page[-1][0], page[-1][3]
+
+    def _delete(self, name: str, rows: Iterable[Tuple[str, int, float]], limit_bytes: Optional[int] = None) -> int:
+        """Delete manifest rows' files (oldest first) until limit_bytes are freed; returns bytes freed"""
+        freed = 0
+        cutoff = time.time() - self.grace
+        for path, size, created_at in rows:
+            if limit_bytes is not None and freed >= limit_bytes:
+                break
+            if created_at > cutoff or is_pinned(path):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            else:
+                freed += size
+                self.deleted[name] += 1
+                self.deleted_bytes[name] += size
+            with self._lock:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return freed
+
+    def enforce(self, name: str):
+        """Apply the TTL, then the quota, to one area"""
+        policy = self.policies[name]
+        self._delete(name, self._least_recent(name, time.time() - policy.max_age))
+
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM files WHERE area = ?", (name,)).fetchone()[0]
+        if total <= policy.max_bytes:
+            return
+        self._delete(name, self._least_recent(name, time.time() + 1), limit_bytes=total - policy.max_bytes)
+
+    def run_once(self):
+        """One incremental sweep step plus enforcement for every area (blocking)"""
+        for name in self.policies:
+            self._sweep(name)
+            self.enforce(name)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                print(f"⚠️  Retention run failed: {e}")
+            await asyncio.sleep(Config.RETENTION_INTERVAL)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = dict((area, (count, size)) for area, count, size in self._conn.execute(
+                "SELECT area, COUNT(*), COALESCE(SUM(size), 0) FROM files GROUP BY area"
+            ))
+        return {
+            name: {
+                "files": rows.get(name, (0, 0))[0],
+                "size_bytes": rows.get(name, (0, 0))[1],
+                "max_bytes": policy.max_bytes,
+                "max_age": policy.max_age,
+                "deleted": self.deleted[name],
+                "deleted_bytes": self.deleted_bytes[name],
+                "sweep_in_progress": name in self._sweeps
+            }
+            for name, policy in self.policies.items()
+        }
+
+
+_manager: Optional[RetentionManager] = None
+
+
+def get_retention_manager() -> RetentionManager:
+    """Return the process-wide retention manager"""
+    global _manager
+    if _manager is None:
+        _manager = RetentionManager()
+    return _manager
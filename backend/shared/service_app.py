@@ -0,0 +1,91 @@
+"""
+Service app helpers for ODOREMOVER Audio Suite
+Job submission/status routes and a FastAPI factory shared by the gateway and standalone services
+"""
+from typing import Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from shared.downloads import serve_download
+from shared.executor import get_executor
+from shared.jobs import get_job_manager
+from shared.upload import ingest_upload, ingest_uploads
+
+
+async def submit_upload_job(service: str, file, process_file, *args, upload_dir: Optional[str] = None):
+    """Queue process_file(upload, *args) as a background job and return its id.
+
+    file may also be a list of UploadFiles; process_file then gets the list of uploads.
+    """
+    if isinstance(file, list):
+        upload = await ingest_uploads(file, upload_dir)
+        cleanup = lambda: [stored.remove() for stored in upload]
+    else:
+        upload = await ingest_upload(file, upload_dir)
+        cleanup = upload.remove
+    job = get_job_manager().submit(
+        service,
+        lambda: process_file(upload, *args),
+        on_finish=cleanup
+    )
+    return job_accepted(job)
+
+
+def job_accepted(job: dict) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['job_id']}"
+    })
+
+
+jobs_router = APIRouter()
+
+
+@jobs_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get state, progress and result of a submitted job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@jobs_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return {"success": True, "job_id": job_id, "status": "cancelling"}
+
+
+def create_service_app(service: str, title: str) -> FastAPI:
+    """FastAPI app for one standalone service, with /health, /jobs, /download and worker shutdown.
+
+    The service's main.py adds its POST /process route, which the gateway
+    forwards the matching tool route to; the gateway also proxies downloads
+    of this instance's local results.
+    """
+    app = FastAPI(title=title)
+    app.include_router(jobs_router)
+
+    @app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+    async def download(filename: str, request: Request):
+        return await serve_download(request, "processed", filename)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "service": service, "workers": get_executor().stats()}
+
+    @app.on_event("shutdown")
+    async def shutdown_workers():
+        await get_job_manager().shutdown()
+        get_executor().shutdown()
+
+    return app
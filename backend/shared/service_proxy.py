@@ -0,0 +1,219 @@
+"""
+Service forwarding for ODOREMOVER Audio Suite
+Streams gateway tool requests to standalone service instances over one pooled keep-alive client
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from shared.config import Config
+
+# Headers that describe one connection, not the message, and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host"
+}
+
+# Forwarded async jobs remembered for /jobs routing
+MAX_TRACKED_JOBS = 10000
+
+
+def _forwardable(headers: Iterable) -> List:
+    return [(name, value) for name, value in headers
+            if (name.decode("latin-1") if isinstance(name, bytes) else name).lower() not in HOP_BY_HOP_HEADERS]
+
+
+class ServicePool:
+    """Instances of one service, picked round-robin among those passing health checks"""
+
+    def __init__(self, service: str, urls: List[str]):
+        self.service = service
+        self.urls = list(urls)
+        self.healthy = set(self.urls)
+        self._next = 0
+
+    def candidates(self) -> List[str]:
+        """Healthy instances in round-robin order, starting one past the previous request's first pick"""
+        start = self._next
+        self._next = (self._next + 1) % len(self.urls)
+        ordered = self.urls[start:] + self.urls[:start]
+        return [url for url in ordered if url in self.healthy]
+
+    def mark(self, url: str, healthy: bool):
+        if healthy:
+            self.healthy.add(url)
+        else:
+            self.healthy.discard(url)
+
+    def stats(self) -> dict:
+        return {"instances": self.urls, "healthy": [url for url in self.urls if url in self.healthy]}
+
+
+class ServiceProxy:
+    """Forwards tool routes to services that have instances configured; the rest run in-process"""
+
+    def __init__(self, routes: Iterable[str]):
+        # Route name ("vocal-remover") -> pool for its service ("vocal_remover")
+        self.pools: Dict[str, ServicePool] = {}
+        for route in routes:
+            service = route.replace("-", "_")
+            urls = Config.get_service_urls(service)
+            if urls:
+                self.pools[route] = ServicePool(service, urls)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._jobs: "OrderedDict[str, str]" = OrderedDict()
+
+    def route_for(self, request: Request) -> Optional[str]:
+        """Name of the forwarded tool route a request targets, if any"""
+        if request.method != "POST":
+            return None
+        route = request.url.path.strip("/")
+        return route if route in self.pools else None
+
+    async def start(self):
+        if not self.pools:
+            return
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=Config.FORWARD_MAX_CONNECTIONS,
+                                max_keepalive_connections=Config.FORWARD_MAX_KEEPALIVE),
+            # Synchronous requests wait for the service's processing timeout
+            timeout=httpx.Timeout(Config.PROCESSING_TIMEOUT + 30, connect=5.0)
+        )
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(Config.SERVICE_HEALTH_INTERVAL)
+            await self.check_health()
+
+    async def check_health(self):
+        """Probe /health on every instance and update each pool's healthy set"""
+        async def probe(pool, url):
+            try:
+                response = await self._client.get(f"{url}/health", timeout=5.0)
+                pool.mark(url, response.status_code == 200)
+            except httpx.HTTPError:
+                pool.mark(url, False)
+
+        await asyncio.gather(*(probe(pool, url) for pool in self.pools.values() for url in pool.urls))
+
+    async def forward(self, request: Request, route: str) -> Response:
+        """Stream the request body to the service's /process and stream its response back.
+
+        The next instance is only tried when connecting fails, before any of the
+        body has been read, since a streamed body cannot be replayed.
+        """
+        pool = self.pools[route]
+        headers = _forwardable(request.headers.raw)
+        body_started = False
+
+        async def body():
+            nonlocal body_started
+            body_started = True
+            async for chunk in request.stream():
+                yield chunk
+
+        for url in pool.candidates():
+            upstream_request = self._client.build_request(
+                "POST", f"{url}/process", params=request.query_params, headers=headers, content=body()
+            )
+            try:
+                upstream = await self._client.send(upstream_request, stream=True)
+            except httpx.TransportError as e:
+                pool.mark(url, False)
+                if body_started:
+                    return JSONResponse(status_code=502, content={"detail": f"{pool.service} instance failed: {str(e)}"})
+                continue
+
+            if upstream.status_code == 202:
+                # Async job: remember which instance owns it so /jobs/{id} can be routed there
+                await upstream.aread()
+                await upstream.aclose()
+                job_id = upstream.json().get("job_id")
+                if job_id:
+                    self._remember_job(job_id, url)
+                return Response(content=upstream.content, status_code=202,
+                                headers=dict(_forwardable(upstream.headers.items())))
+            return StreamingResponse(
+                upstream.aiter_raw(),
+                status_code=upstream.status_code,
+                headers=dict(_forwardable(upstream.headers.items())),
+                background=BackgroundTask(upstream.aclose)
+            )
+
+        return JSONResponse(status_code=503, content={"detail": f"No healthy {pool.service} instances available"})
+
+    def _remember_job(self, job_id: str, url: str):
+        self._jobs[job_id] = url
+        while len(self._jobs) > MAX_TRACKED_JOBS:
+            self._jobs.popitem(last=False)
+
+    def _instances(self) -> List[str]:
+        """Every configured instance, each once"""
+        return list(dict.fromkeys(url for pool in self.pools.values() for url in pool.urls))
+
+    async def forward_job(self, request: Request, job_id: str) -> Optional[Response]:
+        """Proxy /jobs/{id} to the instance running a forwarded job; None if no instance knows it.
+
+        Jobs the gateway hasn't seen forwarded (e.g. from before a restart) are
+        looked up on every instance.
+        """
+        known = self._jobs.get(job_id)
+        for url in [known] if known is not None else self._instances():
+            try:
+                upstream = await self._client.request(request.method, f"{url}/jobs/{job_id}")
+            except httpx.TransportError as e:
+                if known is None:
+                    continue
+                return JSONResponse(status_code=502, content={"detail": f"Service instance for job failed: {str(e)}"})
+            if upstream.status_code == 404 and known is None:
+                continue
+            self._remember_job(job_id, url)
+            return Response(content=upstream.content, status_code=upstream.status_code,
+                            headers=dict(_forwardable(upstream.headers.items())))
+        return None
+
+    async def forward_download(self, request: Request, filename: str) -> Optional[Response]:
+        """Stream /download/{filename} from the instance that wrote it; None if no instance has it.
+
+        Forwarded services keep their results in their own processed directory
+        unless result storage is shared, so the gateway asks each instance in turn.
+        """
+        if self._client is None or filename != os.path.basename(filename) or filename.startswith("."):
+            return None
+        headers = _forwardable(request.headers.raw)
+        for url in self._instances():
+            upstream_request = self._client.build_request(
+                request.method, f"{url}/download/{filename}", params=request.query_params, headers=headers
+            )
+            try:
+                upstream = await self._client.send(upstream_request, stream=True)
+            except httpx.TransportError:
+                continue
+            if upstream.status_code == 404:
+                await upstream.aclose()
+                continue
+            return StreamingResponse(
+                upstream.aiter_raw(),
+                status_code=upstream.status_code,
+                headers=dict(_forwardable(upstream.headers.items())),
+                background=BackgroundTask(upstream.aclose)
+            )
+        return None
+
+    def stats(self) -> dict:
+        return {route: pool.stats() for route, pool in self.pools.items()}
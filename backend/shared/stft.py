@@ -0,0 +1,172 @@
+"""
+Streaming STFT engine for ODOREMOVER Audio Suite
+Block-wise analysis -> per-frame spectral operation -> overlap-add resynthesis
+"""
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import scipy.fft
+import scipy.signal
+
+from shared.config import Config
+
+
+class StreamingSTFT:
+    """Overlap-add STFT over a block stream.
+
+    Framing, windowing and window-sum normalization follow librosa.stft/istft
+    with center=True and zero padding, so results match the whole-signal
+    versions up to float32 rounding while memory stays bounded by block size.
+    Spectra are handed to operations as (channels, bins, frames) arrays.
+    """
+
+    def __init__(self, n_fft: int = 2048, hop_length: Optional[int] = None):
+        hop_length = hop_length or n_fft // 4
+        if n_fft % hop_length or hop_length > n_fft // 2:
+            raise ValueError("n_fft must be a multiple of hop_length, with at least 2x overlap")
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.overlap = n_fft // hop_length
+        self.window = scipy.signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+    def frame_count(self, length: int) -> int:
+        """Number of frames librosa.stft would produce for a signal of this length"""
+        return 1 + length // self.hop_length
+
+    def frequencies(self, sr: int) -> np.ndarray:
+        return np.fft.rfftfreq(self.n_fft, 1.0 / sr)
+
+    def _frames(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """Yield batches of (channels, frames, n_fft) frames of the center-padded stream"""
+        half = self.n_fft // 2
+        pending = None
+        for block in blocks:
+            if pending is None:
+                pending = np.concatenate([np.zeros((block.shape[0], half), dtype=np.float32), block], axis=1)
+            else:
+                pending = np.concatenate([pending, block], axis=1)
+            pending, frames = self._take_frames(pending)
+            if frames is not None:
+                yield frames
+        if pending is None:
+            return
+        pending = np.concatenate([pending, np.zeros((pending.shape[0], half), dtype=np.float32)], axis=1)
+        _, frames = self._take_frames(pending)
+        if frames is not None:
+            yield frames
+
+    def _take_frames(self, pending: np.ndarray):
+        available = pending.shape[1] - self.n_fft
+        if available < 0:
+            return pending, None
+        count = 1 + available // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(pending, self.n_fft, axis=1)[:, ::self.hop_length][:, :count]
+        return pending[:, count * self.hop_length:], np.ascontiguousarray(frames)
+
+    def spectra(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """Analysis only: yield (channels, bins, frames) complex spectra batches"""
+        for frames in self._frames(blocks):
+            yield scipy.fft.rfft(frames * self.window, axis=-1).transpose(0, 2, 1)
+
+    def _overlap_add(self, frames: np.ndarray) -> np.ndarray:
+        """Sum (channels, k, n_fft) frames spaced hop_length apart"""
+        channels, count, _ = frames.shape
+        parts = frames.reshape(channels, count, self.overlap, self.hop_length)
+        out = np.zeros((channels, count + self.overlap - 1, self.hop_length), dtype=np.float32)
+        for offset in range(self.overlap):
+            out[:, offset:offset + count] += parts[:, :, offset]
+        return out.reshape(channels, -1)
+
+    def process(self, blocks: Iterable[np.ndarray],
+                frame_op: Callable[[np.ndarray], np.ndarray]) -> Iterator[np.ndarray]:
+        """Apply frame_op to every spectrum batch and yield resynthesized blocks.
+
+        The concatenated output has exactly as many samples as the input.
+        """
+        stream = OverlapAdd(self, frame_op)
+        for block in blocks:
+            out = stream.push(block)
+            if out.shape[1]:
+                yield out
+        out = stream.flush()
+        if out is not None and out.shape[1]:
+            yield out
+
+
+class OverlapAdd:
+    """Push-based StreamingSTFT.process: feed blocks as they arrive, get resynthesized audio back.
+
+    Output trails input by up to n_fft - hop_length samples (plus less than one
+    hop of framing); flush() returns the rest once the input has ended.
+    """
+
+    def __init__(self, engine: StreamingSTFT, frame_op: Callable[[np.ndarray], np.ndarray]):
+        self.engine = engine
+        self.frame_op = frame_op
+        self._window_sq = (engine.window ** 2)[np.newaxis, np.newaxis, :]
+        self._pending = None
+        self._tail = self._wss_tail = None
+        self._skip = engine.n_fft // 2
+        self._length = 0
+        self._emitted = 0
+
+    @property
+    def latency(self) -> int:
+        """Algorithmic delay in samples"""
+        return self.engine.n_fft - self.engine.hop_length
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        half = self.engine.n_fft // 2
+        if self._pending is None:
+            self._pending = np.zeros((block.shape[0], half), dtype=np.float32)
+        self._pending = np.concatenate([self._pending, block], axis=1)
+        self._length += block.shape[1]
+        self._pending, frames = self.engine._take_frames(self._pending)
+        if frames is None:
+            return np.zeros((block.shape[0], 0), dtype=np.float32)
+        return self._synthesize(frames, final=False)
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Pad out the end of the input and return everything still held back; None if nothing was pushed"""
+        if self._pending is None:
+            return None
+        half = self.engine.n_fft // 2
+        padded = np.concatenate([self._pending, np.zeros((self._pending.shape[0], half), dtype=np.float32)], axis=1)
+        self._pending = padded[:, padded.shape[1]:]
+        _, frames = self.engine._take_frames(padded)
+        return self._synthesize(frames, final=True)
+
+    def _synthesize(self, frames: np.ndarray, final: bool) -> np.ndarray:
+        engine = self.engine
+        tiny = np.finfo(np.float32).tiny
+        spectrum = scipy.fft.rfft(frames * engine.window, axis=-1).transpose(0, 2, 1)
+        spectrum = self.frame_op(spectrum)
+        resynth = scipy.fft.irfft(spectrum.transpose(0, 2, 1), n=engine.n_fft, axis=-1)
+        resynth = resynth.astype(np.float32) * engine.window
+
+        count = frames.shape[1]
+        ola = engine._overlap_add(resynth)
+        wss = engine._overlap_add(np.broadcast_to(self._window_sq, (1, count, engine.n_fft)))
+        if self._tail is not None:
+            ola[:, :self._tail.shape[1]] += self._tail
+            wss[:, :self._wss_tail.shape[1]] += self._wss_tail
+
+        done = count * engine.hop_length
+        if final:
+            # Nothing else overlaps the tail, flush everything
+            done = ola.shape[1]
+        out = ola[:, :done] / np.where(wss[:, :done] > tiny, wss[:, :done], 1.0)
+        self._tail, self._wss_tail = ola[:, done:], wss[:, done:]
+
+        if self._skip:
+            cut = min(self._skip, out.shape[1])
+            out = out[:, cut:]
+            self._skip -= cut
+        if final:
+            out = out[:, :max(0, self._length - self._emitted)]
+        self._emitted += out.shape[1]
+        return out
+
+
+def default_stft() -> StreamingSTFT:
+    return StreamingSTFT(Config.STFT_N_FFT, Config.STFT_HOP_LENGTH)
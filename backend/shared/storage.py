@@ -1,11 +1,14 @@
 """
 Storage utilities for ODOREMOVER Audio Suite
-Supports local storage and cloud storage integration
+Supports local storage and S3-compatible object storage for processed results
 """
+import mimetypes
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterable, Optional
+
+from shared.config import Config
 
 class StorageManager:
     """Manages file storage for audio processing"""
@@ -77,22 +80,190 @@ class StorageManager:
         except Exception:
             return None
 
-# Cloud storage integration (placeholder for future enhancement)
-class CloudStorageManager:
-    """Cloud storage integration for Cloudinary, Supabase, etc."""
-    
-    def __init__(self, provider: str = "local"):
-        self.provider = provider
-        self.local_storage = StorageManager()
-    
-    async def upload_file(self, file_content: bytes, filename: str) -> str:
-        """Upload file to cloud storage"""
-        # For now, use local storage
-        # Future: implement Cloudinary, Supabase, AWS S3, etc.
-        return self.local_storage.save_processed(file_content, filename)
-    
-    async def get_file_url(self, filename: str) -> str:
-        """Get public URL for file"""
-        # For now, return local download URL
-        # Future: return cloud URL
-        return self.local_storage.get_download_url(filename)
\ No newline at end of file
+class StorageBackend:
+    """Where processed results are kept, by download filename (the <name> in /download/<name>).
+
+    Processors write outputs into the local processed directory; publish()
+    then hands them to the backend.
+    """
+    remote = False
+
+    def publish(self, names: Iterable[str], local_dir: Optional[str] = None):
+        """Move freshly written outputs from local_dir into this storage"""
+        local_dir = str(local_dir or Config.PROCESSED_DIR)
+        for name in names:
+            path = os.path.join(local_dir, name)
+            if os.path.exists(path):
+                self.save(path, name)
+
+    def save(self, local_path: str, name: str):
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, name: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        raise NotImplementedError
+
+    def open(self, name: str) -> BinaryIO:
+        """Readable binary stream of a stored result"""
+        raise NotImplementedError
+
+    def read_range(self, name: str, start: int, length: int) -> bytes:
+        """length bytes of a stored result from offset start (fewer at the end)"""
+        with self.open(name) as stream:
+            stream.seek(start)
+            return stream.read(length)
+
+    def download_url(self, name: str) -> str:
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Results stay in the processed directory and are served by the gateway's /download route"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = str(root or Config.PROCESSED_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def save(self, local_path: str, name: str):
+        if os.path.abspath(local_path) != os.path.abspath(self._path(name)):
+            os.replace(local_path, self._path(name))
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def size(self, name: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(name))
+        except OSError:
+            return None
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def open(self, name: str) -> BinaryIO:
+        return open(self._path(name), "rb")
+
+    def download_url(self, name: str) -> str:
+        return f"/download/{name}"
+
+
+class S3Storage(StorageBackend):
+    """Results in an S3-compatible bucket (AWS S3, MinIO, Supabase Storage, ...).
+
+    Uploads are multipart from disk above S3_MULTIPART_THRESHOLD, with parts
+    sent in parallel over one pooled client per process. Downloads are
+    presigned URLs, so result bytes never pass through the gateway.
+    """
+    remote = True
+
+    def __init__(self, bucket: Optional[str] = None, prefix: Optional[str] = None,
+                 endpoint_url: Optional[str] = None, region: Optional[str] = None):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config as BotoConfig
+
+        self.bucket = bucket or Config.S3_BUCKET
+        if not self.bucket:
+            raise ValueError("S3 storage needs S3_BUCKET")
+        self.prefix = prefix if prefix is not None else Config.S3_PREFIX
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or Config.S3_ENDPOINT_URL,
+            region_name=region or Config.S3_REGION,
+            config=BotoConfig(
+                max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "standard"},
+                signature_version="s3v4"
+            )
+        )
+        self._transfer = TransferConfig(
+            multipart_threshold=Config.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=Config.S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=Config.S3_UPLOAD_CONCURRENCY
+        )
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def save(self, local_path: str, name: str):
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self._client.upload_file(local_path, self.bucket, self._key(name),
+                                 ExtraArgs={"ContentType": content_type}, Config=self._transfer)
+        os.remove(local_path)
+
+    def _head(self, name: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, name: str) -> bool:
+        return self._head(name) is not None
+
+    def size(self, name: str) -> Optional[int]:
+        head = self._head(name)
+        return head["ContentLength"] if head is not None else None
+
+    def delete(self, name: str):
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def open(self, name: str) -> BinaryIO:
+        return self._client.get_object(Bucket=self.bucket, Key=self._key(name))["Body"]
+
+    def read_range(self, name: str, start: int, length: int) -> bytes:
+        from botocore.exceptions import ClientError
+
+        if length <= 0:
+            return b""
+        try:
+            body = self._client.get_object(Bucket=self.bucket, Key=self._key(name),
+                                           Range=f"bytes={start}-{start + length - 1}")["Body"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(name)
+            raise
+        return body.read()
+
+    def download_url(self, name: str) -> str:
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(name)},
+            ExpiresIn=Config.S3_PRESIGN_EXPIRY
+        )
+
+
+def create_storage() -> StorageBackend:
+    """Build the backend selected by Config.STORAGE_PROVIDER"""
+    if Config.STORAGE_PROVIDER == "s3":
+        return S3Storage()
+    if Config.STORAGE_PROVIDER == "local":
+        return LocalStorage()
+    raise ValueError(f"Unknown storage provider: {Config.STORAGE_PROVIDER}")
+
+
+_storage: Optional[StorageBackend] = None
+_storage_pid: Optional[int] = None
+
+
+def get_storage() -> StorageBackend:
+    """Return this process's storage backend (recreated after a fork, since pooled connections can't be shared)"""
+    global _storage, _storage_pid
+    if _storage is None or _storage_pid != os.getpid():
+        _storage = create_storage()
+        _storage_pid = os.getpid()
+    return _storage
@@ -0,0 +1,190 @@
+"""
+Pitch/tempo engine for ODOREMOVER Audio Suite
+Any pitch shift + tempo change as one time stretch and one resample over (channels, samples) float32 audio
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.fft
+import soxr
+
+from shared.stft import StreamingSTFT, default_stft
+
+# Output frames synthesized per phase-vocoder pass, bounding the temporary spectra
+PV_BLOCK_FRAMES = 256
+
+# WSOLA frame length, and the rate the similarity search runs at
+WSOLA_FRAME_SECONDS = 0.04
+WSOLA_SEARCH_RATE = 8000
+
+# Engine quality -> soxr resampling quality
+QUALITIES = {"high": "HQ", "fast": "LQ"}
+
+
+def stretch_plan(pitch_shift: float, tempo_change: float) -> Tuple[float, float]:
+    """(stretch rate, pitch ratio) for a shift in semitones and a tempo multiplier.
+
+    Stretching by tempo_change / ratio and then resampling the result to play
+    ratio times faster changes the pitch by ratio and the duration by
+    1 / tempo_change, with a single pass of each.
+    """
+    ratio = 2.0 ** (pitch_shift / 12.0)
+    return tempo_change / ratio, ratio
+
+
+class PhaseVocoder:
+    """Block-wise phase-vocoder time stretch.
+
+    Follows librosa.effects.time_stretch (same framing, magnitude interpolation
+    and phase accumulation), but processes every channel at once and only
+    PV_BLOCK_FRAMES output frames of spectra at a time.
+    """
+
+    def __init__(self, engine: Optional[StreamingSTFT] = None, block_frames: int = PV_BLOCK_FRAMES):
+        self.engine = engine or default_stft()
+        self.block_frames = block_frames
+
+    def stretch(self, y: np.ndarray, rate: float) -> np.ndarray:
+        """Play y (channels, samples) rate times faster without changing its pitch"""
+        engine = self.engine
+        n_fft, hop = engine.n_fft, engine.hop_length
+        channels, length = y.shape
+        half = n_fft // 2
+        padded = np.pad(y.astype(np.float32, copy=False), ((0, 0), (half, half)))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=1)[:, ::hop]
+        n_frames = frames.shape[1]
+
+        time_steps = np.arange(0, n_frames, rate, dtype=np.float64)
+        n_out = len(time_steps)
+        phase_advance = np.linspace(0, np.pi * hop, n_fft // 2 + 1)
+        # Only phases modulo 2 pi matter; keeping the per-frame advance small keeps the running sums small
+        wrapped_advance = np.mod(phase_advance, 2.0 * np.pi)
+        out = np.zeros((channels, (n_out + engine.overlap - 1) * hop), dtype=np.float32)
+        phase_acc = None
+
+        for first in range(0, n_out, self.block_frames):
+            steps = time_steps[first:first + self.block_frames]
+            index = steps.astype(np.int64)
+            alpha = (steps - index).astype(np.float32)[np.newaxis, :, np.newaxis]
+            k0, k1 = index[0], index[-1] + 2
+            # Analysis frames past the end are silent, as librosa pads the STFT with zero columns
+            spectra = np.zeros((channels, k1 - k0, n_fft // 2 + 1), dtype=np.complex64)
+            available = min(k1, n_frames) - k0
+            spectra[:, :available] = scipy.fft.rfft(frames[:, k0:k0 + available] * engine.window, axis=-1)
+            magnitudes, angles = np.abs(spectra), np.angle(spectra).astype(np.float64)
+            left, right = index - k0, index - k0 + 1
+
+            magnitude = magnitudes[:, left]
+            magnitude += alpha * (magnitudes[:, right] - magnitude)
+            increment = angles[:, right] - angles[:, left] - phase_advance
+            increment -= 2.0 * np.pi * np.round(increment / (2.0 * np.pi))
+            increment += wrapped_advance
+            if phase_acc is None:
+                phase_acc = angles[:, 0]
+            phases = np.cumsum(increment, axis=1)
+            phases += phase_acc[:, np.newaxis] - increment
+            phase_acc = _wrap(phases[:, -1] + increment[:, -1])
+            # Wrapped before going to float32, so phases stay exact however long the signal
+            phases = _wrap(phases).astype(np.float32)
+
+            stretched = np.empty(magnitude.shape, dtype=np.complex64)
+            stretched.real = magnitude * np.cos(phases)
+            stretched.imag = magnitude * np.sin(phases)
+            synthesized = scipy.fft.irfft(stretched, n=n_fft, axis=-1)
+            synthesized *= engine.window
+            ola = engine._overlap_add(synthesized)
+            out[:, first * hop:first * hop + ola.shape[1]] += ola
+
+        # Window-sum normalization as in librosa.istft
+        parts = (engine.window ** 2).reshape(engine.overlap, hop)
+        window_sum = np.zeros((n_out + engine.overlap - 1, hop), dtype=np.float32)
+        for offset in range(engine.overlap):
+            window_sum[offset:offset + n_out] += parts[offset]
+        window_sum = window_sum.reshape(-1)
+        out /= np.where(window_sum > np.finfo(np.float32).tiny, window_sum, 1.0)
+
+        return _fit(out[:, half:], int(round(length / rate)))
+
+
+def wsola_stretch(y: np.ndarray, rate: float, sr: int) -> np.ndarray:
+    """Play y (channels, samples) rate times faster with WSOLA.
+
+    Each output frame is the input segment, within half a hop of its nominal
+    position, that best continues the previous one (cross-correlation of a
+    mono, decimated copy). Much cheaper than the phase vocoder and artefact-free
+    on speech, but less smooth on dense music.
+    """
+    channels, length = y.shape
+    frame = max(2 * int(sr * WSOLA_FRAME_SECONDS / 2), 64)
+    hop = frame // 2
+    tolerance = hop // 2
+    decimation = max(1, sr // WSOLA_SEARCH_RATE)
+    target = int(round(length / rate))
+    # Frame j is centred on output sample j * hop; frame 0 starts half a frame early so the output is fully overlapped
+    n_out = target // hop + 3
+
+    # Pad so every candidate segment lies inside the signal
+    margin = tolerance + frame + int(np.ceil(hop * rate))
+    padded = np.pad(y.astype(np.float32, copy=False), ((0, 0), (margin, margin + frame)))
+    usable = padded.shape[1] // decimation * decimation
+    guide = padded[:, :usable].mean(axis=0).reshape(-1, decimation).mean(axis=1)
+    frame_d, tolerance_d = frame // decimation, tolerance // decimation
+
+    positions = np.empty(n_out, dtype=np.int64)
+    positions[0] = margin - hop
+    for j in range(1, n_out):
+        natural = (positions[j - 1] + hop) // decimation
+        start = (margin + int(round(j * hop * rate)) - hop - tolerance) // decimation
+        template = guide[natural:natural + frame_d]
+        region = guide[start:start + frame_d + 2 * tolerance_d]
+        lag = int(np.argmax(np.correlate(region, template, "valid"))) if len(template) == frame_d else tolerance_d
+        positions[j] = (start + lag) * decimation
+
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)
+    out = np.zeros((channels, (n_out + 1) * hop), dtype=np.float32)
+    offsets = np.arange(frame)
+    for first in range(0, n_out, PV_BLOCK_FRAMES):
+        batch = positions[first:first + PV_BLOCK_FRAMES]
+        segments = padded[:, batch[:, np.newaxis] + offsets] * window
+        halves = segments.reshape(channels, len(batch), 2, hop)
+        region = out[:, first * hop:(first + len(batch) + 1) * hop].reshape(channels, -1, hop)
+        region[:, :len(batch)] += halves[:, :, 0]
+        region[:, 1:len(batch) + 1] += halves[:, :, 1]
+
+    # A periodic Hann at 50% overlap sums to one, so no normalization is needed past the first half frame
+    return _fit(out[:, hop:], target)
+
+
+def _wrap(phases: np.ndarray) -> np.ndarray:
+    """phases modulo 2 pi (np.mod is far slower on large values)"""
+    return phases - 2.0 * np.pi * np.floor(phases / (2.0 * np.pi))
+
+
+def _fit(y: np.ndarray, length: int) -> np.ndarray:
+    if y.shape[1] >= length:
+        return y[:, :length]
+    return np.pad(y, ((0, 0), (0, length - y.shape[1])))
+
+
+def shift_pitch_tempo(y: np.ndarray, sr: int, pitch_shift: float = 0.0, tempo_change: float = 1.0,
+                      quality: str = "high") -> np.ndarray:
+    """Shift y (channels, samples) by pitch_shift semitones and speed it up by tempo_change.
+
+    quality "high" uses the phase vocoder and high-quality resampling,
+    "fast" uses WSOLA and quick resampling (speech, previews).
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"quality must be one of {', '.join(QUALITIES)}")
+    if tempo_change <= 0:
+        raise ValueError("tempo_change must be positive")
+    if pitch_shift == 0.0 and tempo_change == 1.0:
+        return y
+
+    length = int(round(y.shape[1] / tempo_change))
+    rate, ratio = stretch_plan(pitch_shift, tempo_change)
+    if rate != 1.0:
+        y = PhaseVocoder().stretch(y, rate) if quality == "high" else wsola_stretch(y, rate, sr)
+    if ratio != 1.0:
+        # Played ratio times faster: the stretch's extra length becomes higher pitch
+        y = soxr.resample(np.ascontiguousarray(y.T), sr * ratio, sr, quality=QUALITIES[quality]).T
+    return _fit(np.ascontiguousarray(y, dtype=np.float32), length)
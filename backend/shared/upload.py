@@ -0,0 +1,141 @@
+"""
+Upload ingestion for ODOREMOVER Audio Suite
+Streams uploads to disk in fixed-size chunks, enforcing size/type limits on the way
+"""
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Set
+
+from fastapi import HTTPException, UploadFile
+
+from shared.config import Config
+from shared.executor import after_workers
+from shared.retention import pin, unpin
+
+
+@dataclass
+class IngestedUpload:
+    """An upload that has been written to disk"""
+    path: str
+    filename: str
+    size: int
+    content_hash: str  # sha256 hex digest of the raw bytes
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename)[1].lstrip(".").lower()
+
+    def remove(self):
+        """Delete the stored upload if it still exists, once no worker call of this task can be reading it"""
+        after_workers(self._delete)
+
+    def _delete(self):
+        unpin(self.path)
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _UploadWriter:
+    """Writes one upload to disk chunk by chunk, hashing it and enforcing the size limit"""
+
+    def __init__(self, filename: str, upload_dir: Optional[str], prefix: Optional[str],
+                 allowed_extensions: Set[str], max_size: int):
+        self.filename = os.path.basename(filename or "")
+        if "." not in self.filename or self.filename.rsplit(".", 1)[1].lower() not in allowed_extensions:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported file type. Allowed: {', '.join(sorted(allowed_extensions))}"
+            )
+        self.max_size = max_size
+        upload_dir = upload_dir or str(Config.UPLOAD_DIR)
+        os.makedirs(upload_dir, exist_ok=True)
+        stem = f"{prefix}_{uuid.uuid4()}" if prefix else str(uuid.uuid4())
+        self.path = os.path.join(upload_dir, f"{stem}_{self.filename}")
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._buffer = open(self.path, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise HTTPException(status_code=413, detail=_too_large_message(self.max_size))
+        self._hasher.update(chunk)
+        self._buffer.write(chunk)
+
+    def discard(self):
+        self._buffer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def finish(self) -> IngestedUpload:
+        self._buffer.close()
+        if self.size == 0:
+            os.remove(self.path)
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        # Held until remove(), so retention never deletes an upload that is still being processed
+        pin(self.path)
+        return IngestedUpload(path=self.path, filename=self.filename, size=self.size,
+                              content_hash=self._hasher.hexdigest())
+
+
+async def ingest_upload(file: UploadFile, upload_dir: Optional[str] = None,
+                        prefix: Optional[str] = None, allowed_extensions: Optional[Set[str]] = None,
+                        max_size: Optional[int] = None) -> IngestedUpload:
+    """Stream an UploadFile to disk, hashing it and enforcing MAX_FILE_SIZE.
+
+    allowed_extensions and max_size override the audio defaults (e.g. for zip archives).
+    """
+    max_size = max_size or Config.MAX_FILE_SIZE
+    writer = _UploadWriter(file.filename, upload_dir, prefix, allowed_extensions or Config.ALLOWED_EXTENSIONS,
+                           max_size)
+    try:
+        if file.size is not None and file.size > max_size:
+            raise HTTPException(status_code=413, detail=_too_large_message(max_size))
+        while True:
+            chunk = await file.read(Config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.finish()
+
+
+async def ingest_uploads(files: List[UploadFile], upload_dir: Optional[str] = None,
+                         prefix: Optional[str] = None) -> List[IngestedUpload]:
+    """Ingest several UploadFiles in order; on failure, removes the ones already stored"""
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await ingest_upload(file, upload_dir, prefix))
+    except BaseException:
+        for upload in uploads:
+            upload.remove()
+        raise
+    return uploads
+
+
+def store_file(fileobj: BinaryIO, filename: str, upload_dir: Optional[str] = None,
+               prefix: Optional[str] = None) -> IngestedUpload:
+    """Blocking counterpart of ingest_upload for file objects already on the server (e.g. zip members)"""
+    writer = _UploadWriter(filename, upload_dir, prefix, Config.ALLOWED_EXTENSIONS, Config.MAX_FILE_SIZE)
+    try:
+        while True:
+            chunk = fileobj.read(Config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.finish()
+
+
+def _too_large_message(max_size: Optional[int] = None) -> str:
+    return f"File too large. Maximum size is {(max_size or Config.MAX_FILE_SIZE) // (1024 * 1024)}MB"
@@ -0,0 +1,275 @@
+"""
+Waveform overviews for ODOREMOVER Audio Suite
+Min/max peak pyramids (audiowaveform .dat) and low-resolution spectrogram tiles, built while an output is written
+"""
+import asyncio
+import json
+import math
+import os
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.fft
+import soundfile as sf
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from shared.config import Config
+from shared.result_cache import artifacts
+from shared.storage import get_storage
+
+SIDECAR_SUFFIX = ".waveform"
+MAGIC = b"ODWF"
+FORMAT_VERSION = 1
+
+# audiowaveform .dat version 2: version, flags (bit 0 = 8-bit), sample rate, samples per pixel, length, channels
+DAT_HEADER = struct.Struct("<iIiiIi")
+DAT_VERSION = 2
+
+# Spectrogram dB range mapped onto 0..255; 0 dB is a full-scale sine in one FFT bin, and bands average their bins
+SPECTROGRAM_FLOOR_DB = -100.0
+SPECTROGRAM_FMIN = 20.0
+
+
+def sidecar_name(name: str) -> str:
+    """Waveform file stored next to an output (its download filename plus SIDECAR_SUFFIX)"""
+    return name + SIDECAR_SUFFIX
+
+
+def dat_bytes(peaks: np.ndarray, samplerate: int, samples_per_pixel: int) -> bytes:
+    """(pixels, channels, 2) int16 min/max peaks as an audiowaveform version 2 .dat file"""
+    header = DAT_HEADER.pack(DAT_VERSION, 0, samplerate, samples_per_pixel, peaks.shape[0], peaks.shape[1])
+    return header + peaks.astype("<i2").tobytes()
+
+
+def _mel_bands(samplerate: int, n_fft: int, bands: int) -> np.ndarray:
+    """(bands, bins) triangular mel filters, each averaging its bins; narrow low bands take their nearest bin"""
+    to_mel = lambda hz: 2595.0 * np.log10(1.0 + hz / 700.0)
+    to_hz = lambda mel: 700.0 * (10 ** (mel / 2595.0) - 1.0)
+    edges = to_hz(np.linspace(to_mel(SPECTROGRAM_FMIN), to_mel(samplerate / 2), bands + 2))
+    freqs = np.arange(n_fft // 2 + 1) * samplerate / n_fft
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    weights = np.maximum(0.0, np.minimum((freqs - lower) / (centre - lower), (upper - freqs) / (upper - centre)))
+    for band in np.flatnonzero(weights.sum(axis=1) == 0):
+        weights[band, np.argmin(np.abs(freqs - edges[band + 1]))] = 1.0
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+class WaveformBuilder:
+    """Accumulates peaks and spectrogram columns from (channels, n) blocks, then writes the sidecar.
+
+    Only the finest peak level and the spectrogram columns are kept while
+    streaming; coarser levels halve the one below when saving. The sidecar
+    starts with MAGIC, the format version and the length of a JSON header
+    giving the byte offset of every level (each a complete .dat file) and of
+    the spectrogram, whose uint8 columns of `bands` values are stored
+    back to back so any run of tiles is one contiguous range.
+    """
+
+    def __init__(self, samplerate: int, channels: int):
+        self.samplerate = int(samplerate)
+        self.channels = channels
+        self.samples_per_pixel = Config.WAVEFORM_SAMPLES_PER_PIXEL
+        self.n_fft = Config.WAVEFORM_SPECTROGRAM_N_FFT
+        self.bands = Config.WAVEFORM_SPECTROGRAM_BANDS
+        self.frames = 0
+        self._peaks = []
+        self._columns = []
+        self._peak_rest = np.zeros((channels, 0), dtype=np.float32)
+        self._fft_rest = np.zeros(0, dtype=np.float32)
+        self._window = np.hanning(self.n_fft + 1)[:-1].astype(np.float32)
+        self._filters = _mel_bands(self.samplerate, self.n_fft, self.bands).astype(np.float32)
+        # A full-scale sine peaks at sum(window) / 2 in its FFT bin
+        self._reference = float(self._window.sum() / 2) ** 2
+
+    def push(self, block: np.ndarray):
+        if not block.shape[1]:
+            return
+        self.frames += block.shape[1]
+        block = block.astype(np.float32, copy=False)
+
+        pending = np.concatenate([self._peak_rest, block], axis=1)
+        complete = pending.shape[1] // self.samples_per_pixel * self.samples_per_pixel
+        if complete:
+            self._peaks.append(self._min_max(pending[:, :complete]))
+        self._peak_rest = pending[:, complete:]
+
+        pending = np.concatenate([self._fft_rest, block.mean(axis=0)])
+        complete = len(pending) // self.n_fft * self.n_fft
+        if complete:
+            self._columns.append(self._spectrum(pending[:complete].reshape(-1, self.n_fft)))
+        self._fft_rest = pending[complete:]
+
+    def _min_max(self, frames: np.ndarray) -> np.ndarray:
+        """(pixels, channels, 2) int16 peaks of whole pixels of frames, or of one final partial pixel"""
+        pixels = frames.reshape(self.channels, -1, min(self.samples_per_pixel, frames.shape[1]))
+        scaled = np.clip(np.stack([pixels.min(axis=2), pixels.max(axis=2)], axis=-1) * 32767, -32768, 32767)
+        return np.round(scaled).astype(np.int16).transpose(1, 0, 2)  # (pixels, channels, 2)
+
+    def _spectrum(self, frames: np.ndarray) -> np.ndarray:
+        power = np.abs(scipy.fft.rfft(frames * self._window, axis=-1)) ** 2
+        with np.errstate(divide="ignore"):
+            db = 10 * np.log10(power @ self._filters.T / self._reference)
+        scaled = (np.clip(db, SPECTROGRAM_FLOOR_DB, 0.0) - SPECTROGRAM_FLOOR_DB) * (255 / -SPECTROGRAM_FLOOR_DB)
+        return np.round(scaled).astype(np.uint8)  # (columns, bands)
+
+    def _finish(self) -> Tuple[list, np.ndarray]:
+        peaks = list(self._peaks)
+        if self._peak_rest.shape[1]:
+            peaks.append(self._min_max(self._peak_rest))
+        columns = list(self._columns)
+        if len(self._fft_rest):
+            columns.append(self._spectrum(np.pad(self._fft_rest, (0, self.n_fft - len(self._fft_rest)))[np.newaxis]))
+        base = np.concatenate(peaks) if peaks else np.zeros((0, self.channels, 2), dtype=np.int16)
+        spectrogram = np.concatenate(columns) if columns else np.zeros((0, self.bands), dtype=np.uint8)
+
+        levels = [(self.samples_per_pixel, base)]
+        while len(levels[-1][1]) > Config.WAVEFORM_MIN_PIXELS:
+            spp, finer = levels[-1]
+            if len(finer) % 2:
+                finer = np.concatenate([finer, finer[-1:]])
+            pairs = finer.reshape(-1, 2, self.channels, 2)
+            coarser = np.stack([pairs[..., 0].min(axis=1), pairs[..., 1].max(axis=1)], axis=-1)
+            levels.append((spp * 2, coarser))
+        return levels, spectrogram
+
+    def save(self, path: str) -> str:
+        """Write the sidecar file, returns path"""
+        levels, spectrogram = self._finish()
+        blobs = [dat_bytes(peaks, self.samplerate, spp) for spp, peaks in levels] + [spectrogram.tobytes()]
+        manifest = {
+            "version": FORMAT_VERSION,
+            "sample_rate": self.samplerate,
+            "channels": self.channels,
+            "frames": self.frames,
+            "duration": round(self.frames / self.samplerate, 6) if self.samplerate else 0.0,
+            "levels": [{"samples_per_pixel": spp, "length": len(peaks)} for spp, peaks in levels],
+            "spectrogram": {
+                "bands": self.bands, "columns": len(spectrogram), "hop": self.n_fft,
+                "fmin": SPECTROGRAM_FMIN, "fmax": self.samplerate / 2, "scale": "mel",
+                "floor_db": SPECTROGRAM_FLOOR_DB, "tile_columns": Config.WAVEFORM_TILE_COLUMNS,
+            },
+        }
+        # Offsets are absolute, so the header length depends on them; settle it by retrying
+        start = 0
+        while True:
+            offset = start
+            for entry, blob in zip(manifest["levels"] + [manifest["spectrogram"]], blobs):
+                entry["offset"], entry["bytes"] = offset, len(blob)
+                offset += len(blob)
+            header = json.dumps(manifest, separators=(",", ":")).encode()
+            if 12 + len(header) == start:
+                break
+            start = 12 + len(header)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as out:
+            out.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header)) + header)
+            for blob in blobs:
+                out.write(blob)
+        return path
+
+
+def build_from_file(path: str, output_path: Optional[str] = None) -> Optional[str]:
+    """Sidecar for an output written without a WaveformBuilder (e.g. by pydub), None if unreadable"""
+    try:
+        info = sf.info(path)
+        builder = WaveformBuilder(info.samplerate, info.channels)
+        for block in sf.blocks(path, blocksize=Config.STREAM_BLOCK_SIZE, dtype="float32", always_2d=True):
+            builder.push(block.T)
+    except (RuntimeError, ValueError, sf.LibsndfileError):
+        return None
+    return builder.save(output_path or path + SIDECAR_SUFFIX)
+
+
+def attach_waveforms(result: dict, local_dir: Optional[str] = None) -> dict:
+    """Link every audio output's sidecar under result["waveforms"], building those no writer made"""
+    local_dir = str(local_dir or Config.PROCESSED_DIR)
+    waveforms = {}
+    for name in artifacts(result):
+        path = os.path.join(local_dir, name)
+        if not Config.is_allowed_file(name) or not os.path.exists(path):
+            continue
+        if os.path.exists(path + SIDECAR_SUFFIX) or build_from_file(path) is not None:
+            waveforms[name] = f"/download/{sidecar_name(name)}"
+    if waveforms:
+        result["waveforms"] = waveforms
+    return result
+
+
+def read_manifest(name: str) -> dict:
+    """JSON header of a stored sidecar, from two small range reads"""
+    storage = get_storage()
+    prefix = storage.read_range(name, 0, 12)
+    if len(prefix) < 12 or prefix[:4] != MAGIC:
+        raise ValueError(f"{name} is not a waveform file")
+    _, length = struct.unpack("<II", prefix[4:])
+    return json.loads(storage.read_range(name, 12, length))
+
+
+def _sidecar_for(filename: str) -> str:
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Waveform not found")
+    return filename if filename.endswith(SIDECAR_SUFFIX) else sidecar_name(filename)
+
+
+async def _manifest(name: str) -> dict:
+    try:
+        return await asyncio.to_thread(read_manifest, name)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Waveform not found")
+
+
+def _binary(data: bytes, headers: dict) -> Response:
+    headers = {key: str(value) for key, value in headers.items()}
+    headers["cache-control"] = f"public, max-age={Config.DOWNLOAD_CACHE_MAX_AGE}"
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+
+async def waveform_info(filename: str) -> dict:
+    """Levels and spectrogram layout of an output's waveform, with the sidecar's download URL"""
+    name = _sidecar_for(filename)
+    manifest = await _manifest(name)
+    return {"success": True, "waveform_file": f"/download/{name}", **manifest}
+
+
+async def waveform_peaks(filename: str, samples_per_pixel: Optional[int] = None,
+                         start: float = 0.0, end: Optional[float] = None) -> Response:
+    """Peaks between start and end seconds as a self-contained .dat file.
+
+    Uses the coarsest level that is at least as detailed as samples_per_pixel
+    (the coarsest overall when unset), reading only the requested pixels.
+    """
+    name = _sidecar_for(filename)
+    manifest = await _manifest(name)
+    levels = manifest["levels"]
+    level = levels[-1]
+    if samples_per_pixel is not None:
+        finer = [entry for entry in levels if entry["samples_per_pixel"] <= samples_per_pixel]
+        level = finer[-1] if finer else levels[0]
+    spp, sr = level["samples_per_pixel"], manifest["sample_rate"]
+    first = min(max(int(start * sr // spp), 0), level["length"])
+    last = level["length"] if end is None else min(max(int(math.ceil(end * sr / spp)), first), level["length"])
+
+    pixel_bytes = manifest["channels"] * 4
+    data = await asyncio.to_thread(get_storage().read_range, name,
+                                   level["offset"] + DAT_HEADER.size + first * pixel_bytes,
+                                   (last - first) * pixel_bytes)
+    header = DAT_HEADER.pack(DAT_VERSION, 0, sr, spp, len(data) // pixel_bytes, manifest["channels"])
+    return _binary(header + data, {"x-waveform-start-pixel": first, "x-waveform-samples-per-pixel": spp})
+
+
+async def spectrogram_tiles(filename: str, tile: int = 0, count: int = 1) -> Response:
+    """count tiles of uint8 spectrogram columns (bands values each, low band first) from tile"""
+    name = _sidecar_for(filename)
+    spectrogram = (await _manifest(name))["spectrogram"]
+    width, bands = spectrogram["tile_columns"], spectrogram["bands"]
+    if tile < 0 or count < 1 or tile * width >= max(spectrogram["columns"], 1):
+        raise HTTPException(status_code=416, detail="Spectrogram tile out of range")
+    first = tile * width
+    last = min(first + count * width, spectrogram["columns"])
+    data = await asyncio.to_thread(get_storage().read_range, name,
+                                   spectrogram["offset"] + first * bands, (last - first) * bands)
+    return _binary(data, {"x-spectrogram-bands": bands, "x-spectrogram-start-column": first,
+                          "x-spectrogram-columns": len(data) // bands, "x-spectrogram-hop": spectrogram["hop"]})
@@ -0,0 +1,31 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Caches, spool files and published results go to a throwaway tree; set before shared.config is imported
+# so spawned workers, which re-import it, see the same BASE_DIR
+BASE_DIR = tempfile.mkdtemp(prefix="odoremover-tests-")
+os.environ["BASE_DIR"] = BASE_DIR
+
+# Tests import shared.* and services.* the way the service mains do; the pipeline's
+# own imports (noise_reduction.processor, ...) need the services directory as the gateway adds it
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', 'services'))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(BASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def worker_pool():
+    """A fresh process-wide executor for run_in_worker, stopped after the test"""
+    from shared import executor
+
+    executor._executor = None
+    yield executor.get_executor()
+    executor.get_executor().shutdown()
+    executor._executor = None
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+
+from shared import analysis
+from shared.analysis import AnalysisIndex, ClipCounter
+from shared.upload import IngestedUpload
+
+SR = 48000
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = AnalysisIndex(str(tmp_path / "analysis.sqlite3"))
+    monkeypatch.setattr(analysis, "_index", index)
+    return index
+
+
+@pytest.fixture
+def measurements(monkeypatch, worker_pool):
+    """Services of every worker call the analysis makes"""
+    calls = []
+    run_in_worker = analysis.run_in_worker
+
+    async def counting(service, fn, *args, **kwargs):
+        calls.append(service)
+        return await run_in_worker(service, fn, *args, **kwargs)
+
+    monkeypatch.setattr(analysis, "run_in_worker", counting)
+    return calls
+
+
+def _upload(tmp_path, name="tone.wav"):
+    """A stereo 1 kHz tone at -20 dBFS with two clipped runs in each channel; the same bytes on every call"""
+    t = np.arange(SR * 2) / SR
+    tone = 0.1 * np.sin(2 * np.pi * 1000 * t)
+    tone[100:103] = 1.0
+    tone[200:204] = -1.0
+    path = str(tmp_path / name)
+    sf.write(path, np.stack([tone, tone], axis=1), SR, subtype="PCM_24")
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, name, os.path.getsize(path), content_hash)
+
+
+def test_analysis_is_measured_once_and_then_served_from_the_index(tmp_path, index, measurements):
+    first = asyncio.run(analysis.analyze(_upload(tmp_path)))
+    again = asyncio.run(analysis.analyze(_upload(tmp_path)))
+
+    assert not first["cached"] and again["cached"]
+    assert again["analysis"] == first["analysis"]
+    assert index.stats() == {"entries": 1, "max_entries": index.max_entries, "hits": 1, "misses": 1}
+    assert measurements == ["analysis"]
+    assert not os.path.exists(tmp_path / "tone.wav")
+
+    measured = first["analysis"]
+    assert measured["format"]["channels"] == 2 and measured["format"]["frames"] == 2 * SR
+    assert measured["loudness"]["integrated_lufs"] == pytest.approx(-20.0, abs=0.2)
+    assert measured["levels"]["sample_peak_dbfs"] == pytest.approx(0.0, abs=0.01)
+    assert measured["clipping"]["clipping_events"] == 4  # per channel
+    assert measured["clipping"]["clipped_samples"] == 14
+    assert measured["waveform"].startswith("/download/upload_")
+
+    by_hash = asyncio.run(analysis.indexed(first["content_hash"].upper()))
+    assert by_hash["analysis"] == measured
+
+
+def test_use_cache_false_measures_again(tmp_path, index, measurements):
+    asyncio.run(analysis.analyze(_upload(tmp_path)))
+
+    result = asyncio.run(analysis.analyze(_upload(tmp_path), use_cache=False))
+
+    assert not result["cached"]
+    assert measurements == ["analysis", "analysis"]
+
+
+def test_header_only_reads_the_container_without_decoding(tmp_path, index, measurements):
+    result = asyncio.run(analysis.analyze(_upload(tmp_path), header_only=True))
+
+    assert result["header_only"]
+    assert result["analysis"]["format"]["subtype"] == "PCM_24"
+    assert "loudness" not in result["analysis"]
+    assert measurements == []
+
+
+def test_unknown_hash_is_a_404(index):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(analysis.indexed("0" * 64))
+
+    assert error.value.status_code == 404
+
+
+def test_clip_runs_are_counted_across_blocks():
+    counter = ClipCounter(1, level=0.99, min_run=3)
+    block = np.array([[0.5, 1.0, 1.0]], dtype=np.float32)
+
+    counter.push(block)
+    counter.push(np.array([[1.0, 0.2, 1.0, 1.0]], dtype=np.float32))
+
+    assert counter.result()["clipped_samples"] == 5
+    assert counter.result()["clipping_events"] == 1
@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from services.audio_reverse.processor import AudioReverseProcessor
+from shared.audio_io import output_subtype, read_audio
+from shared.upload import IngestedUpload
+
+
+def _upload(tmp_path, name, channels=2, subtype=None, format=None, sr=22050):
+    rng = np.random.default_rng(2)
+    path = str(tmp_path / name)
+    sf.write(path, 0.3 * rng.uniform(-1, 1, (sr // 2, channels)), sr, subtype=subtype, format=format)
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, name, os.path.getsize(path), content_hash)
+
+
+@pytest.mark.parametrize("channels", [1, 2, 6])
+def test_read_audio_keeps_every_channel(tmp_path, channels):
+    upload = _upload(tmp_path, f"{channels}ch.wav", channels, "FLOAT")
+
+    y, sr = read_audio(upload)
+
+    assert y.shape == (channels, 11025)
+    assert y.dtype == np.float32
+    np.testing.assert_array_equal(y, sf.read(upload.path, dtype="float32", always_2d=True)[0].T)
+
+
+@pytest.mark.parametrize("name, subtype, format, output_format, expected", [
+    ("a.wav", "PCM_24", None, "wav", "PCM_24"),
+    ("a.wav", "PCM_24", None, "flac", "PCM_24"),
+    ("a.wav", "FLOAT", None, "wav", "FLOAT"),
+    ("a.wav", "FLOAT", None, "flac", "PCM_24"),
+    ("a.wav", "PCM_U8", None, "wav", None),
+    ("a.flac", "PCM_16", None, "wav", "PCM_16"),
+    ("a.wav", "PCM_24", None, "mp3", "MPEG_LAYER_III"),
+    ("a.ogg", "VORBIS", None, "wav", None),
+    ("a.mp3", "MPEG_LAYER_III", "MP3", "wav", None),
+])
+def test_output_subtype_carries_only_uncompressed_sample_formats(tmp_path, name, subtype, format, output_format,
+                                                                  expected):
+    assert output_subtype(_upload(tmp_path, name, 2, subtype, format), output_format) == expected
+
+
+def test_tool_output_keeps_channels_and_bit_depth(tmp_path):
+    upload = _upload(tmp_path, "take.wav", 2, "PCM_24")
+    processor = AudioReverseProcessor()
+    processor.processed_dir = str(tmp_path)
+
+    result = processor._reverse(upload)
+
+    output = os.path.join(tmp_path, os.path.basename(result["download_url"]))
+    info = sf.info(output)
+    assert (info.channels, info.subtype, info.samplerate) == (2, "PCM_24", 22050)
+    source = sf.read(upload.path, dtype="int32")[0]
+    np.testing.assert_array_equal(sf.read(output, dtype="int32")[0], source[::-1])
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import uuid
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+from shared.batch import extract_archive, parse_batch_params, run_batch
+from shared.config import Config
+from shared.storage import get_storage
+from shared.upload import IngestedUpload
+
+
+def _uploads(tmp_path, *names):
+    uploads = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b"RIFF" + name.encode())
+        uploads.append(IngestedUpload(str(path), name, path.stat().st_size, name))
+    return uploads
+
+
+def _tool(processed_dir, running, peak):
+    async def process_file(upload, stems=1, gain=0.0):
+        running.append(upload.filename)
+        peak[0] = max(peak[0], len(running))
+        try:
+            await asyncio.sleep(0.01)
+            if upload.filename.startswith("bad"):
+                raise HTTPException(status_code=400, detail="unreadable")
+            urls = []
+            for stem in range(stems):
+                name = f"stem{stem}_{uuid.uuid4()}.wav"
+                with open(os.path.join(processed_dir, name), "wb") as f:
+                    f.write(f"{upload.filename}:{stem}:{gain}".encode())
+                urls.append(f"/download/{name}")
+            return {"success": True, "output_files": urls, "download_url": urls[0]}
+        finally:
+            running.remove(upload.filename)
+    return process_file
+
+
+def _bundle(result):
+    name = os.path.basename(result["download_url"])
+    with get_storage().open(name) as stream, zipfile.ZipFile(stream) as bundle:
+        return {info.filename: bundle.read(info) for info in bundle.infolist()}
+
+
+def test_batch_zips_outputs_with_a_manifest_of_every_file(tmp_path):
+    processed_dir = str(Config.PROCESSED_DIR)
+    os.makedirs(processed_dir, exist_ok=True)
+    running, peak = [], [0]
+    uploads = _uploads(tmp_path, "one.wav", "bad.wav", "three.mp3", "four.flac")
+    rejected = [{"filename": "notes.txt", "success": False, "status_code": 415, "error": "Unsupported file type"}]
+
+    result = asyncio.run(run_batch("equalizer", uploads, _tool(processed_dir, running, peak), {"gain": 2.0},
+                                   rejected, processed_dir, parallelism=2))
+
+    assert peak[0] == 2
+    assert result["batch_info"] == {"tool": "equalizer", "total": 5, "succeeded": 3, "failed": 2, "parallelism": 2}
+    entries = _bundle(result)
+    assert sorted(entries) == ["001_one.wav", "003_three.wav", "004_four.wav", "manifest.json"]
+    assert entries["003_three.wav"] == b"three.mp3:0:2.0"
+
+    manifest = json.loads(entries["manifest.json"])
+    assert [entry["filename"] for entry in manifest] == ["one.wav", "bad.wav", "three.mp3", "four.flac",
+                                                          "notes.txt"]
+    assert [entry["success"] for entry in manifest] == [True, False, True, True, False]
+    assert manifest[1]["status_code"] == 400
+    assert manifest == result["results"]
+
+
+def test_multi_output_tools_get_a_folder_per_file(tmp_path):
+    processed_dir = str(Config.PROCESSED_DIR)
+    os.makedirs(processed_dir, exist_ok=True)
+
+    result = asyncio.run(run_batch("audio_splitter", _uploads(tmp_path, "a.wav", "b.wav"),
+                                   _tool(processed_dir, [], [0]), {"stems": 2}, None, processed_dir))
+
+    folders = sorted({name.split("/")[0] for name in _bundle(result) if "/" in name})
+    assert folders == ["001_a", "002_b"]
+
+
+def test_batch_with_no_successes_has_no_zip(tmp_path):
+    processed_dir = str(Config.PROCESSED_DIR)
+
+    result = asyncio.run(run_batch("equalizer", _uploads(tmp_path, "bad.wav"), _tool(processed_dir, [], [0]), {},
+                                   None, processed_dir))
+
+    assert not result["success"]
+    assert result["download_url"] is None
+
+
+def test_archive_members_are_stored_or_reported(tmp_path):
+    archive = tmp_path / "takes.zip"
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("takes/one.wav", b"RIFF one")
+        bundle.writestr("takes/.DS_Store", b"junk")
+        bundle.writestr("takes/notes.txt", b"not audio")
+        bundle.writestr("takes/empty.mp3", b"")
+    upload_dir = tmp_path / "uploads"
+
+    uploads, rejected = extract_archive(str(archive), str(upload_dir))
+
+    assert [upload.filename for upload in uploads] == ["one.wav"]
+    assert {entry["filename"]: entry["status_code"] for entry in rejected} == {"takes/notes.txt": 415,
+                                                                            "takes/empty.mp3": 400}
+    assert len(os.listdir(upload_dir)) == 1
+
+
+def test_params_are_checked_against_the_tool_signature():
+    async def process_file(upload, gain=0.0, output_format="wav", use_cache=True):
+        pass
+
+    assert parse_batch_params(process_file, '{"gain": 3, "use_cache": false}') == {"gain": 3}
+    for params in ('{"volume": 11}', "[1]", "{broken"):
+        with pytest.raises(HTTPException) as error:
+            parse_batch_params(process_file, params)
+        assert error.value.status_code == 400
@@ -0,0 +1,80 @@
+import hashlib
+import os
+
+import numpy as np
+import soundfile as sf
+
+from services.cutter_joiner.processor import CutterJoinerProcessor
+from shared.upload import IngestedUpload
+
+
+def _mp3_upload(tmp_path, name="tone.mp3", seconds=2.0, sr=44100):
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * 440 * t)
+    path = str(tmp_path / name)
+    sf.write(path, np.stack([y, y], axis=1), sr, format="MP3", subtype="MPEG_LAYER_III")
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, name, os.path.getsize(path), content_hash)
+
+
+def _processor(tmp_path):
+    processor = CutterJoinerProcessor()
+    processor.processed_dir = str(tmp_path)
+    return processor
+
+
+def test_cut_mp3_to_wav(tmp_path):
+    result = _processor(tmp_path)._cut_range(_mp3_upload(tmp_path), 0.5, 1.5, "wav")
+
+    info = sf.info(os.path.join(tmp_path, os.path.basename(result["output_file"])))
+    assert info.format == "WAV"
+    assert info.subtype == "PCM_16"
+    assert abs(info.duration - 1.0) < 0.01
+
+
+def test_join_mp3_first_to_wav(tmp_path):
+    uploads = [_mp3_upload(tmp_path, "a.mp3"), _mp3_upload(tmp_path, "b.mp3", seconds=1.0)]
+    result = _processor(tmp_path)._join(uploads, 0.0, "wav")
+
+    info = sf.info(os.path.join(tmp_path, os.path.basename(result["output_file"])))
+    assert info.format == "WAV"
+    assert info.subtype == "PCM_16"
+    assert abs(info.duration - 3.0) < 0.1
+
+
+def _wav_upload(tmp_path, name, y, sr, subtype="PCM_24"):
+    path = str(tmp_path / name)
+    sf.write(path, y, sr, subtype=subtype)
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, name, os.path.getsize(path), content_hash)
+
+
+def test_cut_wav_copies_exact_frames(tmp_path):
+    sr = 48000
+    y = np.random.default_rng(3).uniform(-0.5, 0.5, (sr, 2))
+    upload = _wav_upload(tmp_path, "take.wav", y, sr)
+
+    result = _processor(tmp_path)._cut_range(upload, 0.25, 0.5)
+
+    output = os.path.join(tmp_path, os.path.basename(result["output_file"]))
+    assert result["operation_details"]["method"] == "frame_copy"
+    assert sf.info(output).subtype == "PCM_24"
+    source = sf.read(upload.path, dtype="int32")[0]
+    np.testing.assert_array_equal(sf.read(output, dtype="int32")[0], source[12000:24000])
+
+
+def test_join_crossfades_into_the_common_layout(tmp_path):
+    mono = _wav_upload(tmp_path, "a.wav", np.full(22050, 0.25), 22050, "PCM_16")
+    stereo = _wav_upload(tmp_path, "b.wav", np.full((44100, 2), 0.25), 44100, "PCM_16")
+
+    result = _processor(tmp_path)._join([mono, stereo], 0.25, "wav")
+
+    y, sr = sf.read(os.path.join(tmp_path, os.path.basename(result["output_file"])), always_2d=True)
+    assert (sr, y.shape[1]) == (44100, 2)
+    # 1s + 1s with a quarter second overlapped
+    assert abs(y.shape[0] - int(1.75 * 44100)) <= 1
+    # Equal-power crossfade of two equal, fully correlated signals peaks mid-fade at sqrt(2)
+    middle = y[int(0.875 * 44100)]
+    assert np.allclose(middle, 0.25 * np.sqrt(2), atol=0.01)
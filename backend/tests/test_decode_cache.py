@@ -0,0 +1,78 @@
+import os
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+from shared import decode_cache
+from shared.decode_cache import DecodeCache
+
+
+def _wav(tmp_path, name="tone.wav", sr=22050, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    path = str(tmp_path / name)
+    sf.write(path, np.stack([0.5 * np.sin(2 * np.pi * 440 * t), 0.25 * np.sin(2 * np.pi * 660 * t)], axis=1), sr)
+    return path
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    load = librosa.load
+
+    def counting_load(path, **kwargs):
+        calls.append((os.path.basename(path), kwargs))
+        return load(path, **kwargs)
+
+    monkeypatch.setattr(decode_cache.librosa, "load", counting_load)
+    return calls
+
+
+def test_second_load_skips_the_decoder_and_matches_librosa(tmp_path, decodes):
+    path = _wav(tmp_path)
+    cache = DecodeCache(tmp_path / "decoded")
+
+    y, sr = cache.load(path, "hash", mono=True)
+    again, again_sr = cache.load(path, "hash", mono=True)
+
+    assert len(decodes) == 1
+    assert again is y and again_sr == sr == 22050
+    assert y.dtype == np.float32 and not y.flags.writeable
+    np.testing.assert_allclose(y, librosa.load(path, sr=None, mono=True)[0], atol=1e-6)
+
+
+def test_disk_copy_is_shared_with_a_fresh_process_cache(tmp_path, decodes):
+    path = _wav(tmp_path)
+    DecodeCache(tmp_path / "decoded").load(path, "hash", mono=False)
+
+    # Another worker process: empty memory front, same directory
+    y, sr = DecodeCache(tmp_path / "decoded").load(path, "hash", mono=False)
+
+    assert len(decodes) == 1
+    assert isinstance(y, np.memmap)
+    assert y.shape == (2, 22050)
+
+
+def test_rate_and_channel_layout_are_part_of_the_key(tmp_path, decodes):
+    path = _wav(tmp_path)
+    cache = DecodeCache(tmp_path / "decoded")
+
+    assert cache.load(path, "hash", mono=True)[0].shape == (22050,)
+    assert cache.load(path, "hash", mono=False)[0].shape == (2, 22050)
+    assert cache.load(path, "hash", sr=11025, mono=True)[1] == 11025
+
+    assert len(decodes) == 3
+
+
+def test_disk_cache_evicts_least_recently_used_entries(tmp_path, decodes):
+    paths = [_wav(tmp_path, f"tone{index}.wav") for index in range(3)]
+    # Room for two mono one-second entries (22050 float32 samples each, plus the .npy header)
+    cache = DecodeCache(tmp_path / "decoded", max_disk_bytes=2 * 22050 * 4 + 512, max_memory_bytes=0)
+
+    for index, path in enumerate(paths):
+        cache.load(path, f"hash{index}")
+        os.utime(os.path.join(cache.cache_dir, f"hash{index}_native_mono.npy"), (index, index))
+
+    cached = sorted(name for name in os.listdir(cache.cache_dir) if name.endswith(".npy"))
+    assert cached == ["hash1_native_mono.npy", "hash2_native_mono.npy"]
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from shared.downloads import RangeNotSatisfiable, parse_range, serve_download
+
+
+@pytest.mark.parametrize("header, size, expected", [
+    (None, 100, None),
+    ("bytes=0-9", 100, (0, 9)),
+    ("bytes=90-", 100, (90, 99)),
+    ("bytes=90-500", 100, (90, 99)),
+    ("bytes=-10", 100, (90, 99)),
+    ("bytes=-500", 100, (0, 99)),
+    ("bytes=0-1,5-6", 100, None),
+    ("items=0-9", 100, None),
+    ("bytes=-", 100, None),
+])
+def test_parse_range(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=9-5", 100),
+    ("bytes=-0", 100),
+    ("bytes=-10", 0),
+    ("bytes=0-", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = FastAPI()
+
+    @app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+    async def download(request: Request, filename: str):
+        return await serve_download(request, str(tmp_path), filename)
+
+    with open(tmp_path / "data.bin", "wb") as f:
+        f.write(bytes(range(256)) * 4)
+    open(tmp_path / "empty.bin", "wb").close()
+    return TestClient(app)
+
+
+def test_full_download_advertises_ranges_and_an_etag(client):
+    response = client.get("/download/data.bin")
+
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 4
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+
+
+def test_range_request_returns_partial_content(client):
+    response = client.get("/download/data.bin", headers={"Range": "bytes=-4"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1020-1023/1024"
+    assert response.content == bytes([252, 253, 254, 255])
+
+
+def test_unsatisfiable_ranges_return_416(client):
+    beyond = client.get("/download/data.bin", headers={"Range": "bytes=2000-"})
+    assert beyond.status_code == 416
+    assert beyond.headers["content-range"] == "bytes */1024"
+
+    empty = client.get("/download/empty.bin", headers={"Range": "bytes=-10"})
+    assert empty.status_code == 416
+    assert empty.headers["content-range"] == "bytes */0"
+
+
+def test_if_none_match_revalidates_and_if_range_guards_ranges(client):
+    etag = client.get("/download/data.bin").headers["etag"]
+
+    assert client.get("/download/data.bin", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/download/data.bin", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/download/data.bin", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    stale = client.get("/download/data.bin", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert len(stale.content) == 1024
+    fresh = client.get("/download/data.bin", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert fresh.status_code == 206
+    assert fresh.content == bytes(range(10))
+
+
+def test_hidden_and_missing_files_are_not_served(client, tmp_path):
+    # The first download leaves its content-hash sidecar in the hidden variants directory
+    client.get("/download/data.bin")
+    assert os.path.isdir(tmp_path / ".variants")
+
+    assert client.get("/download/.variants").status_code == 404
+    assert client.get("/download/missing.bin").status_code == 404
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from shared.encoder import StreamEncoder
+
+SR = 44100
+
+
+def _tone(seconds=1.0, channels=2):
+    t = np.arange(int(seconds * SR)) / SR
+    y = 0.5 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 5000 * t)
+    return np.tile(y.astype(np.float32), (channels, 1))
+
+
+def _encode(tmp_path, output_format, quality="high", blocks=4):
+    path = str(tmp_path / f"out_{quality}.{output_format}")
+    y = _tone()
+    with StreamEncoder(path, SR, 2, output_format, quality) as encoder:
+        for block in np.array_split(y, blocks, axis=1):
+            encoder.write(block)
+    return path, encoder
+
+
+@pytest.mark.parametrize("output_format, container, subtype, rate", [
+    ("flac", "FLAC", "PCM_16", SR),
+    ("ogg", "OGG", "VORBIS", SR),
+    ("opus", "OGG", "OPUS", 48000),
+    ("mp3", "MP3", "MPEG_LAYER_III", SR),
+])
+def test_encodes_and_reads_back(tmp_path, output_format, container, subtype, rate):
+    path, encoder = _encode(tmp_path, output_format)
+
+    info = sf.info(path)
+    assert (info.format, info.subtype, info.samplerate, info.channels) == (container, subtype, rate, 2)
+    assert info.samplerate == encoder.samplerate
+    assert abs(info.duration - 1.0) < 0.06
+    decoded, _ = sf.read(path, dtype="float32", always_2d=True)
+    middle = decoded[len(decoded) // 4:3 * len(decoded) // 4]
+    assert 0.3 < np.sqrt(np.mean(middle ** 2)) < 0.45
+
+
+@pytest.mark.parametrize("output_format", ["ogg", "opus", "mp3"])
+def test_quality_reaches_the_codec(tmp_path, output_format):
+    high, _ = _encode(tmp_path, output_format, "high")
+    low, _ = _encode(tmp_path, output_format, "low")
+    assert os.path.getsize(high) > os.path.getsize(low)
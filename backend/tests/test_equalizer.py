@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+
+from services.equalizer.processor import EqualizerProcessor
+from shared.filterbank import CrossoverFilterBank, SOSFilter, parametric_sos
+from shared.upload import IngestedUpload
+
+
+def _wav_upload(tmp_path, sr=16000, seconds=0.5):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "noise.wav")
+    sf.write(path, 0.1 * rng.standard_normal((int(sr * seconds), 2)), sr)
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, "noise.wav", os.path.getsize(path), content_hash)
+
+
+def _processor(tmp_path):
+    processor = EqualizerProcessor()
+    processor.processed_dir = str(tmp_path)
+    return processor
+
+
+def test_crossover_bands_sum_to_flat_magnitude():
+    sr = 44100
+    impulse = np.zeros((1, 8192), dtype=np.float32)
+    impulse[0, 0] = 1.0
+    bank = CrossoverFilterBank([200, 2000, 8000], sr, 1)
+
+    # Unity gains over blocks of uneven size, so the carried filter state is exercised too
+    out = np.concatenate([bank.apply_gains(impulse[:, i:i + 1000], [0, 0, 0, 0]) for i in range(0, 8192, 1000)],
+                         axis=1)
+
+    magnitude = np.abs(np.fft.rfft(out[0]))
+    assert np.allclose(magnitude, 1.0, atol=1e-3)
+
+
+def test_parametric_peak_gain_and_shared_design():
+    sr = 48000
+    spec = (("peaking", 1000.0, 6.0, 1.0), ("highpass", 40.0, 0.0, 0.707))
+    sos = parametric_sos(sr, spec)
+    assert parametric_sos(sr, spec) is sos
+    assert not sos.flags.writeable
+
+    t = np.arange(sr) / sr
+    tone = np.sin(2 * np.pi * 1000 * t).astype(np.float32)[None, :]
+    out = SOSFilter(sos, 1)(tone)
+    gain_db = 20 * np.log10(np.sqrt(np.mean(out[0, sr // 2:] ** 2)) / np.sqrt(np.mean(tone[0, sr // 2:] ** 2)))
+    assert abs(gain_db - 6.0) < 0.1
+
+
+def test_crossover_above_nyquist_is_a_client_error(tmp_path, worker_pool):
+    processor = _processor(tmp_path)
+    upload = _wav_upload(tmp_path)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(processor.process_file(upload, crossovers="300,9000", band_gains="0,0,0", use_cache=False))
+    assert error.value.status_code == 400
+    assert "8000" in error.value.detail
+    assert not os.path.exists(upload.path)
+
+
+def test_parametric_band_above_nyquist_is_a_client_error(tmp_path, worker_pool):
+    processor = _processor(tmp_path)
+    upload = _wav_upload(tmp_path)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(processor.process_file(upload, bands='[{"type": "peaking", "freq": 12000, "gain": 3}]',
+                                           use_cache=False))
+    assert error.value.status_code == 400
+
+
+def test_equalizes_in_worker(tmp_path, worker_pool):
+    processor = _processor(tmp_path)
+    upload = _wav_upload(tmp_path)
+
+    result = asyncio.run(processor.process_file(upload, bands='[{"type": "lowpass", "freq": 1000}]',
+                                                use_cache=False))
+
+    assert result["eq_settings"]["filter"] == "biquad_cascade"
+    assert os.path.basename(result["download_url"]).startswith("equalized_")
@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from shared.executor import ProcessingExecutor
+
+
+def _square(x):
+    return x * x
+
+
+def _crash():
+    os._exit(1)
+
+
+def test_runs_in_worker_and_releases_slot():
+    executor = ProcessingExecutor(max_workers=1, max_pending=4)
+
+    async def main():
+        try:
+            return await executor.run("test", _square, 7), executor.stats()
+        finally:
+            executor.shutdown()
+
+    result, stats = asyncio.run(main())
+    assert result == 49
+    assert stats["pending"] == 0
+    assert stats["services"]["test"]["running"] == 0
+
+
+def test_crashed_worker_returns_503_and_pool_recovers():
+    executor = ProcessingExecutor(max_workers=1, max_pending=4)
+
+    async def main():
+        try:
+            with pytest.raises(HTTPException) as crashed:
+                await executor.run("test", _crash)
+            return crashed.value, await executor.run("test", _square, 3), executor.stats()
+        finally:
+            executor.shutdown()
+
+    crashed, result, stats = asyncio.run(main())
+    assert crashed.status_code == 503
+    assert result == 9
+    assert stats["pending"] == 0
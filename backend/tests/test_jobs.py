@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from shared.executor import ProcessingExecutor
+from shared.jobs import CANCELLED, COMPLETED, InMemoryJobStore, JobManager
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+async def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def test_cancelled_running_job_frees_its_worker_slot_once_the_call_returns():
+    executor = ProcessingExecutor(max_workers=1, max_pending=4)
+    cleaned_up = []
+
+    async def main():
+        manager = JobManager(InMemoryJobStore())
+        try:
+            job = manager.submit("test", lambda: executor.run("test", _sleep, 1.0),
+                                 on_finish=lambda: cleaned_up.append(executor.stats()["pending"]))
+            await _wait_for(lambda: executor.stats()["services"].get("test", {}).get("running"))
+
+            assert manager.cancel(job["job_id"])
+            await _wait_for(lambda: manager.get(job["job_id"])["status"] == CANCELLED)
+            # The worker can't be interrupted, so its slot (and the job's cleanup) waits for it
+            held = executor.stats()["pending"]
+            await _wait_for(lambda: executor.stats()["pending"] == 0)
+            await _wait_for(lambda: cleaned_up)
+
+            after = manager.submit("test", lambda: executor.run("test", _sleep, 0.0))
+            await _wait_for(lambda: manager.get(after["job_id"])["status"] == COMPLETED)
+            return held, executor.stats()
+        finally:
+            executor.shutdown()
+
+    held, stats = asyncio.run(main())
+    assert held == 1
+    assert cleaned_up == [0]
+    assert stats["pending"] == 0
+    assert stats["services"]["test"]["running"] == 0
+
+
+def test_cancelled_queued_job_leaves_the_pending_count_at_once():
+    executor = ProcessingExecutor(max_workers=1, max_pending=4)
+
+    async def main():
+        manager = JobManager(InMemoryJobStore())
+        try:
+            running = manager.submit("test", lambda: executor.run("test", _sleep, 0.5))
+            queued = manager.submit("test", lambda: executor.run("test", _sleep, 0.5))
+            await _wait_for(lambda: executor.stats()["pending"] == 2)
+
+            manager.cancel(queued["job_id"])
+            await _wait_for(lambda: manager.get(queued["job_id"])["status"] == CANCELLED)
+            pending = executor.stats()["pending"]
+            await _wait_for(lambda: manager.get(running["job_id"])["status"] == COMPLETED)
+            return pending, executor.stats()["pending"]
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(main()) == (1, 0)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from services.volume_normalizer.processor import VolumeNormalizerProcessor
+from shared.loudness import LoudnessMeter
+
+SR = 48000
+
+
+def _sine(level_dbfs, seconds, freq=1000.0, channels=2):
+    t = np.arange(int(seconds * SR)) / SR
+    tone = (10 ** (level_dbfs / 20) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    return np.repeat(tone[np.newaxis, :], channels, axis=0)
+
+
+def _measure(signal, blocksize=4800):
+    meter = LoudnessMeter(SR, signal.shape[0])
+    for start in range(0, signal.shape[1], blocksize):
+        meter.push(signal[:, start:start + blocksize])
+    return meter.result()
+
+
+# EBU Tech 3341 minimum requirements, cases 1-4 (stereo 1 kHz tones, +/- 0.1 LU)
+@pytest.mark.parametrize("segments, expected", [
+    ([(-23.0, 20.0)], -23.0),
+    ([(-33.0, 20.0)], -33.0),
+    ([(-36.0, 10.0), (-23.0, 60.0), (-36.0, 10.0)], -23.0),
+    ([(-72.0, 10.0), (-36.0, 10.0), (-23.0, 60.0), (-36.0, 10.0), (-72.0, 10.0)], -23.0),
+])
+def test_integrated_loudness_matches_tech_3341(segments, expected):
+    signal = np.concatenate([_sine(level, seconds) for level, seconds in segments], axis=1)
+
+    assert _measure(signal)["integrated_lufs"] == pytest.approx(expected, abs=0.1)
+
+
+def test_meter_result_does_not_depend_on_block_size():
+    signal = _sine(-20.0, 5.0, freq=440.0)
+
+    assert _measure(signal, 777)["integrated_lufs"] == pytest.approx(_measure(signal, 48000)["integrated_lufs"],
+                                                                     abs=1e-6)
+
+
+def test_true_peak_catches_intersample_peaks():
+    # A quarter-rate sine sampled at +/-45 degrees never hits its true peak on a sample
+    t = np.arange(SR)
+    signal = (0.5 * np.sin(np.pi / 2 * t + np.pi / 4)).astype(np.float32)[np.newaxis, :]
+
+    result = _measure(signal)
+    assert result["sample_peak_dbfs"] == pytest.approx(20 * np.log10(0.5 / np.sqrt(2)), abs=0.01)
+    assert result["true_peak_dbtp"] == pytest.approx(20 * np.log10(0.5), abs=0.3)
+
+
+def test_normalize_reaches_target_under_the_ceiling():
+    y, stats = VolumeNormalizerProcessor().normalize_volume(_sine(-30.0, 5.0), SR, target_level=-14.0,
+                                                           true_peak=-1.0)
+
+    assert stats["gain_applied_db"] == pytest.approx(-14.0 - stats["input_integrated_lufs"], abs=0.01)
+    assert stats["output_integrated_lufs"] == pytest.approx(-14.0, abs=0.1)
+    assert np.max(np.abs(y)) <= 10 ** (-1.0 / 20)
+
+
+def test_without_normalize_only_gain_db_is_applied():
+    processor = VolumeNormalizerProcessor()
+    quiet = _sine(-30.0, 2.0)
+
+    unchanged, stats = processor.normalize_volume(quiet, SR, normalize=False)
+    assert stats["gain_applied_db"] == 0.0
+    assert not stats["limiter_applied"]
+    np.testing.assert_allclose(unchanged, quiet)
+
+    boosted, stats = processor.normalize_volume(quiet, SR, target_level=-14.0, normalize=False, gain_db=6.0)
+    assert stats["gain_applied_db"] == 6.0
+    np.testing.assert_allclose(boosted, quiet * 10 ** (6 / 20), rtol=1e-5)
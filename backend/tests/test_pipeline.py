@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+
+from pipeline.processor import PipelineProcessor
+from shared import audio_io
+from shared.upload import IngestedUpload
+
+STEPS = [
+    {"tool": "equalizer", "params": {"low_gain": 3.0, "high_gain": -3.0}},
+    {"tool": "volume-normalizer", "params": {"target_level": -20.0}},
+    {"tool": "fade_effect", "params": {"fade_in_duration": 0.1, "fade_out_duration": 0.1}},
+]
+
+
+def _upload(tmp_path, sr=22050, seconds=1.0):
+    rng = np.random.default_rng(1)
+    path = str(tmp_path / "take.wav")
+    sf.write(path, 0.2 * rng.standard_normal((int(sr * seconds), 2)), sr, subtype="PCM_24")
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return IngestedUpload(path, "take.wav", os.path.getsize(path), content_hash)
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = PipelineProcessor()
+    processor.processed_dir = str(tmp_path)
+    return processor
+
+
+def test_steps_run_on_one_decode_and_match_the_tools_chained(tmp_path, processor, monkeypatch):
+    upload = _upload(tmp_path)
+    decodes = []
+    load_audio = audio_io.load_audio
+    monkeypatch.setattr(audio_io, "load_audio", lambda *args, **kwargs: decodes.append(1) or load_audio(*args,
+                                                                                                          **kwargs))
+    steps = processor.parse_steps(STEPS)
+
+    result = processor._run_pipeline(upload, steps)
+
+    assert len(decodes) == 1
+    assert [step["tool"] for step in result["pipeline"]["steps"]] == ["equalizer", "volume_normalizer",
+                                                                     "fade_effect"]
+    output = os.path.join(tmp_path, os.path.basename(result["download_url"]))
+    info = sf.info(output)
+    assert (info.channels, info.subtype) == (2, "PCM_24")
+
+    y = sf.read(upload.path, dtype="float32", always_2d=True)[0].T
+    expected = processor.equalizer_processor.equalize(y, 22050, low_gain=3.0, high_gain=-3.0)
+    expected, _ = processor.volume_processor.normalize_volume(expected, 22050, target_level=-20.0)
+    expected = processor.fade_processor.apply_fades(expected, 22050, 0.1, 0.1)
+    np.testing.assert_allclose(sf.read(output, always_2d=True)[0].T, expected, atol=1e-5)
+
+
+def test_converter_step_picks_the_single_encode(tmp_path, processor):
+    steps = processor.parse_steps(STEPS[:1] + [{"tool": "converter", "params": {"output_format": "flac"}}])
+
+    result = processor._run_pipeline(_upload(tmp_path), steps)
+
+    assert result["pipeline"]["output_format"] == "flac"
+    assert sf.info(os.path.join(tmp_path, os.path.basename(result["download_url"]))).format == "FLAC"
+
+
+@pytest.mark.parametrize("steps", [
+    "not json",
+    [],
+    [{"params": {}}],
+    [{"tool": "time_machine"}],
+    [{"tool": "equalizer", "params": {"volume": 11}}],
+    [{"tool": "equalizer", "params": ["low_gain"]}],
+    [{"tool": "converter", "params": {"output_format": "mp3"}}, {"tool": "fade_effect"}],
+])
+def test_invalid_steps_are_rejected_up_front(processor, steps):
+    with pytest.raises(HTTPException) as error:
+        processor.parse_steps(steps)
+
+    assert error.value.status_code == 400
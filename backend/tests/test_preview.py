@@ -0,0 +1,117 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+
+from shared.preview import SESSION_OUTPUTS, PreviewManager, PreviewSession
+from shared.registry import ProcessorRegistry
+from shared.storage import get_storage
+from shared.upload import IngestedUpload
+
+SR = 48000
+PARAMS = '{"fade_in_duration": 0.5, "fade_out_duration": 0.5}'
+
+
+def _upload(tmp_path, seconds=10):
+    path = str(tmp_path / "take.wav")
+    t = np.arange(SR * seconds) / SR
+    sf.write(path, np.stack([0.5 * np.sin(2 * np.pi * 440 * t)] * 2, axis=1), SR, subtype="PCM_16")
+    return IngestedUpload(path, "take.wav", os.path.getsize(path), "hash")
+
+
+@pytest.fixture
+def previews(tmp_path, worker_pool):
+    return PreviewManager(tmp_path / "processed"), ProcessorRegistry().get("fade-effect")
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    decode = PreviewSession._decode
+
+    def counting(session, start, duration):
+        calls.append((start, duration))
+        return decode(session, start, duration)
+
+    monkeypatch.setattr(PreviewSession, "_decode", counting)
+    return calls
+
+
+def test_session_renders_reuse_the_decoded_excerpt(tmp_path, previews, decodes):
+    manager, processor = previews
+    upload = _upload(tmp_path)
+
+    async def main():
+        first = await manager.preview("fade-effect", processor, PARAMS, upload, offset=9.5, duration=2.0,
+                                      output_format="wav")
+        second = await manager.preview("fade-effect", processor, '{"fade_in_duration": 1.0}',
+                                       session_id=first["session_id"], offset=9.5, duration=2.0, output_format="wav")
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    # Centred on 9.5 s but kept inside the 10 s file
+    assert first["preview"]["start"] == 8.0 and first["preview"]["duration"] == 2.0
+    assert first["preview"]["source_duration"] == pytest.approx(10.0)
+    assert decodes == [(8.0, 2.0)]
+    assert second["session_id"] == first["session_id"]
+
+    with get_storage().open(os.path.basename(second["download_url"])) as stream:
+        rendered, sr = sf.read(stream)
+    assert sr == SR and rendered.shape == (2 * SR, 2)
+    assert rendered[0, 0] == 0.0
+    assert not first["preview"]["proxy"] and first["preview"]["adjusted"] == []
+
+
+def test_slow_tools_are_rendered_at_the_proxy_rate_and_shortened(tmp_path, previews):
+    manager, processor = previews
+    # As if earlier renders had measured 10 us per sample: 15 s of stereo 48 kHz would take 14.4 s,
+    # at 22.05 kHz 6.6 s, so the excerpt is also cut to what fits the 1.5 s budget
+    manager._cost["fade-effect"] = 1e-5
+
+    result = asyncio.run(manager.preview("fade-effect", processor, PARAMS, _upload(tmp_path), output_format="wav"))
+
+    assert result["preview"]["adjusted"] == ["sample_rate", "duration"]
+    assert result["preview"]["sample_rate"] == 22050 and result["preview"]["proxy"]
+    assert result["preview"]["duration"] == pytest.approx(1.5 / (22050 * 2 * 1e-5), abs=1e-3)
+
+
+def test_a_session_keeps_only_its_latest_outputs(tmp_path, previews):
+    manager, processor = previews
+
+    async def main():
+        first = await manager.preview("fade-effect", processor, PARAMS, _upload(tmp_path), duration=1.0,
+                                      output_format="wav")
+        results = [first]
+        for _ in range(SESSION_OUTPUTS):
+            results.append(await manager.preview("fade-effect", processor, PARAMS, session_id=first["session_id"],
+                                                 duration=1.0, output_format="wav"))
+        return results
+
+    results = asyncio.run(main())
+
+    names = [os.path.basename(result["download_url"]) for result in results]
+    assert [get_storage().exists(name) for name in names] == [False] + [True] * SESSION_OUTPUTS
+
+    asyncio.run(manager.close(results[0]["session_id"]))
+    assert not any(get_storage().exists(name) for name in names)
+    assert not os.path.exists(tmp_path / "take.wav")
+
+
+@pytest.mark.parametrize("tool, params, duration", [
+    ("vocal-remover", PARAMS, None),
+    ("fade-effect", '{"volume": 3}', None),
+    ("fade-effect", PARAMS, 120.0),
+])
+def test_invalid_requests_are_rejected_and_the_upload_removed(tmp_path, previews, tool, params, duration):
+    manager, processor = previews
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(manager.preview(tool, processor, params, _upload(tmp_path), duration=duration))
+
+    assert error.value.status_code == 400
+    assert not os.path.exists(tmp_path / "take.wav")
+    assert manager.sessions == {}
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from shared.realtime import serve_realtime
+from shared.registry import ProcessorRegistry
+
+SR = 16000
+
+
+@pytest.fixture
+def client():
+    processors = ProcessorRegistry()
+    app = FastAPI()
+
+    @app.websocket("/ws/realtime")
+    async def realtime(websocket: WebSocket):
+        await serve_realtime(websocket, processors.load)
+
+    return TestClient(app)
+
+
+def _session(websocket, blocks, dtype):
+    """Send blocks, return (output samples, block reports, end summary)"""
+    out, reports = [], []
+    for block in blocks:
+        websocket.send_bytes(block.astype(dtype).tobytes())
+        out.append(np.frombuffer(websocket.receive_bytes(), dtype=dtype))
+        reports.append(websocket.receive_json())
+    websocket.send_json({"type": "end"})
+    message = websocket.receive()
+    if message.get("bytes") is not None:
+        out.append(np.frombuffer(message["bytes"], dtype=dtype))
+        message = {"text": websocket.receive_text()}
+    return np.concatenate(out), reports, json.loads(message["text"])
+
+
+def test_fade_blocks_round_trip_with_the_ramp_carried_across_blocks(client):
+    blocks = [np.full(400 * 2, 0.5, dtype=np.float32) for _ in range(5)]  # interleaved stereo
+
+    with client.websocket_connect("/ws/realtime") as websocket:
+        websocket.send_json({"sample_rate": SR, "channels": 2, "format": "f32le",
+                             "steps": [{"tool": "fade-effect", "params": {"fade_in_duration": 0.1}}]})
+        ready = websocket.receive_json()
+        out, reports, summary = _session(websocket, blocks, "<f4")
+
+    assert ready["type"] == "ready" and ready["latency_frames"] == 0
+    assert [report["frames"] for report in reports] == [400] * 5
+    assert summary["blocks"] == 5 and summary["flushed_frames"] == 0
+    left = out.reshape(-1, 2)[:, 0]
+    np.testing.assert_allclose(left[:1600], 0.5 * np.linspace(0, 1, 1600), atol=1e-6)
+    np.testing.assert_allclose(left[1600:], 0.5)
+
+
+def test_volume_gain_is_delayed_by_the_limiter_and_flushed_at_the_end(client):
+    tone = (0.25 * 32767 * np.sin(2 * np.pi * 440 * np.arange(4000) / SR)).astype(np.int16)
+
+    with client.websocket_connect("/ws/realtime") as websocket:
+        websocket.send_json({"sample_rate": SR, "channels": 1, "format": "s16le",
+                             "steps": [{"tool": "volume-normalizer",
+                                        "params": {"normalize": False, "gain_db": -6.0}}]})
+        latency = websocket.receive_json()["latency_frames"]
+        out, reports, summary = _session(websocket, np.split(tone, 4), "<i2")
+
+    assert latency > 0
+    assert len(out) == len(tone)
+    assert sum(report["output_frames"] for report in reports) + summary["flushed_frames"] == len(tone)
+    np.testing.assert_allclose(out / 32767, 10 ** (-6 / 20) * tone / 32767, atol=2e-3)
+
+
+def test_invalid_config_is_reported_and_closed(client):
+    with client.websocket_connect("/ws/realtime") as websocket:
+        websocket.send_json({"sample_rate": SR, "channels": 1, "steps": [{"tool": "vocal-remover"}]})
+        error = websocket.receive_json()
+
+    assert error["type"] == "error"
+    assert "vocal-remover" in error["detail"]
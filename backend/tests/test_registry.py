@@ -0,0 +1,46 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from shared.registry import PROCESSOR_SPECS, ProcessorRegistry
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_gateway_import_leaves_the_dsp_stack_unloaded(tmp_path):
+    script = (
+        "import sys; import api_gateway.main as gateway; "
+        "print(sorted(m for m in ('librosa', 'scipy', 'numba', 'pydub') if m in sys.modules)); "
+        "print(gateway.processors.stats()['loaded'])"
+    )
+    output = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": os.path.abspath(BACKEND_DIR)}, check=True).stdout
+
+    assert output.split("\n")[:2] == ["[]", "[]"]
+
+
+def test_processors_are_constructed_once_on_first_use():
+    registry = ProcessorRegistry({"audio-reverse": PROCESSOR_SPECS["audio-reverse"],
+                                  "equalizer": PROCESSOR_SPECS["equalizer"]})
+    assert "equalizer" in registry and "converter" not in registry
+
+    async def main():
+        return await asyncio.gather(registry.load("audio-reverse"), registry.load("audio-reverse"))
+
+    first, second = asyncio.run(main())
+
+    assert first is second is registry.get("audio-reverse")
+    assert type(first).__name__ == "AudioReverseProcessor"
+    stats = registry.stats()
+    assert stats["registered"] == 2
+    assert stats["loaded"] == ["audio-reverse"]
+    assert set(stats["load_seconds"]) == {"audio-reverse"}
+
+
+def test_every_registered_processor_resolves():
+    registry = ProcessorRegistry()
+
+    registry.load_all()
+
+    assert registry.stats()["loaded"] == sorted(PROCESSOR_SPECS)
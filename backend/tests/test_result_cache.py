@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from shared import result_cache
+from shared.result_cache import ResultCache, artifacts, cached_result
+from shared.storage import LocalStorage
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResultCache(storage=LocalStorage(tmp_path / "processed"), index_path=str(tmp_path / "results.sqlite3"),
+                        max_bytes=10_000, max_age=3600)
+    monkeypatch.setattr(result_cache, "_cache", cache)
+    return cache
+
+
+def _compute(cache, calls, name="out.wav", size=100):
+    async def compute():
+        calls.append(name)
+        with open(os.path.join(cache.storage.root, name), "wb") as f:
+            f.write(b"x" * size)
+        return {"success": True, "download_url": f"/download/{name}", "output_file": f"/download/{name}"}
+    return compute
+
+
+def _cached(cache, calls, params, name="out.wav", content_hash="abc", version="1", use_cache=True):
+    return asyncio.run(cached_result("equalizer", version, content_hash, params, _compute(cache, calls, name),
+                                     use_cache))
+
+
+def test_identical_request_is_served_from_the_cache(cache):
+    calls = []
+    first = _cached(cache, calls, {"low_gain": 0.1, "output_format": "wav"})
+    # Same values as the form may send them
+    second = _cached(cache, calls, {"output_format": " wav", "low_gain": 0.1000000001})
+
+    assert calls == ["out.wav"]
+    assert second == first
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.parametrize("change", [
+    {"params": {"low_gain": 3.0}},
+    {"content_hash": "def"},
+    {"version": "2"},
+    {"use_cache": False},
+])
+def test_other_inputs_parameters_or_versions_miss(cache, change):
+    calls = []
+    _cached(cache, calls, {"low_gain": 0.0})
+    _cached(cache, calls, **{"params": {"low_gain": 0.0}, **change}, name="second.wav")
+
+    assert calls == ["out.wav", "second.wav"]
+
+
+def test_entry_whose_artifact_is_gone_is_recomputed(cache):
+    calls = []
+    _cached(cache, calls, {})
+    os.remove(os.path.join(cache.storage.root, "out.wav"))
+
+    _cached(cache, calls, {})
+
+    assert calls == ["out.wav", "out.wav"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_results_are_evicted_over_budget(cache):
+    calls = []
+    for index in range(3):
+        _cached(cache, calls, {"index": index}, name=f"out{index}.wav")
+    # Touch the oldest so the middle one is least recently used
+    time.sleep(0.01)
+    _cached(cache, calls, {"index": 0}, name="out0.wav")
+
+    # 50 bytes over budget: only the least recently used result has to go
+    asyncio.run(cached_result("equalizer", "1", "abc", {"index": 3}, _compute(cache, calls, "big.wav", 9_750)))
+
+    storage = cache.storage
+    assert not storage.exists("out1.wav")
+    assert all(storage.exists(name) for name in ("out0.wav", "out2.wav", "big.wav"))
+    assert cache.stats()["size_bytes"] <= 10_000
+
+
+def test_artifacts_finds_every_download_link():
+    payload = {"download_url": "/download/a.wav", "stems": ["/download/b.wav", {"url": "/download/a.wav"}],
+               "note": "not a /download/ link", "count": 2}
+
+    assert artifacts(payload) == ["a.wav", "b.wav"]
@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from shared.service_proxy import ServiceProxy
+
+
+class _Body(httpx.AsyncByteStream):
+    """An unread response body, as a real connection would hand it over"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
+
+def _response(status_code, payload=None, content=None, content_type="application/json"):
+    data = content if content is not None else json.dumps(payload).encode()
+    return httpx.Response(status_code, headers={"content-type": content_type}, stream=_Body(data))
+
+
+class Instances(httpx.AsyncBaseTransport):
+    """Stand-in service instances behind one transport, keyed by host.
+
+    Unlike httpx.MockTransport this doesn't read the request body before a
+    connection would be made, so an unreachable host fails the way a refused
+    connect does.
+    """
+
+    def __init__(self, *down):
+        self.down = set(down)
+        self.requests = []
+        self.jobs = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        body = await request.aread()
+        self.requests.append((host, request.method, request.url.path, request.headers, body))
+        if request.url.path == "/health":
+            return _response(200, {"status": "healthy"})
+        if request.url.path == "/process":
+            if request.url.params.get("run_async") == "true":
+                job_id = f"job-on-{host}"
+                self.jobs[job_id] = host
+                return _response(202, {"job_id": job_id})
+            return _response(200, {"instance": host, "bytes": len(body)})
+        if request.url.path.startswith("/jobs/"):
+            job_id = request.url.path.rsplit("/", 1)[1]
+            if self.jobs.get(job_id) != host:
+                return _response(404, {"detail": "Job not found"})
+            return _response(200, {"job_id": job_id, "status": "completed"})
+        if request.url.path == "/download/stem.wav" and host == "b":
+            return _response(200, content=b"RIFF from b", content_type="audio/x-wav")
+        return _response(404, {"detail": "File not found"})
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setenv("EQUALIZER_URLS", "http://a:8010, http://b:8010/")
+
+    def make(instances):
+        proxy = ServiceProxy(["equalizer", "converter"])
+        proxy._client = httpx.AsyncClient(transport=instances)
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def forward(request: Request, call_next):
+            route = proxy.route_for(request)
+            if route is not None:
+                return await proxy.forward(request, route)
+            return await call_next(request)
+
+        @app.get("/jobs/{job_id}")
+        async def job(request: Request, job_id: str):
+            return await proxy.forward_job(request, job_id)
+
+        @app.get("/download/{filename}")
+        async def download(request: Request, filename: str):
+            forwarded = await proxy.forward_download(request, filename)
+            return forwarded if forwarded is not None else {"local": filename}
+
+        @app.post("/converter")
+        async def converter():
+            return {"instance": "gateway"}
+
+        return proxy, TestClient(app)
+    return make
+
+
+def test_only_services_with_instances_are_forwarded(gateway):
+    proxy, client = gateway(Instances())
+
+    assert list(proxy.pools) == ["equalizer"]
+    assert proxy.pools["equalizer"].urls == ["http://a:8010", "http://b:8010"]
+    assert client.post("/converter").json() == {"instance": "gateway"}
+
+
+def test_requests_stream_to_instances_round_robin(gateway):
+    instances = Instances()
+    proxy, client = gateway(instances)
+    body = b"x" * 300_000
+
+    picked = [client.post("/equalizer", files={"file": ("a.wav", body)}).json() for _ in range(3)]
+
+    assert [response["instance"] for response in picked] == ["a", "b", "a"]
+    assert all(response["bytes"] > len(body) for response in picked)
+    forwarded_headers = instances.requests[0][3]
+    assert forwarded_headers["content-type"].startswith("multipart/form-data")
+    assert forwarded_headers["host"] == "a:8010"
+
+
+def test_unreachable_instance_is_skipped_and_marked(gateway):
+    proxy, client = gateway(Instances("a"))
+
+    responses = [client.post("/equalizer", content=b"data").json() for _ in range(2)]
+
+    assert [response["instance"] for response in responses] == ["b", "b"]
+    assert proxy.stats()["equalizer"]["healthy"] == ["http://b:8010"]
+
+
+def test_no_healthy_instance_is_a_503(gateway):
+    proxy, client = gateway(Instances("a", "b"))
+
+    response = client.post("/equalizer", content=b"data")
+
+    assert response.status_code == 503
+
+
+def test_jobs_and_downloads_are_routed_to_the_owning_instance(gateway):
+    instances = Instances()
+    proxy, client = gateway(instances)
+    client.post("/equalizer", content=b"data")  # a
+    accepted = client.post("/equalizer?run_async=true", content=b"data")  # b
+
+    assert accepted.status_code == 202
+    job_id = accepted.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json() == {"job_id": "job-on-b", "status": "completed"}
+    assert [request[0] for request in instances.requests if request[2].startswith("/jobs/")] == ["b"]
+
+    # A fresh gateway doesn't know the job and asks every instance
+    proxy._jobs.clear()
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "completed"
+
+    download = client.get("/download/stem.wav")
+    assert download.content == b"RIFF from b"
+    assert client.get("/download/missing.wav").json() == {"local": "missing.wav"}
+
+
+def test_health_checks_update_the_pool(gateway):
+    instances = Instances("b")
+    proxy, client = gateway(instances)
+
+    asyncio.run(proxy.check_health())
+    assert proxy.stats()["equalizer"]["healthy"] == ["http://a:8010"]
+
+    instances.down.clear()
+    asyncio.run(proxy.check_health())
+    assert proxy.stats()["equalizer"]["healthy"] == ["http://a:8010", "http://b:8010"]
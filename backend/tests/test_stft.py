@@ -0,0 +1,103 @@
+import librosa
+import numpy as np
+import pytest
+
+from services.noise_reduction.processor import NoiseReductionProcessor
+from services.vocal_remover.processor import VocalRemoverProcessor
+from shared.audio_stream import ArraySource, collect
+from shared.config import Config
+from shared.stft import OverlapAdd, StreamingSTFT
+
+SR = 22050
+TOLERANCE = 1e-4
+
+
+def _signal(channels=1, seconds=1.3, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    tone = 0.4 * np.sin(2 * np.pi * 330 * t)
+    return (tone + 0.05 * rng.standard_normal((channels, t.size))).astype(np.float32)
+
+
+def _split(y, sizes):
+    """Blocks of the given sizes (cycled), so boundaries fall mid-frame and some blocks are shorter than a hop"""
+    blocks, start, index = [], 0, 0
+    while start < y.shape[1]:
+        size = sizes[index % len(sizes)]
+        blocks.append(y[:, start:start + size])
+        start += size
+        index += 1
+    return blocks
+
+
+BLOCK_SIZES = [3001, 17, 512, 1, 4096, 777]
+
+
+def test_spectra_match_librosa_stft():
+    y = _signal(2)
+    engine = StreamingSTFT(1024, 256)
+    streamed = np.concatenate(list(engine.spectra(_split(y, BLOCK_SIZES))), axis=-1)
+    whole = librosa.stft(y, n_fft=1024, hop_length=256, center=True, pad_mode="constant")
+    assert streamed.shape == whole.shape
+    assert np.abs(streamed - whole).max() < TOLERANCE * np.abs(whole).max()
+
+
+def test_process_matches_whole_signal_istft():
+    y = _signal(2)
+    engine = StreamingSTFT(1024, 256)
+    mask = (engine.frequencies(SR) < 2000).astype(np.float32)[:, np.newaxis]
+
+    streamed = collect(engine.process(_split(y, BLOCK_SIZES), lambda spectrum: spectrum * mask))
+    spectrum = librosa.stft(y, n_fft=1024, hop_length=256, center=True, pad_mode="constant")
+    whole = librosa.istft(spectrum * mask, hop_length=256, n_fft=1024, length=y.shape[1])
+    assert streamed.shape == y.shape
+    assert np.abs(streamed - whole).max() < TOLERANCE
+
+
+def test_push_and_flush_match_process():
+    y = _signal(1, seconds=0.7)
+    engine = StreamingSTFT(1024, 256)
+    expected = collect(engine.process([y], lambda spectrum: spectrum))
+
+    stream = OverlapAdd(engine, lambda spectrum: spectrum)
+    pushed = [stream.push(block) for block in _split(y, BLOCK_SIZES)]
+    assert sum(block.shape[1] for block in pushed) <= y.shape[1] - (stream.latency - engine.hop_length)
+    tail = stream.flush()
+    assert tail.shape[1] > 0
+    streamed = np.concatenate(pushed + [tail], axis=1)
+    assert streamed.shape == y.shape
+    assert np.abs(streamed - expected).max() < TOLERANCE
+    assert np.abs(streamed - y).max() < TOLERANCE
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_BLOCK_SIZE", 3001)
+
+
+def test_noise_reduction_stream_matches_whole_signal(small_blocks):
+    y = _signal(1, seconds=2.0)
+    streamed = collect(NoiseReductionProcessor().reduce_noise_stream(ArraySource(y, SR), 0.8, True))
+
+    # Whole-signal spectral subtraction as it was before streaming
+    spectrum = librosa.stft(y[0], n_fft=Config.STFT_N_FFT, hop_length=Config.STFT_HOP_LENGTH, pad_mode="constant")
+    magnitude = np.abs(spectrum)
+    profile = np.mean(magnitude[:, :int(spectrum.shape[1] * 0.1)], axis=1, keepdims=True)
+    cleaned = np.maximum(magnitude - 1.8 * profile, 0.1 * magnitude)
+    whole = librosa.istft(cleaned * np.exp(1j * np.angle(spectrum)), hop_length=Config.STFT_HOP_LENGTH,
+                          length=y.shape[1])
+    assert streamed.shape == y.shape
+    assert np.abs(streamed[0] - whole).max() < TOLERANCE
+
+
+def test_vocal_remover_stream_matches_whole_signal(small_blocks):
+    y = _signal(2, seconds=2.0, seed=1)
+    streamed = collect(VocalRemoverProcessor().remove_vocals_stream(ArraySource(y, SR)))
+
+    spectrum = librosa.stft(y[0], n_fft=Config.STFT_N_FFT, hop_length=Config.STFT_HOP_LENGTH, pad_mode="constant")
+    freqs = librosa.fft_frequencies(sr=SR, n_fft=Config.STFT_N_FFT)
+    spectrum[np.argmax(freqs >= 80):np.argmax(freqs >= 8000)] *= 0.3
+    spectral = librosa.istft(spectrum, hop_length=Config.STFT_HOP_LENGTH, length=y.shape[1])
+    whole = 0.6 * (y[0] - y[1]) + 0.4 * spectral
+    assert streamed.shape == (1, y.shape[1])
+    assert np.abs(streamed[0] - whole).max() < TOLERANCE
@@ -0,0 +1,71 @@
+import mimetypes
+import os
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import boto3
+
+from shared.config import Config
+from shared.storage import S3Storage
+
+BUCKET = "odoremover-results"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SECURITY_TOKEN", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    # Small parts, so a test-sized file already takes the multipart path (S3's minimum part is 5MB)
+    monkeypatch.setattr(Config, "S3_MULTIPART_THRESHOLD", 5 * 1024 * 1024)
+    monkeypatch.setattr(Config, "S3_MULTIPART_CHUNK_SIZE", 5 * 1024 * 1024)
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield S3Storage(bucket=BUCKET, prefix="results/", region="us-east-1")
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_publish_moves_outputs_into_the_bucket(tmp_path, s3):
+    small = b"RIFF" + bytes(range(256)) * 4
+    large = os.urandom(11 * 1024 * 1024)
+    _write(tmp_path / "small.wav", small)
+    _write(tmp_path / "large.flac", large)
+
+    s3.publish(["small.wav", "large.flac", "never_written.wav"], tmp_path)
+
+    assert not os.listdir(tmp_path)
+    assert s3.exists("small.wav") and s3.exists("large.flac")
+    assert not s3.exists("never_written.wav")
+    assert s3.size("large.flac") == len(large)
+    client = boto3.client("s3", region_name="us-east-1")
+    assert client.head_object(Bucket=BUCKET, Key="results/small.wav")["ContentType"] == mimetypes.guess_type("small.wav")[0]
+    # A multipart upload's ETag ends in its part count
+    assert client.head_object(Bucket=BUCKET, Key="results/large.flac")["ETag"].endswith('-3"')
+
+    with s3.open("large.flac") as stream:
+        assert stream.read() == large
+    assert s3.read_range("small.wav", 4, 3) == bytes([0, 1, 2])
+    with pytest.raises(FileNotFoundError):
+        s3.read_range("never_written.wav", 0, 10)
+
+    s3.delete("small.wav")
+    assert not s3.exists("small.wav")
+
+
+def test_download_url_is_presigned_for_the_prefixed_key(tmp_path, s3):
+    _write(tmp_path / "out.mp3", b"ID3")
+    s3.publish(["out.mp3"], tmp_path)
+
+    url = urlparse(s3.download_url("out.mp3"))
+    query = parse_qs(url.query)
+
+    assert url.path.endswith(f"{BUCKET}/results/out.mp3") or url.path == "/results/out.mp3"
+    assert query["X-Amz-Expires"] == [str(Config.S3_PRESIGN_EXPIRY)]
+    assert "X-Amz-Signature" in query
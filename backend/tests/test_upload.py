@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from shared.config import Config
+from shared.upload import ingest_upload, ingest_uploads
+
+
+def _file(data, filename="take.wav", size=None):
+    return UploadFile(io.BytesIO(data), filename=filename, size=size)
+
+
+def _ingest(file, upload_dir, **kwargs):
+    return asyncio.run(ingest_upload(file, str(upload_dir), **kwargs))
+
+
+def test_upload_is_streamed_to_disk_in_chunks_and_hashed(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_CHUNK_SIZE", 1000)
+    data = os.urandom(4500)
+    reads = []
+    file = _file(data)
+    read = file.read
+
+    async def counting_read(size=-1):
+        reads.append(size)
+        return await read(size)
+
+    file.read = counting_read
+    upload = _ingest(file, tmp_path, prefix="job")
+
+    assert set(reads) == {1000}
+    assert upload.size == 4500
+    assert upload.content_hash == hashlib.sha256(data).hexdigest()
+    assert upload.extension == "wav"
+    assert os.path.basename(upload.path).startswith("job_")
+    with open(upload.path, "rb") as f:
+        assert f.read() == data
+
+    upload.remove()
+    assert not os.path.exists(upload.path)
+
+
+def test_client_path_components_are_dropped(tmp_path):
+    upload = _ingest(_file(b"RIFF", "../../etc/take.WAV"), tmp_path)
+
+    assert os.path.dirname(upload.path) == str(tmp_path)
+    assert upload.filename == "take.WAV"
+
+
+@pytest.mark.parametrize("filename", ["notes.txt", "noextension", "archive.wav.exe", ""])
+def test_unsupported_extension_is_rejected_before_writing(tmp_path, filename):
+    with pytest.raises(HTTPException) as error:
+        _ingest(_file(b"data", filename), tmp_path)
+
+    assert error.value.status_code == 415
+    assert os.listdir(tmp_path) == []
+
+
+def test_declared_size_over_the_limit_is_rejected_without_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_FILE_SIZE", 1024)
+    file = _file(b"x" * 10, size=4096)
+
+    with pytest.raises(HTTPException) as error:
+        _ingest(file, tmp_path)
+
+    assert error.value.status_code == 413
+    assert file.file.tell() == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_streamed_size_over_the_limit_is_rejected_and_discarded(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(Config, "UPLOAD_CHUNK_SIZE", 256)
+
+    with pytest.raises(HTTPException) as error:
+        # No declared size, as with a chunked request body
+        _ingest(_file(b"x" * 2000), tmp_path)
+
+    assert error.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_empty_upload_is_rejected(tmp_path):
+    with pytest.raises(HTTPException) as error:
+        _ingest(_file(b""), tmp_path)
+
+    assert error.value.status_code == 400
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_multi_upload_removes_the_files_already_stored(tmp_path):
+    files = [_file(b"first", "a.wav"), _file(b"second", "b.mp3"), _file(b"third", "c.txt")]
+
+    with pytest.raises(HTTPException):
+        asyncio.run(ingest_uploads(files, str(tmp_path)))
+
+    assert os.listdir(tmp_path) == []
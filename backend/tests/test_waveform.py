@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+import soundfile as sf
+
+from services.audio_splitter.processor import AudioSplitterProcessor
+from shared import waveform
+from shared.audio_stream import ArraySource, write_blocks
+from shared.upload import IngestedUpload
+from shared.waveform import MAGIC, SIDECAR_SUFFIX, attach_waveforms, build_from_file
+
+
+def _stereo(sr=22050, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    return np.stack([0.5 * np.sin(2 * np.pi * 220 * t), 0.25 * np.sin(2 * np.pi * 880 * t)]).astype(np.float32)
+
+
+def _manifest(path):
+    with open(path, "rb") as f:
+        prefix = f.read(12)
+        assert prefix[:4] == MAGIC
+        _, length = struct.unpack("<II", prefix[4:])
+        return json.loads(f.read(length))
+
+
+def test_same_pass_sidecar_matches_a_rebuild(tmp_path):
+    sr = 22050
+    output = str(tmp_path / "tone.wav")
+    write_blocks(ArraySource(_stereo(sr), sr).blocks(1000), output, sr, 2, "FLOAT")
+
+    rebuilt = build_from_file(output, str(tmp_path / "rebuilt.wfm"))
+
+    with open(output + SIDECAR_SUFFIX, "rb") as same_pass, open(rebuilt, "rb") as from_file:
+        assert same_pass.read() == from_file.read()
+    manifest = _manifest(rebuilt)
+    assert manifest["sample_rate"] == sr
+    assert manifest["frames"] == sr
+
+
+def test_splitter_outputs_carry_waveforms_without_a_redecode(tmp_path, monkeypatch):
+    sr = 22050
+    path = str(tmp_path / "stereo.wav")
+    sf.write(path, _stereo(sr).T, sr)
+    with open(path, "rb") as f:
+        upload = IngestedUpload(path, "stereo.wav", os.path.getsize(path), hashlib.sha256(f.read()).hexdigest())
+    processor = AudioSplitterProcessor()
+    processor.processed_dir = str(tmp_path)
+
+    result = processor._split(upload, "lr_channels", "wav")
+
+    def redecode(path, output_path=None):
+        raise AssertionError(f"{path} was decoded again for its waveform")
+
+    monkeypatch.setattr(waveform, "build_from_file", redecode)
+    attach_waveforms(result, tmp_path)
+    assert len(result["waveforms"]) == 2
+    for url in result["output_files"]:
+        assert os.path.exists(os.path.join(tmp_path, os.path.basename(url)) + SIDECAR_SUFFIX)
@@ -21,6 +21,10 @@ export default function VolumeNormalizer() {
       formData.append('file', file)
       formData.append('target_level', targetLevel.toString())
       formData.append('normalize', normalize.toString())
+      if (!normalize) {
+        // Without normalization the level is a plain gain
+        formData.append('gain_db', targetLevel.toString())
+      }
       
       const response = await axios.post('/api/volume-normalizer', formData, {
         headers: { 'Content-Type': 'multipart/form-data' },